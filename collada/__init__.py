@@ -22,27 +22,34 @@ __version__ = "0.4.1"
 
 import os.path
 import posixpath
+import re
 import traceback
 import types
+import uuid
 import zipfile
 from datetime import datetime
+from xml.sax.saxutils import escape
+from multiprocessing.pool import ThreadPool
 
 from collada import animation
 from collada import asset
 from collada import camera
+from collada import common
 from collada import controller
 from collada import geometry
 from collada import light
 from collada import material
 from collada import scene
+from collada.cache import DocumentCache
+from collada import util
 from collada.common import E, tag
 from collada.common import DaeError, DaeObject, DaeIncompleteError, \
     DaeBrokenRefError, DaeMalformedError, DaeUnsupportedError, \
     DaeSaveValidationError
 from collada.util import basestring, BytesIO
-from collada.util import IndexedList
+from collada.util import IndexedList, parseNumericText
 from collada.xmlutil import etree as ElementTree
-from collada.xmlutil import writeXML
+from collada.xmlutil import writeXML, removeChildren, HAVE_LXML
 
 try:
     from collada import schema
@@ -53,28 +60,32 @@ except ImportError: # no lxml
 class Collada(object):
     """This is the main class used to create and load collada documents"""
 
-    geometries = property( lambda s: s._geometries, lambda s,v: s._setIndexedList('_geometries', v), doc="""
+    geometries = property( lambda s: s._getLibrary('_geometries'), lambda s,v: s._setIndexedList('_geometries', v), doc="""
     A list of :class:`collada.geometry.Geometry` objects. Can also be indexed by id""" )
-    controllers = property( lambda s: s._controllers, lambda s,v: s._setIndexedList('_controllers', v), doc="""
+    controllers = property( lambda s: s._getLibrary('_controllers'), lambda s,v: s._setIndexedList('_controllers', v), doc="""
     A list of :class:`collada.controller.Controller` objects. Can also be indexed by id""" )
-    animations = property( lambda s: s._animations, lambda s,v: s._setIndexedList('_animations', v), doc="""
+    animations = property( lambda s: s._getLibrary('_animations'), lambda s,v: s._setIndexedList('_animations', v), doc="""
     A list of :class:`collada.animation.Animation` objects. Can also be indexed by id""" )
-    lights = property( lambda s: s._lights, lambda s,v: s._setIndexedList('_lights', v), doc="""
+    lights = property( lambda s: s._getLibrary('_lights'), lambda s,v: s._setIndexedList('_lights', v), doc="""
     A list of :class:`collada.light.Light` objects. Can also be indexed by id""" )
-    cameras = property( lambda s: s._cameras, lambda s,v: s._setIndexedList('_cameras', v), doc="""
+    cameras = property( lambda s: s._getLibrary('_cameras'), lambda s,v: s._setIndexedList('_cameras', v), doc="""
     A list of :class:`collada.camera.Camera` objects. Can also be indexed by id""" )
-    images = property( lambda s: s._images, lambda s,v: s._setIndexedList('_images', v), doc="""
+    images = property( lambda s: s._getLibrary('_images'), lambda s,v: s._setIndexedList('_images', v), doc="""
     A list of :class:`collada.material.CImage` objects. Can also be indexed by id""" )
-    effects = property( lambda s: s._effects, lambda s,v: s._setIndexedList('_effects', v), doc="""
+    effects = property( lambda s: s._getLibrary('_effects'), lambda s,v: s._setIndexedList('_effects', v), doc="""
     A list of :class:`collada.material.Effect` objects. Can also be indexed by id""" )
-    materials = property( lambda s: s._materials, lambda s,v: s._setIndexedList('_materials', v), doc="""
+    materials = property( lambda s: s._getLibrary('_materials'), lambda s,v: s._setIndexedList('_materials', v), doc="""
     A list of :class:`collada.material.Effect` objects. Can also be indexed by id""" )
-    nodes = property( lambda s: s._nodes, lambda s,v: s._setIndexedList('_nodes', v), doc="""
+    nodes = property( lambda s: s._getLibrary('_nodes'), lambda s,v: s._setIndexedList('_nodes', v), doc="""
     A list of :class:`collada.scene.Node` objects. Can also be indexed by id""" )
-    scenes = property( lambda s: s._scenes, lambda s,v: s._setIndexedList('_scenes', v), doc="""
+    scenes = property( lambda s: s._getLibrary('_scenes'), lambda s,v: s._setIndexedList('_scenes', v), doc="""
     A list of :class:`collada.scene.Scene` objects. Can also be indexed by id""" )
+    scene = property( lambda s: s._getLibrary('_scene'), lambda s,v: s._setScene(v), doc="""
+    The default scene. This is either an instance of :class:`collada.scene.Scene` or `None`.""" )
 
-    def __init__(self, filename=None, ignore=None, aux_file_loader=None, zip_filename=None, validate_output=False):
+    def __init__(self, filename=None, ignore=None, aux_file_loader=None, zip_filename=None, validate_output=False,
+                 stream=False, lazy=False, libraries=None, skip_libraries=None, workers=None,
+                 cache=None):
         """Load collada data from filename or file like object.
 
         :param filename:
@@ -102,6 +113,45 @@ class Collada(object):
           If set to True, the XML written when calling :meth:`save` will be
           validated against the COLLADA 1.4.1 schema. If validation fails, the
           :class:`common.DaeSaveValidationError` exception will be thrown.
+        :param bool stream:
+          If set to True, the document is parsed incrementally. Each geometry
+          and controller is built as soon as its closing tag is read and the
+          text of its numeric arrays is then released from :attr:`xmlnode`,
+          so peak memory follows the largest single geometry instead of the
+          whole document. Released arrays are written back from the loaded
+          data when calling :meth:`save`.
+        :param bool lazy:
+          If set to True, the libraries of the document are only loaded
+          the first time they are accessed, e.g. effects are loaded the
+          first time :attr:`effects` is read. Geometries are loaded one
+          by one when looked up by id and all at once when :attr:`geometries`
+          is used as a list. Errors are raised (or added to :attr:`errors`)
+          when the library they belong to is loaded.
+        :param list libraries:
+          If set, only the libraries named in this list are loaded, using the
+          names of the attributes holding them, e.g. ``['geometries', 'scenes']``.
+          The others are left empty.
+        :param list skip_libraries:
+          A list of library names, like in `libraries`, that should not be
+          loaded. Libraries that depend on a skipped library are skipped too:
+          ``materials`` need ``effects``, ``effects`` need ``images`` and
+          ``controllers`` need ``geometries``. Instances of objects from
+          skipped libraries are left out of the loaded scenes, so they are
+          removed from the scenes when saving, but the XML of the skipped
+          libraries themselves is kept unchanged. The names of all
+          skipped libraries are available in :attr:`skippedLibraries`.
+        :param int workers:
+          If set to a number greater than one, the geometries are loaded in
+          parallel on a pool of this many threads. The geometries end up in
+          :attr:`geometries` in document order and errors are handled in the
+          same order as when loading serially. Not used when `stream` or
+          `lazy` are set.
+        :param cache:
+          A :class:`collada.cache.DocumentCache` or the name of the directory
+          of one. If the document was loaded before, its numeric arrays are
+          memory mapped from the cache instead of being parsed from the XML.
+          Otherwise they are stored in the cache after loading, unless
+          `lazy` is set. Can't be used together with `stream`.
         """
 
         self.errors = []
@@ -109,6 +159,14 @@ class Collada(object):
         self.assetInfo = None
         """Instance of :class:`collada.asset.Asset` containing asset information"""
 
+        self._pendingLibraries = {}
+        self._textReleased = False
+        self._workers = workers
+        self._cachedArrays = None
+        self._recordedArrays = None
+        self.skippedLibraries = _resolveSkippedLibraries(libraries, skip_libraries)
+        """A frozenset with the names of the libraries that were not loaded"""
+
         self._geometries = IndexedList([], ('id',))
         self._controllers = IndexedList([], ('id',))
         self._animations = IndexedList([], ('id',))
@@ -119,9 +177,7 @@ class Collada(object):
         self._materials = IndexedList([], ('id',))
         self._nodes = IndexedList([], ('id',))
         self._scenes = IndexedList([], ('id',))
-
-        self.scene = None
-        """The default scene. This is either an instance of :class:`collada.scene.Scene` or `None`."""
+        self._scene = None
 
         if validate_output and schema:
             self.validator = schema.ColladaValidator()
@@ -165,60 +221,162 @@ class Collada(object):
             fdata = filename # assume it is a file like object
             self.filename = None
             self.getFileData = self._nullGetFile
-        strdata = fdata.read()
 
-        try:
-            self.zfile = zipfile.ZipFile(BytesIO(strdata), 'r')
-        except:
-            self.zfile = None
+        if cache is not None and stream:
+            raise ValueError('A cache can not be used when streaming')
 
-        if self.zfile:
-            self.filename = ''
-            daefiles = []
-            if zip_filename is not None:
-                self.filename = zip_filename
-            else:
-                for name in self.zfile.namelist():
-                    if name.upper().endswith('.DAE'):
-                        daefiles.append(name)
-                for name in daefiles:
-                    if not self.filename:
-                        self.filename = name
-                    elif "MACOSX" in self.filename:
-                        self.filename = name
-            if not self.filename or self.filename not in self.zfile.namelist():
-                raise DaeIncompleteError('COLLADA file not found inside zip compressed file')
-            data = self.zfile.read(self.filename)
-            self.getFileData = self._getFileFromZip
-        else:
-            data = strdata
+        xmlsource = self._openDocument(fdata, zip_filename)
+
+        cached = None
+        if cache is not None:
+            if isinstance(cache, basestring):
+                cache = DocumentCache(cache)
+            start = None if self.zfile else xmlsource.tell()
+            cachekey = cache.key(xmlsource)
+            cached = cache.load(cachekey)
+            if cached is None:
+                xmlsource = self._rewindDocument(xmlsource, start)
 
         if aux_file_loader is not None:
             self.getFileData = self._wrappedFileLoader(aux_file_loader)
 
-        etree_parser = ElementTree.XMLParser()
-        try:
-            self.xmlnode = ElementTree.ElementTree(element=None,
-                    file=BytesIO(data))
-        except ElementTree.ParseError as e:
-            raise DaeMalformedError("XML Parsing Error: %s" % e)
+        # arrays streamed or read from the cache have no text until the
+        # objects holding them are saved
+        self._textReleased = stream or cached is not None
+        if stream:
+            _whileLoading(self._loadStreaming, xmlsource)
+        elif cached is not None:
+            self.xmlnode, self._cachedArrays = cached
+        else:
+            if cache is not None and not lazy:
+                self._recordedArrays = {}
+            try:
+                self.xmlnode = ElementTree.ElementTree(element=None,
+                        file=xmlsource)
+            except ElementTree.ParseError as e:
+                raise DaeMalformedError("XML Parsing Error: %s" % e)
 
         self._loadAssetInfo()
-        self._loadImages()
-        self._loadEffects()
-        self._loadMaterials()
-        self._loadAnimations()
-        self._loadGeometry()
-        self._loadControllers()
-        self._loadLights()
-        self._loadCameras()
-        self._loadNodes()
-        self._loadScenes()
-        self._loadDefaultScene()
+        loaders = [('_images', self._loadImages),
+                   ('_effects', self._loadEffects),
+                   ('_materials', self._loadMaterials),
+                   ('_animations', self._loadAnimations),
+                   ('_geometries', self._loadGeometry),
+                   ('_controllers', self._loadControllers),
+                   ('_lights', self._loadLights),
+                   ('_cameras', self._loadCameras),
+                   ('_nodes', self._loadNodes),
+                   ('_scenes', self._loadScenes),
+                   ('_scene', self._loadDefaultScene)]
+        if stream:
+            # geometries and controllers were loaded while parsing
+            loaders[4] = ('_geometries', None)
+            loaders[5] = ('_controllers', self._loadDeferredControllers)
+        elif lazy:
+            loaders[4] = ('_geometries', self._loadLazyGeometry)
+        if 'scenes' in self.skippedLibraries:
+            loaders[-1] = ('_scene', None)
+        for propname, loader in loaders:
+            if loader is None or propname[1:] in self.skippedLibraries:
+                continue
+            if lazy:
+                self._pendingLibraries[propname] = loader
+            else:
+                _whileLoading(loader)
+
+        if self._recordedArrays is not None:
+            cache.store(cachekey, self.xmlnode, self._recordedArrays)
+            self._recordedArrays = None
+        if not lazy:
+            self._cachedArrays = None
+
+    def _openDocument(self, fdata, zip_filename):
+        """Returns a file-like object to read the XML of the document from.
+        Zip archives are opened in place and the .dae member is decompressed
+        while it is read, so neither the archive nor the document have to be
+        held in memory. Only file objects that can't seek are read fully."""
+        try:
+            pos = fdata.tell()
+            fdata.seek(pos)
+        except (AttributeError, IOError, ValueError):
+            fdata = BytesIO(fdata.read())
+            pos = 0
+
+        iszip = zipfile.is_zipfile(fdata)
+        fdata.seek(pos)
+        if not iszip:
+            self.zfile = None
+            return fdata
+
+        try:
+            self.zfile = zipfile.ZipFile(fdata, 'r')
+        except zipfile.BadZipfile as ex:
+            raise DaeMalformedError('Corrupted zip file: %s' % ex)
+        self.filename = ''
+        daefiles = []
+        if zip_filename is not None:
+            self.filename = zip_filename
+        else:
+            for name in self.zfile.namelist():
+                if name.upper().endswith('.DAE'):
+                    daefiles.append(name)
+            for name in daefiles:
+                if not self.filename:
+                    self.filename = name
+                elif "MACOSX" in self.filename:
+                    self.filename = name
+        if not self.filename or self.filename not in self.zfile.namelist():
+            raise DaeIncompleteError('COLLADA file not found inside zip compressed file')
+        self.getFileData = self._getFileFromZip
+        return self.zfile.open(self.filename)
+
+    def _rewindDocument(self, xmlsource, start):
+        """Returns a file-like object reading the document from the start
+        again after `xmlsource` was read."""
+        if self.zfile:
+            return self.zfile.open(self.filename)
+        xmlsource.seek(start)
+        return xmlsource
+
+    def getArrayData(self, node, dtype):
+        """Returns the contents of a numeric array element, like <float_array>
+        or <p>, as a one dimensional numpy array. The array comes from the
+        cache if the document was loaded from one, otherwise it is parsed
+        from the text of `node`.
+
+        :param node:
+          The ElementTree element holding the array
+        :param dtype:
+          The numpy data type of the array
+
+        :rtype: numpy.array
+
+        """
+        if self._cachedArrays is not None:
+            data = self._cachedArrays.get(node)
+            if data is not None and data.dtype == dtype:
+                return data
+        data = parseNumericText(node.text, dtype)
+        if self._recordedArrays is not None:
+            self._recordedArrays[node] = data
+        return data
 
     def _setIndexedList(self, propname, data):
+        self._pendingLibraries.pop(propname, None)
         setattr(self, propname, IndexedList(data, ('id',)))
 
+    def _setScene(self, scene):
+        self._pendingLibraries.pop('_scene', None)
+        self._scene = scene
+
+    def _getLibrary(self, propname):
+        """Returns the library stored in attribute `propname`, loading it
+        first if the document was opened with ``lazy=True``."""
+        loader = self._pendingLibraries.pop(propname, None)
+        if loader is not None:
+            _whileLoading(loader)
+        return getattr(self, propname)
+
     def handleError(self, error):
         self.errors.append(error)
         if not type(error) in self.maskedErrors:
@@ -279,19 +437,81 @@ class Collada(object):
 
     def _loadGeometry(self):
         """Load geometry library."""
-        libnodes = self.xmlnode.findall(tag('library_geometries'))
-        if libnodes is not None:
-            for libnode in libnodes:
-                if libnode is not None:
-                    for geomnode in libnode.findall(tag('geometry')):
-                        if geomnode.find(tag('mesh')) is None:
-                            continue
-                        try:
-                            G = geometry.Geometry.load(self, {}, geomnode)
-                        except DaeError as ex:
-                            self.handleError(ex)
-                        else:
-                            self.geometries.append(G)
+        geomnodes = []
+        for libnode in self.xmlnode.findall(tag('library_geometries')):
+            geomnodes.extend(libnode.findall(tag('geometry')))
+        if self._workers is not None and self._workers > 1 and len(geomnodes) > 1:
+            self._loadGeometryParallel(geomnodes)
+        else:
+            for geomnode in geomnodes:
+                self._loadGeometryNode(geomnode)
+
+    def _loadGeometryParallel(self, geomnodes):
+        """Load the given <geometry> nodes on a thread pool. Errors reported
+        by each geometry are recorded and handled afterwards in document
+        order, so the result is the same as when loading serially."""
+        def load(geomnode):
+            recorder = _ErrorRecorder(self)
+            if geomnode.find(tag('mesh')) is None:
+                return None, recorder.errors, None
+            try:
+                G = geometry.Geometry.load(recorder, {}, geomnode)
+            except Exception as ex:
+                return None, recorder.errors, ex
+            G.collada = self
+            return G, recorder.errors, None
+
+        pool = ThreadPool(min(self._workers, len(geomnodes)))
+        try:
+            results = pool.map(load, geomnodes)
+        finally:
+            pool.close()
+            pool.join()
+
+        for G, errors, error in results:
+            self.errors.extend(errors)
+            if error is None:
+                if G is not None:
+                    self.geometries.append(G)
+            elif isinstance(error, DaeError):
+                try:
+                    raise error
+                except DaeError as ex:
+                    self.handleError(ex)
+            else:
+                raise error
+
+    def _loadLazyGeometry(self):
+        """Prepare the geometry library so that each geometry is only loaded
+        when it is first accessed."""
+        geomnodes = []
+        for libnode in self.xmlnode.findall(tag('library_geometries')):
+            geomnodes.extend(libnode.findall(tag('geometry')))
+        self._geometries = util.LazyIndexedList(
+                [(geomnode.get('id'), geomnode) for geomnode in geomnodes],
+                ('id',), self._createLazyGeometry)
+
+    def _createLazyGeometry(self, geomnode):
+        """Create a geometry of a lazy document on first access, already
+        marked as saved since it matches its node."""
+        return _whileLoading(self._createGeometry, geomnode)
+
+    def _loadGeometryNode(self, geomnode):
+        """Load a single <geometry> node into :attr:`geometries`."""
+        G = self._createGeometry(geomnode)
+        if G is not None:
+            self.geometries.append(G)
+        return G
+
+    def _createGeometry(self, geomnode):
+        """Create a :class:`collada.geometry.Geometry` from a <geometry> node,
+        returning None if it isn't a mesh or failed to load."""
+        if geomnode.find(tag('mesh')) is None:
+            return None
+        try:
+            return geometry.Geometry.load(self, {}, geomnode)
+        except DaeError as ex:
+            self.handleError(ex)
 
     def _loadControllers(self):
         """Load controller library."""
@@ -300,15 +520,82 @@ class Collada(object):
             for libnode in libnodes:
                 if libnode is not None:
                     for controlnode in libnode.findall(tag('controller')):
-                        if controlnode.find(tag('skin')) is None \
-                                and controlnode.find(tag('morph')) is None:
-                            continue
-                        try:
-                            C = controller.Controller.load(self, {}, controlnode)
-                        except DaeError as ex:
-                            self.handleError(ex)
-                        else:
-                            self.controllers.append(C)
+                        self._loadControllerNode(controlnode)
+
+    def _loadControllerNode(self, controlnode):
+        """Load a single <controller> node into :attr:`controllers`."""
+        if controlnode.find(tag('skin')) is None \
+                and controlnode.find(tag('morph')) is None:
+            return None
+        try:
+            C = controller.Controller.load(self, {}, controlnode)
+        except DaeError as ex:
+            self.handleError(ex)
+        else:
+            self.controllers.append(C)
+            return C
+
+    def _loadStreaming(self, xmlsource):
+        """Parse the document incrementally. Geometries and controllers are
+        loaded as soon as their closing tag is read and the text of their
+        numeric arrays is released afterwards."""
+        libtags = {tag('geometry'): tag('library_geometries'),
+                   tag('controller'): tag('library_controllers')}
+        self._deferredControllers = []
+        parents = []
+        root = None
+        options = {'huge_tree': True} if HAVE_LXML else {}
+        try:
+            for event, elem in ElementTree.iterparse(xmlsource,
+                    events=('start', 'end'), **options):
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    parents.append(elem.tag)
+                    continue
+                parents.pop()
+                if not parents or parents[-1] != libtags.get(elem.tag):
+                    continue
+                if libtags[elem.tag][len(tag('library_')):] in self.skippedLibraries:
+                    continue
+                if elem.tag == tag('geometry'):
+                    # nothing can write back the arrays of a geometry that
+                    # was not loaded, so those keep their text
+                    if self._loadGeometryNode(elem) is not None:
+                        _releaseArrayText(elem, ('float_array', 'p', 'vcount'))
+                elif self._controllerRefsLoaded(elem):
+                    self._releaseControllerText(elem, self._loadControllerNode(elem))
+                else:
+                    self._deferredControllers.append(elem)
+        except ElementTree.ParseError as e:
+            raise DaeMalformedError("XML Parsing Error: %s" % e)
+        if root is None:
+            raise DaeMalformedError("XML Parsing Error: no element found")
+        self.xmlnode = ElementTree.ElementTree(root)
+
+    def _controllerRefsLoaded(self, controlnode):
+        """Checks if all geometries referenced by a <controller> node are loaded."""
+        refs = []
+        for subnode in controlnode:
+            if subnode.tag == tag('skin') or subnode.tag == tag('morph'):
+                refs.append(subnode.get('source'))
+            if subnode.tag == tag('morph'):
+                for arraynode in subnode.iter(tag('IDREF_array')):
+                    refs.extend('#' + t for t in (arraynode.text or '').split())
+        return all(ref is None or self.geometries.get(ref[1:]) is not None
+                   for ref in refs)
+
+    def _loadDeferredControllers(self):
+        """Load the controllers that referenced geometries which were not read
+        yet when streaming the document."""
+        for controlnode in self._deferredControllers:
+            self._releaseControllerText(controlnode, self._loadControllerNode(controlnode))
+        self._deferredControllers = []
+
+    def _releaseControllerText(self, controlnode, C):
+        # only loaded skins know how to write their arrays back
+        if C is not None and not isinstance(C, controller.Morph):
+            _releaseArrayText(controlnode, ('float_array', 'v', 'vcount'))
 
     def _loadAnimations(self):
         """Load animation library."""
@@ -460,16 +747,24 @@ class Collada(object):
             self.handleError(ex)
 
     def save(self):
-        """Saves the collada document back to :attr:`xmlnode`"""
-        libraries = [(self.geometries, 'library_geometries'),
-                     (self.controllers, 'library_controllers'),
-                     (self.lights, 'library_lights'),
-                     (self.cameras, 'library_cameras'),
-                     (self.images, 'library_images'),
-                     (self.effects, 'library_effects'),
-                     (self.materials, 'library_materials'),
-                     (self.nodes, 'library_nodes'),
-                     (self.scenes, 'library_visual_scenes')]
+        """Saves the collada document back to :attr:`xmlnode`. Only the
+        objects modified since the document was loaded or last saved are
+        written again, see :meth:`collada.common.DaeObject.isDirty`."""
+        for o in self._saveLibraries():
+            o._markClean(_isLibraryObject)
+
+    def _saveLibraries(self):
+        """Saves the document like :meth:`save`, returning the objects of
+        the libraries that were written again without marking them saved."""
+        libraries = [('geometries', 'library_geometries'),
+                     ('controllers', 'library_controllers'),
+                     ('lights', 'library_lights'),
+                     ('cameras', 'library_cameras'),
+                     ('images', 'library_images'),
+                     ('effects', 'library_effects'),
+                     ('materials', 'library_materials'),
+                     ('nodes', 'library_nodes'),
+                     ('scenes', 'library_visual_scenes')]
 
         self.assetInfo.save()
         assetnode = self.xmlnode.getroot().find(tag('asset'))
@@ -477,12 +772,16 @@ class Collada(object):
             self.xmlnode.getroot().remove(assetnode)
         self.xmlnode.getroot().insert(0, self.assetInfo.xmlnode)
 
+        saved = []
         library_loc = 0
         for i, node in enumerate(self.xmlnode.getroot()):
             if node.tag == tag('asset'):
                 library_loc = i+1
 
-        for arr, name in libraries:
+        for libname, name in libraries:
+            if libname in self.skippedLibraries:
+                continue
+            arr = getattr(self, libname)
             node = self.xmlnode.find( tag(name) )
             if node is None:
                 if len(arr) == 0:
@@ -493,41 +792,116 @@ class Collada(object):
                 self.xmlnode.getroot().remove(node)
                 continue
 
+            present = set(node)
             for o in arr:
-                o.save()
-                if o.xmlnode not in node:
+                if self._textReleased:
+                    o._markNeedsSave(_isLibraryObject)
+                if o.isDirty():
+                    o.save()
+                    saved.append(o)
+                if o.xmlnode not in present:
                     node.append(o.xmlnode)
-            xmlnodes = [o.xmlnode for o in arr]
-            for n in node:
-                if n not in xmlnodes:
-                    node.remove(n)
+                    present.add(o.xmlnode)
+            xmlnodes = set(o.xmlnode for o in arr)
+            removeChildren(node, lambda n: n in xmlnodes)
 
         scenenode = self.xmlnode.find(tag('scene'))
-        scenenode.clear()
-        if self.scene is not None:
-            sceneid = self.scene.id
-            if sceneid not in self.scenes:
-                raise DaeBrokenRefError('Default scene %s not found' % sceneid)
-            scenenode.append(E.instance_visual_scene(url="#%s" % sceneid))
+        if 'scenes' not in self.skippedLibraries:
+            # a lazy document reads its default scene from this node, so
+            # it has to be loaded before the node is cleared
+            defaultscene = self.scene
+            scenenode.clear()
+            if defaultscene is not None:
+                sceneid = defaultscene.id
+                if sceneid not in self.scenes:
+                    raise DaeBrokenRefError('Default scene %s not found' % sceneid)
+                scenenode.append(E.instance_visual_scene(url="#%s" % sceneid))
 
         if self.validator is not None:
             if not self.validator.validate(self.xmlnode):
                 raise DaeSaveValidationError("Validation error when saving: " + 
                         self.validator.COLLADA_SCHEMA_1_4_1_INSTANCE.error_log.last_error.message)
+        self._textReleased = False
+        return saved
 
-    def write(self, fp):
+    def write(self, fp, stream=False):
         """Writes out the collada document to a file. Note that this also
         calls :meth:`save` so avoid calling both methods to save performance.
 
         :param file:
           Either the file name to write to or a file-like object
+        :param bool stream:
+          If ``True``, the text of numeric arrays is not built in memory.
+          Each array is formatted in chunks straight from its numpy data to
+          the file. Afterwards the text of these arrays is released from
+          :attr:`xmlnode`, like when loading with `stream`; it is rebuilt
+          by the next :meth:`save`.
 
         """
 
-        self.save()
+        if not stream:
+            self.save()
+            if isinstance(fp, basestring):
+                fp = open(fp, 'wb')
+            writeXML(self.xmlnode, fp)
+            return
+
+        arrays = util.deferArrayText()
+        try:
+            saved = self._saveLibraries()
+        finally:
+            util.stopDeferringArrayText()
+        for o in saved:
+            o._markClean(_isLibraryObject)
         if isinstance(fp, basestring):
             fp = open(fp, 'wb')
-        writeXML(self.xmlnode, fp)
+        self._writeStreaming(fp, arrays)
+        # the arrays written are left without text until the next save
+        for o in saved:
+            o._markNeedsSave(_isLibraryObject)
+
+    def _writeStreaming(self, fp, arrays):
+        """Writes :attr:`xmlnode` to `fp` with the text of the elements in
+        `arrays` formatted from the numpy data they are mapped to. The rest
+        of the document is serialized as usual with a placeholder in place
+        of each array, and of the existing text of large arrays, so that it
+        is small."""
+        token = uuid.uuid4().hex
+        nodes = list(arrays)
+        texts = {}
+        for node in self.xmlnode.getroot().iter():
+            if node.tag in _ARRAY_TAGS and node.text is not None and \
+                    len(node.text) > _WRITE_CHUNK:
+                texts[node] = node.text
+                nodes.append(node)
+        for i, node in enumerate(nodes):
+            node.text = 'PYCOLLADA-ARRAY-%s-%d' % (token, i)
+        try:
+            skeleton = BytesIO()
+            writeXML(self.xmlnode, skeleton)
+        finally:
+            for node in nodes:
+                node.text = texts.get(node)
+        skeleton = skeleton.getvalue()
+
+        placeholder = re.compile(('PYCOLLADA-ARRAY-%s-([0-9]+)' % token).encode('ascii'))
+        pos = 0
+        for match in placeholder.finditer(skeleton):
+            fp.write(skeleton[pos:match.start()])
+            node = nodes[int(match.group(1))]
+            if node in texts:
+                text = texts[node]
+                for start in range(0, len(text), _WRITE_CHUNK):
+                    fp.write(escape(text[start:start+_WRITE_CHUNK]).encode('ascii', 'xmlcharrefreplace'))
+            else:
+                data, fmt = arrays[node]
+                chunks = util.iterFormatNumericArray(data, fmt, _WRITE_CHUNK)
+                for i, chunk in enumerate(chunks):
+                    if i > 0:
+                        fp.write(b' ')
+                    fp.write(chunk.encode('ascii'))
+            pos = match.end()
+        fp.write(skeleton[pos:])
 
     def __str__(self):
         return '<Collada geometries=%d>' % (len(self.geometries))
@@ -535,3 +909,80 @@ class Collada(object):
     def __repr__(self):
         return str(self)
 
+
+_WRITE_CHUNK = 64*1024
+"""Number of values formatted at a time when writing in streaming mode"""
+
+_ARRAY_TAGS = tuple(tag(name) for name in
+                    ('float_array', 'int_array', 'bool_array', 'p', 'v', 'vcount'))
+
+
+class _ErrorRecorder(object):
+    """Stands in for a :class:`Collada` object while loading in a worker
+    thread. Errors are recorded instead of being added to
+    :attr:`Collada.errors`, other attributes come from the real object."""
+
+    def __init__(self, collada):
+        self._collada = collada
+        self.errors = []
+
+    def handleError(self, error):
+        self.errors.append(error)
+        if not type(error) in self._collada.maskedErrors:
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self._collada, name)
+
+def _whileLoading(function, *args):
+    """Calls `function`, with the objects it creates starting out saved."""
+    common._loading += 1
+    try:
+        return function(*args)
+    finally:
+        common._loading -= 1
+
+LIBRARY_NAMES = ('images', 'effects', 'materials', 'animations', 'geometries',
+                 'controllers', 'lights', 'cameras', 'nodes', 'scenes')
+"""Names of the libraries that can be passed to the `libraries` and
+`skip_libraries` arguments of :class:`Collada`"""
+
+_LIBRARY_TYPES = (geometry.Geometry, controller.Controller, light.Light,
+                  camera.Camera, material.CImage, material.Effect,
+                  material.Material, scene.Scene)
+
+def _isLibraryObject(obj):
+    """Objects of a library are marked as saved with their own library
+    rather than through the objects referring to them."""
+    return isinstance(obj, _LIBRARY_TYPES)
+
+_LIBRARY_DEPENDENCIES = {'effects': ('images',),
+                         'materials': ('effects',),
+                         'controllers': ('geometries',)}
+
+def _resolveSkippedLibraries(libraries, skip_libraries):
+    """Returns a frozenset with the names of the libraries that should not be
+    loaded, including the ones depending on an excluded library."""
+    skipped = set()
+    if libraries is not None:
+        if isinstance(libraries, basestring):
+            libraries = [libraries]
+        skipped.update(set(LIBRARY_NAMES).difference(libraries))
+    if skip_libraries is not None:
+        if isinstance(skip_libraries, basestring):
+            skip_libraries = [skip_libraries]
+        skipped.update(skip_libraries)
+    unknown = skipped.union(libraries or ()).difference(LIBRARY_NAMES)
+    if unknown:
+        raise ValueError('Unknown library names: %s' % ', '.join(sorted(unknown)))
+    for name in LIBRARY_NAMES:
+        if any(dep in skipped for dep in _LIBRARY_DEPENDENCIES.get(name, ())):
+            skipped.add(name)
+    return frozenset(skipped)
+
+def _releaseArrayText(node, arraytags):
+    """Drop the text of the numeric array nodes found under `node`."""
+    for arraytag in arraytags:
+        for arraynode in node.iter(tag(arraytag)):
+            arraynode.text = None
+
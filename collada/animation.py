@@ -12,23 +12,277 @@
 
 """Contains objects representing animations."""
 
+import re
+
+import numpy
+
 from collada import source
 from collada.common import DaeObject, tag
-from collada.common import DaeIncompleteError, DaeBrokenRefError, \
+from collada.common import DaeError, DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
 
+INTERPOLATIONS = ('LINEAR', 'STEP', 'BEZIER')
+"""Names of the interpolation codes stored in :attr:`Sampler.interpolation`.
+HERMITE keys are converted to BEZIER when the sampler is created and any
+other interpolation is evaluated as LINEAR."""
+
+LINEAR, STEP, BEZIER = range(3)
+
+
+class Sampler(DaeObject):
+    """Class for holding the keyframes of an animation curve coming from a
+    <sampler> tag. All the keys are kept in contiguous numpy arrays so that
+    many samplers can be evaluated together, see :func:`evaluateSamplers`."""
+
+    def __init__(self, id, input, output, interpolation=None,
+                 in_tangent=None, out_tangent=None, xmlnode=None):
+        """Create a sampler.
+
+        :param str id:
+          A unique string identifier for the sampler
+        :param numpy.array input:
+          The key times, an array of shape ``(K,)`` in increasing order
+        :param numpy.array output:
+          The key values, of shape ``(K,)`` or ``(K, C)``
+        :param interpolation:
+          A sequence of ``K`` interpolation names like ``'LINEAR'`` or
+          ``'BEZIER'``. Defaults to LINEAR for every key.
+        :param numpy.array in_tangent:
+          The incoming tangents of the keys, either 1D values of shape
+          ``(K, C)`` or 2D ``(time, value)`` points of shape ``(K, C, 2)``
+          or ``(K, 2*C)``
+        :param numpy.array out_tangent:
+          The outgoing tangents of the keys, shaped like `in_tangent`
+        :param xmlnode:
+          When loaded, the xmlnode it comes from
+
+        """
+        self.id = id
+        """The unique string identifier for the sampler"""
+        self.input = numpy.ascontiguousarray(input, dtype=numpy.float32).reshape(-1)
+        """Numpy array of shape ``(K,)`` with the key times"""
+        nkeys = len(self.input)
+        output = numpy.asarray(output, dtype=numpy.float32)
+        if nkeys == 0 or output.size % nkeys != 0:
+            raise DaeMalformedError('Sampler %s has %d outputs for %d keys' % (id, output.size, nkeys))
+        self.output = numpy.ascontiguousarray(output.reshape(nkeys, -1))
+        """Numpy array of shape ``(K, C)`` with the key values"""
+        if (numpy.diff(self.input) < 0).any():
+            raise DaeMalformedError('Sampler %s has keys out of order' % id)
+
+        if interpolation is None:
+            names = ['LINEAR'] * nkeys
+        else:
+            names = [str(name) for name in numpy.asarray(interpolation).reshape(-1)]
+        if len(names) != nkeys:
+            raise DaeMalformedError('Sampler %s has %d interpolations for %d keys' % (id, len(names), nkeys))
+        hermite = numpy.array([name == 'HERMITE' for name in names], dtype=bool)
+        self.interpolation = numpy.array([INTERPOLATIONS.index(name) if name in INTERPOLATIONS
+                                          else BEZIER if name == 'HERMITE' else LINEAR
+                                          for name in names], dtype=numpy.uint8)
+        """Numpy array of shape ``(K,)`` with the interpolation code of the
+        segment starting at every key, an index into :data:`INTERPOLATIONS`"""
+
+        # control points default to a third of the way along each segment,
+        # which makes a BEZIER segment without tangents a straight line
+        times = self.input.astype(numpy.float64)
+        before = times - numpy.diff(times, prepend=times[0]) / 3.0
+        after = times + numpy.diff(times, append=times[-1]) / 3.0
+        nextvalues = numpy.concatenate((self.output[1:], self.output[-1:]))
+        prevvalues = numpy.concatenate((self.output[:1], self.output[:-1]))
+        # the interpolation of a key applies to the segment after it, which
+        # ends at the incoming tangent of the next key
+        endshermite = numpy.concatenate(([False], hermite[:-1]))
+        self.in_tangent = self._controlPoints(in_tangent, before, endshermite, -1,
+                                              (2 * self.output + prevvalues) / 3.0)
+        """Numpy array of shape ``(K, C, 2)`` with the absolute ``(time, value)``
+        incoming control point of every key and value component"""
+        self.out_tangent = self._controlPoints(out_tangent, after, hermite, 1,
+                                               (2 * self.output + nextvalues) / 3.0)
+        """Numpy array of shape ``(K, C, 2)`` with the absolute ``(time, value)``
+        outgoing control point of every key and value component"""
+        self.xmlnode = xmlnode
+        """ElementTree representation of the sampler."""
+
+    def _controlPoints(self, tangent, times, hermite, sign, default):
+        # hermite tells which keys have their tangent on a HERMITE segment
+        nkeys, ncomp = self.output.shape
+        points = numpy.empty((nkeys, ncomp, 2), dtype=numpy.float32)
+        points[:,:,0] = times[:, numpy.newaxis]
+        points[:,:,1] = default
+        if tangent is None:
+            return points
+        tangent = numpy.asarray(tangent, dtype=numpy.float32)
+        if tangent.size == nkeys * ncomp:
+            # 1D tangents only give the value of the control point
+            points[:,:,1] = tangent.reshape(nkeys, ncomp)
+        elif tangent.size == nkeys * ncomp * 2:
+            points[:] = tangent.reshape(nkeys, ncomp, 2)
+        else:
+            raise DaeMalformedError('Sampler %s has tangents of the wrong size' % self.id)
+        if hermite.any():
+            # hermite tangents are slopes over the segment, a third of which
+            # gives the equivalent bezier control point
+            slopes = points[hermite,:,-1]
+            points[hermite,:,0] = times[hermite, numpy.newaxis]
+            points[hermite,:,1] = self.output[hermite] + sign * slopes / 3.0
+        return points
+
+    def __len__(self):
+        return len(self.input)
+
+    def evaluate(self, times):
+        """Evaluate the curve.
+
+        :param times:
+          A time or an array of ``N`` times
+
+        :rtype: numpy.array
+        :return: The values at every time, of shape ``(N, C)``. Times before
+          the first key or after the last one get the first or last value.
+
+        """
+        return evaluateSamplers([self], times)[0]
+
+    @staticmethod
+    def load(collada, localscope, node):
+        id = node.get('id') or ''
+        inputs = {}
+        for inputnode in node.findall(tag('input')):
+            semantic = inputnode.get('semantic')
+            sourceid = (inputnode.get('source') or '')[1:]
+            if sourceid not in localscope:
+                raise DaeBrokenRefError('Source %s not found for sampler %s' % (sourceid, id))
+            inputs[semantic] = localscope[sourceid].data
+        if 'INPUT' not in inputs or 'OUTPUT' not in inputs:
+            raise DaeIncompleteError('Sampler %s needs INPUT and OUTPUT' % id)
+        return Sampler(id, inputs['INPUT'], inputs['OUTPUT'], inputs.get('INTERPOLATION'),
+                       inputs.get('IN_TANGENT'), inputs.get('OUT_TANGENT'), xmlnode=node)
+
+    def __str__(self): return '<Sampler id=%s, keys=%d>' % (self.id, len(self))
+    def __repr__(self): return str(self)
+
+
+class Channel(DaeObject):
+    """Class for holding the target of a sampler coming from a <channel> tag.
+
+    Targets of node transforms, like ``node/rotateX.ANGLE`` or
+    ``node/matrix(0)(3)``, are resolved to the :class:`collada.scene.Node`
+    and :class:`collada.scene.Transform` they animate the first time
+    :attr:`node` or :attr:`transform` is read. Other targets leave both
+    as None.
+    """
+
+    def __init__(self, sampler, target, collada=None, xmlnode=None):
+        """Create a channel.
+
+        :param collada.animation.Sampler sampler:
+          The sampler giving the animated values
+        :param str target:
+          The address of the animated value
+        :param collada.Collada collada:
+          The document in which to look for the target
+        :param xmlnode:
+          When loaded, the xmlnode it comes from
+
+        """
+        self.sampler = sampler
+        """The :class:`collada.animation.Sampler` giving the values"""
+        self.target = target
+        """The address of the animated value, as a string"""
+        self.collada = collada
+        match = _targetre.match(target)
+        if match is None:
+            raise DaeMalformedError('Could not parse channel target %s' % target)
+        self.nodeid = match.group(1)
+        """The id of the element holding the target"""
+        self.sid = match.group(2).split('/')[-1] if match.group(2) else None
+        """The sid of the animated element inside of :attr:`nodeid`, or None
+        if the target has no sid"""
+        self.member = match.group(3) or None
+        """The animated member, e.g. ``'ANGLE'`` or ``'X'``, a tuple of
+        indices for targets like ``matrix(0)(3)``, or None for the whole
+        element"""
+        if match.group(4):
+            self.member = tuple(int(i) for i in re.findall(r'\((\d+)\)', match.group(4)))
+        self._node = self._transform = None
+        self._resolved = False
+        self.xmlnode = xmlnode
+        """ElementTree representation of the channel."""
+
+    def resolve(self, nodesbyid):
+        """Look the target up.
+
+        :param dict nodesbyid:
+          The :class:`collada.scene.Node` objects that can be targeted, by id
+
+        """
+        self._node = nodesbyid.get(self.nodeid)
+        self._transform = None
+        # transforms are only found by sid, a target without one is left
+        # unresolved rather than matched to a transform without a sid
+        if self._node is not None and self.sid is not None:
+            for transform in self._node.transforms:
+                if transform.xmlnode.get('sid') == self.sid:
+                    self._transform = transform
+                    break
+        self._resolved = True
+
+    def _getTarget(self):
+        if not self._resolved and self.collada is not None:
+            resolveChannels(self.collada)
+        return self._node, self._transform
+
+    node = property(lambda s: s._getTarget()[0], doc="""
+    The :class:`collada.scene.Node` holding the target, or None""")
+    transform = property(lambda s: s._getTarget()[1], doc="""
+    The animated :class:`collada.scene.Transform`, or None""")
+
+    def evaluate(self, times):
+        """Evaluate the sampler of the channel, see :meth:`Sampler.evaluate`"""
+        return self.sampler.evaluate(times)
+
+    @staticmethod
+    def load(collada, localscope, node):
+        samplerid = (node.get('source') or '')[1:]
+        target = node.get('target')
+        if target is None:
+            raise DaeIncompleteError('Channel is missing a target')
+        if samplerid not in localscope:
+            raise DaeBrokenRefError('Sampler %s not found for channel %s' % (samplerid, target))
+        return Channel(localscope[samplerid], target, collada, xmlnode=node)
+
+    def __str__(self): return '<Channel target=%s>' % (self.target,)
+    def __repr__(self): return str(self)
+
+_targetre = re.compile(r'^([^/.(]+)((?:/[^/.(]+)*)?(?:\.(\w+)|((?:\(\d+\))+))?$')
+
+
 class Animation(DaeObject):
     """Class for holding animation data coming from <animation> tags."""
 
-    def __init__(self, id, name, sourceById, children, xmlnode=None):
+    def __init__(self, id, name, sourceById, children, xmlnode=None,
+                 samplers=None, channels=None):
         self.id = id
         self.name = name
         self.children = children
         self.sourceById = sourceById
+        self.samplers = samplers if samplers is not None else []
+        """A list of :class:`collada.animation.Sampler` defined in the animation"""
+        self.channels = channels if channels is not None else []
+        """A list of :class:`collada.animation.Channel` defined in the animation"""
         self.xmlnode = xmlnode
         if self.xmlnode is None:
             self.xmlnode = None
 
+    def allChannels(self):
+        """Iterate over the channels of the animation and all of its children"""
+        for channel in self.channels:
+            yield channel
+        for child in self.children:
+            for channel in child.allChannels():
+                yield channel
+
     @staticmethod
     def load( collada, localscope, node ):
         id = node.get('id') or ''
@@ -51,8 +305,175 @@ class Animation(DaeObject):
             except DaeError as ex:
                 collada.handleError(ex)
 
-        anim = Animation(id, name, sourcebyid, children, node)
+        samplers = []
+        samplerbyid = {}
+        for samplernode in node.findall(tag('sampler')):
+            try:
+                sampler = Sampler.load(collada, sourcebyid, samplernode)
+            except DaeError as ex:
+                collada.handleError(ex)
+            else:
+                samplers.append(sampler)
+                samplerbyid[sampler.id] = sampler
+
+        channels = []
+        for channelnode in node.findall(tag('channel')):
+            try:
+                channels.append(Channel.load(collada, samplerbyid, channelnode))
+            except DaeError as ex:
+                collada.handleError(ex)
+
+        anim = Animation(id, name, sourcebyid, children, node, samplers, channels)
         return anim
 
     def __str__(self): return '<Animation id=%s, children=%d>' % (self.id, len(self.children))
     def __repr__(self): return str(self)
+
+
+def resolveChannels(collada):
+    """Look up the targets of all the channels in the animations of a document.
+
+    This is done automatically the first time a channel target is read and
+    only needs to be called again after nodes have been added, removed or
+    renamed.
+
+    :param collada.Collada collada:
+      The document whose animations and nodes to use
+
+    """
+    nodesbyid = {}
+    tovisit = list(collada.nodes)
+    for scene in collada.scenes:
+        tovisit.extend(scene.nodes)
+    while tovisit:
+        node = tovisit.pop()
+        # instanced nodes are found through the library
+        if not hasattr(node, 'transforms') or hasattr(node, 'node'):
+            continue
+        nodesbyid.setdefault(node.id, node)
+        tovisit.extend(node.children)
+    for anim in collada.animations:
+        for channel in anim.allChannels():
+            channel.resolve(nodesbyid)
+
+def evaluateSamplers(samplers, times):
+    """Evaluate many samplers at the same times.
+
+    The keys of all the samplers with the same number of output components
+    are packed together and evaluated with a few numpy operations, so the
+    cost does not depend on the number of samplers or keys in Python.
+
+    :param list samplers:
+      The :class:`collada.animation.Sampler` objects to evaluate
+    :param times:
+      A time or an array of ``N`` times
+
+    :rtype: list
+    :return: For every sampler, a numpy array of shape ``(N, C)`` with its
+      values at every time
+
+    """
+    times = numpy.atleast_1d(numpy.asarray(times, dtype=numpy.float64)).reshape(-1)
+    order = None
+    if (numpy.diff(times) < 0).any():
+        order = numpy.argsort(times, kind='stable')
+        times = times[order]
+    results = [None] * len(samplers)
+    groups = {}
+    for i, sampler in enumerate(samplers):
+        groups.setdefault(sampler.output.shape[1], []).append(i)
+    for indices in groups.values():
+        values = _evaluateGroup([samplers[i] for i in indices], times)
+        if order is not None:
+            unsorted = numpy.empty_like(values)
+            unsorted[:, order] = values
+            values = unsorted
+        for i, value in zip(indices, values):
+            results[i] = value
+    return results
+
+def _evaluateGroup(samplers, times):
+    """Evaluate samplers with the same number of components at sorted times,
+    returning an array of shape ``(S, N, C)``"""
+    nsamplers, ntimes = len(samplers), len(times)
+    lengths = numpy.array([len(s) for s in samplers])
+    starts = numpy.zeros(nsamplers, dtype=numpy.intp)
+    numpy.cumsum(lengths[:-1], out=starts[1:])
+    keys = numpy.concatenate([s.input for s in samplers]).astype(numpy.float64)
+    outputs = numpy.concatenate([s.output for s in samplers])
+    codes = numpy.concatenate([s.interpolation for s in samplers])
+
+    # the number of keys at or before every time, for every sampler, from
+    # the position of every key among the times
+    owner = numpy.repeat(numpy.arange(nsamplers), lengths)
+    firsttime = numpy.searchsorted(times, keys, side='left')
+    counts = numpy.bincount(owner * (ntimes + 1) + firsttime, minlength=nsamplers * (ntimes + 1))
+    counts = counts.reshape(nsamplers, ntimes + 1)[:, :ntimes].cumsum(axis=1)
+
+    last = (starts + lengths - 1)[:, numpy.newaxis]
+    k0 = numpy.minimum(starts[:, numpy.newaxis] + numpy.maximum(counts - 1, 0), last)
+    k1 = numpy.minimum(k0 + 1, last)
+    t0, t1 = keys[k0], keys[k1]
+    t = numpy.clip(times, t0, t1)
+    span = t1 - t0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        u = numpy.where(span > 0, (t - t0) / span, 0.0)
+
+    v0, v1 = outputs[k0], outputs[k1]
+    values = v0 + (v1 - v0) * u[..., numpy.newaxis]
+    segcodes = codes[k0]
+    step = segcodes == STEP
+    values[step] = v0[step]
+
+    curved = (segcodes == BEZIER) & (k1 > k0)
+    if curved.any():
+        a, b = k0[curved], k1[curved]
+        ins = numpy.concatenate([s.in_tangent for s in samplers]).astype(numpy.float64)
+        outs = numpy.concatenate([s.out_tangent for s in samplers]).astype(numpy.float64)
+        x0 = keys[a][:, numpy.newaxis]
+        x3 = keys[b][:, numpy.newaxis]
+        x1 = numpy.clip(outs[a,:,0], x0, x3)
+        x2 = numpy.clip(ins[b,:,0], x0, x3)
+        s = _solveBezier(x0, x1, x2, x3, t[curved][:, numpy.newaxis], u[curved][:, numpy.newaxis])
+        values[curved] = _bezier(outputs[a], outs[a,:,1], ins[b,:,1], outputs[b], s)
+    return values
+
+def _bezier(p0, p1, p2, p3, s):
+    r = 1.0 - s
+    return r * r * r * p0 + 3.0 * r * r * s * p1 + 3.0 * r * s * s * p2 + s * s * s * p3
+
+def _solveBezier(x0, x1, x2, x3, t, guess, iterations=10):
+    """Find the curve parameter at which the time of a bezier segment is
+    ``t``, with newton steps kept inside a bisection bracket"""
+    # power basis coefficients of the time curve
+    c = 3.0 * (x1 - x0)
+    b = 3.0 * (x2 - x1) - c
+    a = x3 - x0 - c - b
+    a, b, c = [numpy.broadcast_to(v, x1.shape).reshape(-1) for v in (a, b, c)]
+    target = numpy.broadcast_to(t - x0, x1.shape).reshape(-1)
+    tolerance = numpy.broadcast_to(1e-7 * (x3 - x0), x1.shape).reshape(-1)
+    result = numpy.broadcast_to(guess, x1.shape).reshape(-1).copy()
+    active = numpy.arange(len(result))
+    s = result
+    lo = numpy.zeros_like(s)
+    hi = numpy.ones_like(s)
+    for i in range(iterations):
+        # only the parameters that have not converged are refined
+        error = ((a * s + b) * s + c) * s - target
+        pending = numpy.abs(error) > tolerance
+        result[active] = s
+        if not pending.any():
+            break
+        active, s, error = active[pending], s[pending], error[pending]
+        a, b, c, target, tolerance = a[pending], b[pending], c[pending], target[pending], tolerance[pending]
+        below = error < 0
+        lo = numpy.where(below, s, lo[pending])
+        hi = numpy.where(below, hi[pending], s)
+        slope = (3.0 * a * s + 2.0 * b) * s + c
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            newton = s - error / slope
+        inside = (newton >= lo) & (newton <= hi)
+        s = numpy.where(inside, newton, (lo + hi) * 0.5)
+    else:
+        result[active] = s
+    return result.reshape(x1.shape)
@@ -0,0 +1,542 @@
+####################################################################
+#                                                                  #
+# THIS FILE IS PART OF THE pycollada LIBRARY SOURCE CODE.          #
+# USE, DISTRIBUTION AND REPRODUCTION OF THIS LIBRARY SOURCE IS     #
+# GOVERNED BY A BSD-STYLE SOURCE LICENSE INCLUDED WITH THIS SOURCE #
+# IN 'COPYING'. PLEASE READ THESE TERMS BEFORE DISTRIBUTING.       #
+#                                                                  #
+# THE pycollada SOURCE CODE IS (C) COPYRIGHT 2011                  #
+# by Jeff Terrace and contributors                                 #
+#                                                                  #
+####################################################################
+
+"""Module for bounding volume hierarchies, used to find quickly which
+parts of a scene are hit by a ray or lie in a region of space.
+
+A :class:`BVH` is a binary tree of axis-aligned boxes over a set of items
+that each have a box of their own. The items are sorted along a space
+filling curve through the centers of their boxes and split in equal halves
+at every level, so the tree is complete and stored in flat arrays. Queries
+walk down the tree one level at a time, testing all the nodes reached at
+that level with a few numpy operations.
+
+A :class:`SceneBVH` uses two levels of trees: one over the world boxes of
+the geometry instances of a scene and, for each triangle set, one over its
+triangles, built the first time it is needed with
+:meth:`collada.triangleset.TriangleSet.bvh`. Get it with
+:meth:`collada.scene.FlattenedScene.bvh`, or use :meth:`collada.scene.Scene.raycast`,
+:meth:`collada.scene.Scene.nearest`, :meth:`collada.scene.Scene.queryBox` and
+:meth:`collada.scene.Scene.queryFrustum`.
+"""
+
+import heapq
+
+import numpy
+
+from collada.util import transformBounds
+
+
+class BVH(object):
+    """A bounding volume hierarchy over a set of boxes."""
+
+    def __init__(self, bounds, leafsize=8):
+        """Build the tree.
+
+        :param numpy.array bounds:
+          A numpy.array of shape (K, 2, 3) with the minimum and maximum
+          corners of the box of each item. Items whose box holds NaN are
+          left out of the tree.
+        :param int leafsize:
+          The largest number of items in a leaf of the tree
+
+        """
+        bounds = numpy.asarray(bounds, dtype=numpy.float32).reshape(-1, 2, 3)
+        self.bounds = bounds
+        """The numpy.array of shape (K, 2, 3) with the box of each item"""
+        self.leafsize = leafsize
+        """The largest number of items in a leaf of the tree"""
+
+        valid = numpy.flatnonzero(~numpy.isnan(bounds).any(axis=(1, 2)))
+        nleaves = max(1, -(-len(valid) // leafsize))
+        self.depth = int(numpy.ceil(numpy.log2(nleaves)))
+        """The number of levels of the tree below the root"""
+        nleaves = 1 << self.depth
+
+        order = valid[numpy.argsort(_mortonCodes(bounds[valid]), kind='mergesort')]
+        self._items = numpy.empty(nleaves * leafsize, dtype=numpy.int64)
+        self._items.fill(-1)
+        self._items[:len(order)] = order
+
+        # the nodes are stored like a binary heap, the children of node i
+        # are 2i+1 and 2i+2 and the leaves are the last nleaves nodes
+        self._lower = numpy.empty((2 * nleaves - 1, 3), dtype=numpy.float32)
+        self._upper = numpy.empty_like(self._lower)
+        padded = numpy.concatenate((bounds, [[[numpy.inf] * 3, [-numpy.inf] * 3]]))
+        leafboxes = padded[self._items].reshape(nleaves, leafsize, 2, 3)
+        self._lower[nleaves - 1:] = leafboxes[:, :, 0].min(axis=1)
+        self._upper[nleaves - 1:] = leafboxes[:, :, 1].max(axis=1)
+        for level in range(self.depth - 1, -1, -1):
+            first = (1 << level) - 1
+            nodes = slice(first, 2 * first + 1)
+            children = slice(2 * first + 1, 4 * first + 3)
+            self._lower[nodes] = numpy.minimum(self._lower[children][0::2],
+                                               self._lower[children][1::2])
+            self._upper[nodes] = numpy.maximum(self._upper[children][0::2],
+                                               self._upper[children][1::2])
+
+    def _traverse(self, nqueries, test):
+        # test(lower, upper, queries) gives a boolean mask of the boxes
+        # that the queries might touch; returns (queries, items) pairs
+        queries = numpy.arange(nqueries)
+        nodes = numpy.zeros(nqueries, dtype=numpy.int64)
+        for level in range(self.depth + 1):
+            lower = self._lower[nodes]
+            upper = self._upper[nodes]
+            hit = test(lower, upper, queries) & (lower[:, 0] <= upper[:, 0])
+            nodes = nodes[hit]
+            queries = queries[hit]
+            if level < self.depth:
+                nodes = (2 * nodes[:, numpy.newaxis] + [1, 2]).reshape(-1)
+                queries = numpy.repeat(queries, 2)
+
+        first = (nodes - ((1 << self.depth) - 1)) * self.leafsize
+        items = self._items[first[:, numpy.newaxis] + numpy.arange(self.leafsize)].reshape(-1)
+        queries = numpy.repeat(queries, self.leafsize)
+        keep = items >= 0
+        items = items[keep]
+        queries = queries[keep]
+        hit = test(self.bounds[items, 0], self.bounds[items, 1], queries)
+        return queries[hit], items[hit]
+
+    def queryBox(self, lower, upper):
+        """Returns a sorted int numpy.array with the items whose box
+        overlaps the box from `lower` to `upper`."""
+        lower = numpy.asarray(lower, dtype=numpy.float32)
+        upper = numpy.asarray(upper, dtype=numpy.float32)
+        def test(boxlower, boxupper, queries):
+            return (boxlower <= upper).all(axis=1) & (boxupper >= lower).all(axis=1)
+        return numpy.sort(self._traverse(1, test)[1])
+
+    def queryFrustum(self, planes):
+        """Returns a sorted int numpy.array with the items whose box is not
+        entirely on the outer side of one of `planes`. This keeps all the
+        boxes inside a convex volume like a view frustum, and a few of the
+        boxes close to its corners.
+
+        :param numpy.array planes:
+          A numpy.array of shape (P, 4) where each row ``(a, b, c, d)`` is a
+          plane whose inner side holds the points with
+          ``a*x + b*y + c*z + d >= 0``
+
+        """
+        planes = numpy.asarray(planes, dtype=numpy.float32).reshape(-1, 4)
+        def test(boxlower, boxupper, queries):
+            return _boxesInside(boxlower, boxupper, planes)
+        return numpy.sort(self._traverse(1, test)[1])
+
+    def intersectRays(self, origins, directions, maxdist=None):
+        """Find the items whose box is hit by rays.
+
+        :param numpy.array origins:
+          A numpy.array of shape (R, 3) with the origin of each ray
+        :param numpy.array directions:
+          A numpy.array of shape (R, 3) with the direction of each ray
+        :param float maxdist:
+          If given, boxes further than this along the rays are left out.
+          Distances are in multiples of the direction vectors.
+
+        :returns: A tuple ``(rays, items, distances)`` of numpy.arrays with
+          one entry for every box hit, where `distances` is where the ray
+          enters the box, or 0 if the ray starts inside it
+
+        """
+        origins = numpy.asarray(origins, dtype=numpy.float32).reshape(-1, 3)
+        directions = numpy.asarray(directions, dtype=numpy.float32).reshape(-1, 3)
+        if maxdist is None:
+            maxdist = numpy.inf
+        with numpy.errstate(divide='ignore'):
+            inverse = 1.0 / directions
+        def slabs(boxlower, boxupper, queries):
+            with numpy.errstate(invalid='ignore'):
+                t1 = (boxlower - origins[queries]) * inverse[queries]
+                t2 = (boxupper - origins[queries]) * inverse[queries]
+            # NaN comes from a ray running along a side of the box, which
+            # doesn't limit where it enters or leaves the box
+            near = numpy.fmax.reduce(numpy.fmin(t1, t2), axis=1)
+            far = numpy.fmin.reduce(numpy.fmax(t1, t2), axis=1)
+            return numpy.maximum(near, 0), far
+        def test(boxlower, boxupper, queries):
+            near, far = slabs(boxlower, boxupper, queries)
+            return (near <= far) & (near <= maxdist)
+        rays, items = self._traverse(len(origins), test)
+        near, far = slabs(self.bounds[items, 0], self.bounds[items, 1], rays)
+        return rays, items, near
+
+    def nearestItems(self, point, maxdist=None, matrix=None):
+        """Iterate through the items in order of the distance from `point`
+        to their box. The tree is walked best first: nodes are kept in a
+        heap by the distance to their box and only opened when they are the
+        closest left, so stopping early leaves most of the tree untouched.
+
+        :param numpy.array point:
+          The point to measure from
+        :param float maxdist:
+          If given, the items whose box is further than this are left out
+        :param numpy.array matrix:
+          If given, the boxes are first moved by this 4x4 matrix, with
+          :func:`collada.util.transformBounds`, and `point` is where the
+          boxes are moved to
+
+        :rtype: generator of ``(distance, item)`` tuples, where `distance`
+          is 0 for the items whose box holds `point`
+
+        """
+        point = numpy.asarray(point, dtype=numpy.float32).reshape(3)
+        if maxdist is None:
+            maxdist = numpy.inf
+        firstleaf = (1 << self.depth) - 1
+        # (distance, whether it is a node, node or item index), so that
+        # items come out before the nodes at the same distance
+        heap = [(0.0, True, 0)]
+        while heap:
+            distance, isnode, index = heapq.heappop(heap)
+            if distance > maxdist:
+                return
+            if not isnode:
+                yield distance, index
+                continue
+            if index >= firstleaf:
+                first = (index - firstleaf) * self.leafsize
+                entries = self._items[first:first + self.leafsize]
+                entries = entries[entries >= 0]
+                lower, upper = self.bounds[entries, 0], self.bounds[entries, 1]
+            else:
+                entries = numpy.array([2 * index + 1, 2 * index + 2])
+                lower, upper = self._lower[entries], self._upper[entries]
+                # subtrees without any item have an inverted box
+                keep = lower[:, 0] <= upper[:, 0]
+                entries, lower, upper = entries[keep], lower[keep], upper[keep]
+            childisnode = index < firstleaf
+            if matrix is not None:
+                moved = transformBounds(numpy.stack((lower, upper), axis=1), matrix)
+                lower, upper = moved[:, 0], moved[:, 1]
+            distances = _boxDistances(point, lower, upper)
+            for d, entry in zip(distances.tolist(), entries.tolist()):
+                heapq.heappush(heap, (d, childisnode, entry))
+
+    def __len__(self):
+        """Returns the number of items"""
+        return len(self.bounds)
+
+    def __str__(self):
+        return '<BVH items=%d, depth=%d>' % (len(self), self.depth)
+
+    def __repr__(self):
+        return str(self)
+
+
+class SceneBVH(object):
+    """Bounding volume hierarchies over the geometry of a scene.
+
+    Geometries instantiated by a <instance_controller> are used in their
+    bind pose, as in :meth:`collada.controller.Skin.bounds`. Only triangle
+    sets, polylists and polygons are searched, with the triangles of
+    polylists numbered as in :meth:`collada.polylist.Polylist.triangleset`.
+
+    Don't create this directly, use :meth:`collada.scene.FlattenedScene.bvh`.
+    """
+
+    def __init__(self, flattened):
+        instances, originals, codes, matrices, bounds = flattened._instanceBoxes()
+        self.instances = instances
+        """A list with the :class:`collada.scene.GeometryNode` or
+        :class:`collada.scene.ControllerNode` of each item of :attr:`bvh`"""
+        self.matrices = matrices
+        """A numpy.array of shape (K, 4, 4) with the world matrix of each
+        instance"""
+        self.bvh = BVH(bounds)
+        """The :class:`BVH` over the world boxes of :attr:`instances`"""
+        self._originals = originals
+        self._codes = codes
+        self._bounds = [o.bounds() for o in originals]
+        self._trianglesets = {}
+
+    def isCurrent(self):
+        """Returns True if none of the instantiated geometries changed since
+        this was built. See :meth:`collada.geometry.Geometry.bounds` for
+        the changes that are seen."""
+        return all(o.bounds() is b for o, b in zip(self._originals, self._bounds))
+
+    def _geometry(self, i):
+        # the geometry of an instance and the matrix to bind it to
+        original = self._originals[self._codes[i]]
+        matrix = self.matrices[i]
+        if hasattr(original, 'bind_shape_matrix'):
+            return original.geometry, numpy.dot(matrix, original.bind_shape_matrix)
+        if hasattr(original, 'source_geometry'):
+            return original.source_geometry, matrix
+        return original, matrix
+
+    def _triangleSets(self, geometry):
+        # (primitive index, triangle set) for each primitive with triangles
+        sets = self._trianglesets.get(id(geometry))
+        if sets is None:
+            sets = []
+            for i, prim in enumerate(geometry.primitives):
+                if hasattr(prim, 'triangleset'):
+                    prim = prim.triangleset()
+                if hasattr(prim, 'bvh') and len(prim) > 0:
+                    sets.append((i, prim))
+            self._trianglesets[id(geometry)] = sets
+        return sets
+
+    def _bind(self, i, geometry, matrix, primindex):
+        materialnodebysymbol = dict((m.symbol, m) for m in self.instances[i].materials)
+        return geometry.primitives[primindex].bind(matrix, materialnodebysymbol)
+
+    def raycast(self, origin, direction, maxdist=None):
+        """Find the first triangle hit by a ray.
+
+        :param numpy.array origin:
+          The start of the ray
+        :param numpy.array direction:
+          The direction of the ray. Distances are in multiples of it.
+        :param float maxdist:
+          If given, triangles further than this along the ray are ignored
+
+        :returns: ``None`` if no triangle is hit, otherwise a tuple
+          ``(distance, primitive, triangle)`` where `primitive` is the
+          bound primitive hit, a :class:`collada.triangleset.BoundTriangleSet`
+          or :class:`collada.polylist.BoundPolylist`, and `triangle` the
+          index of the triangle hit in it
+
+        """
+        origin = numpy.asarray(origin, dtype=numpy.float32).reshape(3)
+        direction = numpy.asarray(direction, dtype=numpy.float32).reshape(3)
+        best = numpy.inf if maxdist is None else maxdist
+        hit = None
+        rays, items, near = self.bvh.intersectRays(origin, direction, maxdist)
+        for distance, entry in sorted(zip(near, items)):
+            if distance > best:
+                break
+            geometry, matrix = self._geometry(entry)
+            try:
+                inverse = numpy.linalg.inv(matrix)
+            except numpy.linalg.LinAlgError:
+                continue
+            localorigin = numpy.dot(inverse[:3, :3], origin) + inverse[:3, 3]
+            localdirection = numpy.dot(inverse[:3, :3], direction)
+            for primindex, triset in self._triangleSets(geometry):
+                unused, triangles, unused = triset.bvh().intersectRays(
+                        localorigin, localdirection, best)
+                if len(triangles) == 0:
+                    continue
+                vertices = triset._vertex[triset._vertex_index[triangles]]
+                distances = intersectTriangles(localorigin, localdirection, vertices)
+                closest = numpy.argmin(distances)
+                if distances[closest] <= best:
+                    best = distances[closest]
+                    hit = (entry, geometry, matrix, primindex, triangles[closest])
+        if hit is None:
+            return None
+        entry, geometry, matrix, primindex, triangle = hit
+        return float(best), self._bind(entry, geometry, matrix, primindex), int(triangle)
+
+    def nearest(self, point, maxdist=None):
+        """Find the triangle closest to a point.
+
+        The instances are visited in order of the distance to their world
+        box and the triangles of each instance in order of the distance to
+        their box moved to the world, with :meth:`BVH.nearestItems`, until
+        the boxes left are further than the closest triangle found.
+
+        :param numpy.array point:
+          The point to measure from
+        :param float maxdist:
+          If given, triangles further than this are ignored
+
+        :returns: ``None`` if there is no triangle, otherwise a tuple
+          ``(distance, primitive, triangle)`` like :meth:`raycast`
+
+        """
+        point = numpy.asarray(point, dtype=numpy.float32).reshape(3)
+        best = numpy.inf if maxdist is None else maxdist
+        hit = None
+        for boxdist, entry in self.bvh.nearestItems(point, maxdist):
+            if boxdist > best:
+                break
+            geometry, matrix = self._geometry(entry)
+            for primindex, triset in self._triangleSets(geometry):
+                for boxdist, triangle in triset.bvh().nearestItems(point, best, matrix):
+                    if boxdist > best:
+                        break
+                    vertices = triset._vertex[triset._vertex_index[triangle]]
+                    vertices = numpy.dot(vertices, matrix[:3, :3].T) + matrix[:3, 3]
+                    distance = pointTriangleDistances(point, vertices[numpy.newaxis])[0]
+                    if distance <= best:
+                        best = distance
+                        hit = (entry, geometry, matrix, primindex, triangle)
+        if hit is None:
+            return None
+        entry, geometry, matrix, primindex, triangle = hit
+        return float(best), self._bind(entry, geometry, matrix, primindex), int(triangle)
+
+    def objectsInFrustum(self, planes, tipo='geometry'):
+        """Iterate through the geometry or controller instances whose world
+        box is not entirely on the outer side of one of `planes`, bound and
+        transformed like :meth:`collada.scene.Scene.objects`. Only the boxes
+        are tested, so the vertices of the instances left out are never
+        touched.
+
+        :param numpy.array planes:
+          A numpy.array of shape (P, 4) with a plane ``(a, b, c, d)`` per
+          row, as returned by :meth:`collada.camera.BoundCamera.frustumPlanes`
+        :param str tipo:
+          Either 'geometry' or 'controller'
+
+        :rtype: generator that yields the type specified
+
+        """
+        for entry in self.bvh.queryFrustum(planes):
+            for obj in self.instances[entry].objects(tipo, self.matrices[entry]):
+                yield obj
+
+    def queryFrustum(self, planes):
+        """Find the triangles that are not entirely on the outer side of one
+        of `planes`, as in :meth:`BVH.queryFrustum`.
+
+        :returns: A list of ``(primitive, triangles)`` tuples where
+          `primitive` is a bound primitive and `triangles` a sorted int
+          numpy.array with the indices of the triangles found in it. A
+          primitive instantiated several times is returned once for each
+          instance with triangles found.
+
+        """
+        planes = numpy.asarray(planes, dtype=numpy.float32).reshape(-1, 4)
+        found = []
+        for entry in self.bvh.queryFrustum(planes):
+            geometry, matrix = self._geometry(entry)
+            # a point p of the geometry is at matrix*p in the world
+            localplanes = numpy.dot(planes, matrix)
+            for primindex, triset in self._triangleSets(geometry):
+                triangles = triset.bvh().queryFrustum(localplanes)
+                if len(triangles) == 0:
+                    continue
+                vertices = triset._vertex[triset._vertex_index[triangles]]
+                distances = numpy.dot(vertices, localplanes[:, :3].T) + localplanes[:, 3]
+                triangles = triangles[~(distances < 0).all(axis=1).any(axis=1)]
+                if len(triangles) > 0:
+                    found.append((self._bind(entry, geometry, matrix, primindex), triangles))
+        return found
+
+    def queryBox(self, lower, upper):
+        """Find the triangles whose bounding box overlaps the box from
+        `lower` to `upper`. Returns a list like :meth:`queryFrustum`."""
+        lower = numpy.asarray(lower, dtype=numpy.float32)
+        upper = numpy.asarray(upper, dtype=numpy.float32)
+        identity = numpy.identity(3, dtype=numpy.float32)
+        planes = numpy.concatenate((numpy.column_stack((identity, -lower)),
+                                    numpy.column_stack((-identity, upper))))
+        return self.queryFrustum(planes)
+
+    def __str__(self):
+        return '<SceneBVH instances=%d>' % len(self.instances)
+
+    def __repr__(self):
+        return str(self)
+
+
+def intersectTriangles(origin, direction, triangles):
+    """Intersect a ray with triangles, from either side.
+
+    :param numpy.array origin:
+      The start of the ray
+    :param numpy.array direction:
+      The direction of the ray
+    :param numpy.array triangles:
+      A numpy.array of shape (N, 3, 3) with the points of the triangles
+
+    :returns: A numpy.array of shape (N,) with the distance along the ray,
+      in multiples of `direction`, where it hits each triangle, or
+      infinity for the triangles it misses
+
+    """
+    # Moller-Trumbore, for all the triangles at once
+    edge1 = triangles[:, 1] - triangles[:, 0]
+    edge2 = triangles[:, 2] - triangles[:, 0]
+    pvec = numpy.cross(direction, edge2)
+    det = numpy.einsum('ij,ij->i', edge1, pvec)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        invdet = 1.0 / det
+        tvec = origin - triangles[:, 0]
+        u = numpy.einsum('ij,ij->i', tvec, pvec) * invdet
+        qvec = numpy.cross(tvec, edge1)
+        v = numpy.dot(qvec, direction) * invdet
+        t = numpy.einsum('ij,ij->i', edge2, qvec) * invdet
+        hit = (det != 0) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0)
+    return numpy.where(hit, t, numpy.inf)
+
+def pointTriangleDistances(point, triangles):
+    """Returns the distances from a point to triangles.
+
+    :param numpy.array point:
+      The point to measure from
+    :param numpy.array triangles:
+      A numpy.array of shape (N, 3, 3) with the points of the triangles
+
+    :returns: A numpy.array of shape (N,) with the distance from `point` to
+      the closest point of each triangle
+
+    """
+    point = numpy.asarray(point, dtype=numpy.float64)
+    triangles = numpy.asarray(triangles, dtype=numpy.float64)
+    # the closest point is either the projection of the point on the plane
+    # of the triangle, when it falls inside, or on one of the edges
+    edgedist = numpy.full(len(triangles), numpy.inf)
+    normal = numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    inside = numpy.ones(len(triangles), dtype=bool)
+    for i in range(3):
+        start = triangles[:, i]
+        edge = triangles[:, (i + 1) % 3] - start
+        offset = point - start
+        inside &= numpy.einsum('ij,ij->i', numpy.cross(edge, offset), normal) >= 0
+        length = numpy.einsum('ij,ij->i', edge, edge)
+        along = numpy.einsum('ij,ij->i', offset, edge) / numpy.where(length > 0, length, 1)
+        closest = start + numpy.clip(along, 0, 1)[:, numpy.newaxis] * edge
+        edgedist = numpy.minimum(edgedist, numpy.sqrt(((point - closest) ** 2).sum(axis=1)))
+    area = numpy.sqrt(numpy.einsum('ij,ij->i', normal, normal))
+    inside &= area > 0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        planedist = numpy.abs(numpy.einsum('ij,ij->i', point - triangles[:, 0], normal)) / area
+    return numpy.where(inside, planedist, edgedist)
+
+def _boxDistances(point, lower, upper):
+    # the distance from a point to boxes, 0 inside them
+    outside = numpy.maximum(numpy.maximum(lower - point, point - upper), 0)
+    return numpy.sqrt((outside * outside).sum(axis=1))
+
+def _boxesInside(lower, upper, planes):
+    # for each box, whether its corner furthest along the normal of every
+    # plane is on the inner side
+    normals = planes[:, :3]
+    corners = numpy.where(normals >= 0, upper[:, numpy.newaxis], lower[:, numpy.newaxis])
+    return ((corners * normals).sum(axis=2) + planes[:, 3] >= 0).all(axis=1)
+
+def _mortonCodes(bounds):
+    # interleave the bits of the box centers quantized to 10 bits per axis
+    centers = (bounds[:, 0] + bounds[:, 1]) / 2
+    if len(centers) == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+    low = centers.min(axis=0)
+    extent = centers.max(axis=0) - low
+    scale = numpy.where(extent > 0, 1023 / numpy.where(extent > 0, extent, 1), 0)
+    quantized = ((centers - low) * scale).astype(numpy.int64)
+    codes = numpy.zeros(len(centers), dtype=numpy.int64)
+    for axis in range(3):
+        v = quantized[:, axis]
+        v = (v | (v << 16)) & 0x030000FF
+        v = (v | (v << 8)) & 0x0300F00F
+        v = (v | (v << 4)) & 0x030C30C3
+        v = (v | (v << 2)) & 0x09249249
+        codes |= v << (2 - axis)
+    return codes
@@ -0,0 +1,255 @@
+####################################################################
+#                                                                  #
+# THIS FILE IS PART OF THE pycollada LIBRARY SOURCE CODE.          #
+# USE, DISTRIBUTION AND REPRODUCTION OF THIS LIBRARY SOURCE IS     #
+# GOVERNED BY A BSD-STYLE SOURCE LICENSE INCLUDED WITH THIS SOURCE #
+# IN 'COPYING'. PLEASE READ THESE TERMS BEFORE DISTRIBUTING.       #
+#                                                                  #
+# THE pycollada SOURCE CODE IS (C) COPYRIGHT 2011                  #
+# by Jeff Terrace and contributors                                 #
+#                                                                  #
+####################################################################
+
+"""Module for caching the numeric arrays of loaded documents on disk.
+
+A :class:`DocumentCache` stores, for each document it has seen, a copy of
+the XML without the text of its large numeric arrays (the skeleton) and
+the arrays themselves in a raw binary file. When the same document is
+loaded again, the skeleton is parsed instead of the full document and the
+arrays are memory mapped from the binary file, so none of the numbers
+have to be converted from text again.
+
+Entries are keyed by a hash of the document content, so a modified
+document never uses a stale entry. The least recently used entries are
+deleted when the total size of the cache goes beyond its limit.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy
+
+from collada.common import tag
+from collada.xmlutil import etree as ElementTree
+from collada.xmlutil import HAVE_LXML
+
+
+FORMAT_VERSION = 1
+"""Version of the on-disk format. Entries with another version are ignored."""
+
+_ALIGNMENT = 8
+
+
+class DocumentCache(object):
+    """A directory holding cached copies of parsed documents.
+
+    Pass an instance (or a directory name) as the `cache` argument of
+    :class:`collada.Collada` to use it::
+
+        cache = DocumentCache('/tmp/collada-cache', max_size=2**30)
+        mesh = Collada('file.dae', cache=cache)
+
+    """
+
+    def __init__(self, directory, max_size=None):
+        """Create a cache stored in `directory`
+
+        :param str directory:
+          The directory holding the cache entries. It is created if needed.
+        :param int max_size:
+          Maximum total size in bytes of the entries in the cache. When
+          storing a new entry makes the cache larger than this, the least
+          recently used entries are deleted. ``None`` means no limit.
+
+        """
+        self.directory = directory
+        """The directory holding the cache entries"""
+        self.max_size = max_size
+        """Maximum total size in bytes of the cache, or ``None``"""
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def key(data):
+        """Returns the key of the entry for a document given its binary
+        content, either as a string or as a file-like object that is read
+        to the end in chunks."""
+        sha = hashlib.sha1()
+        if hasattr(data, 'read'):
+            for chunk in iter(lambda: data.read(1024*1024), b''):
+                sha.update(chunk)
+        else:
+            sha.update(data)
+        return sha.hexdigest()
+
+    def _entryPath(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """Load an entry from the cache.
+
+        :param str key:
+          The key of the document, as returned by :meth:`key`
+
+        :returns: ``None`` if there is no valid entry for `key`, otherwise a
+          tuple ``(xmlnode, arrays)`` where `xmlnode` is the ElementTree of
+          the skeleton and `arrays` is a dictionary mapping the elements of
+          the skeleton whose text was stripped to their memory mapped arrays.
+          The arrays are read-only, so all processes loading the same entry
+          share the same pages of memory.
+
+        """
+        entry = self._entryPath(key)
+        try:
+            with open(os.path.join(entry, 'index.json'), 'r') as f:
+                index = json.load(f)
+            if index.get('version') != FORMAT_VERSION or \
+                    index.get('lxml') != HAVE_LXML:
+                return None
+            xmlnode = ElementTree.ElementTree(file=os.path.join(entry, 'skeleton.dae'))
+            buf = None
+            if index['size'] > 0:
+                buf = numpy.memmap(os.path.join(entry, 'arrays.bin'),
+                                   dtype=numpy.uint8, mode='r')
+                if len(buf) != index['size']:
+                    return None
+        except (IOError, OSError, ValueError, KeyError, ElementTree.ParseError):
+            return None
+
+        positions = dict((pos, (dtype, offset, count))
+                         for pos, dtype, offset, count in index['arrays'])
+        arrays = {}
+        for pos, node in enumerate(xmlnode.getroot().iter()):
+            if pos in positions:
+                dtype, offset, count = positions[pos]
+                dtype = numpy.dtype(dtype)
+                if count == 0:
+                    arrays[node] = numpy.array([], dtype=dtype)
+                else:
+                    end = offset + count * dtype.itemsize
+                    arrays[node] = buf[offset:end].view(dtype=dtype, type=numpy.ndarray)
+        if len(arrays) != len(positions):
+            return None
+
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+        return xmlnode, arrays
+
+    def store(self, key, xmlnode, arrays):
+        """Store a document in the cache.
+
+        :param str key:
+          The key of the document, as returned by :meth:`key`
+        :param xmlnode:
+          The ElementTree of the loaded document
+        :param dict arrays:
+          A dictionary mapping elements of `xmlnode` to the numpy arrays
+          parsed from their text. Only the arrays of ``<geometry>`` and
+          ``<skin>`` elements are stored, the text of other elements is
+          kept in the skeleton.
+
+        """
+        root = xmlnode.getroot()
+        stripped = set()
+        for parent in list(root.iter(tag('geometry'))) + list(root.iter(tag('skin'))):
+            for node in parent.iter():
+                if node in arrays:
+                    stripped.add(node)
+
+        try:
+            tmpdir = tempfile.mkdtemp(prefix='tmp-', dir=self.directory)
+        except OSError:
+            return
+        try:
+            index = []
+            texts = []
+            offset = 0
+            with open(os.path.join(tmpdir, 'arrays.bin'), 'wb') as f:
+                for pos, node in enumerate(root.iter()):
+                    if node not in stripped:
+                        continue
+                    data = numpy.ascontiguousarray(arrays[node])
+                    index.append((pos, data.dtype.str, offset, int(data.size)))
+                    f.write(data.tobytes())
+                    offset += data.nbytes
+                    padding = -offset % _ALIGNMENT
+                    f.write(b'\0' * padding)
+                    offset += padding
+                    texts.append((node, node.text))
+                    node.text = None
+            try:
+                with open(os.path.join(tmpdir, 'skeleton.dae'), 'wb') as f:
+                    f.write(ElementTree.tostring(root))
+            finally:
+                for node, text in texts:
+                    node.text = text
+            with open(os.path.join(tmpdir, 'index.json'), 'w') as f:
+                json.dump({'version': FORMAT_VERSION, 'lxml': HAVE_LXML,
+                           'size': offset, 'arrays': index}, f)
+
+            entry = self._entryPath(key)
+            if os.path.exists(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            os.rename(tmpdir, entry)
+        except OSError:
+            # most likely another process stored the same entry
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self):
+        """Returns a list of ``(key, size, mtime)`` tuples for the entries in
+        the cache, least recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('tmp-') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, f))
+                           for f in os.listdir(path))
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            entries.append((name, size, mtime))
+        entries.sort(key=lambda e: e[2])
+        return entries
+
+    def size(self):
+        """Returns the total size in bytes of the entries in the cache"""
+        return sum(size for key, size, mtime in self.entries())
+
+    def evict(self, max_size=None):
+        """Delete the least recently used entries until the cache is no larger
+        than `max_size` bytes, which defaults to :attr:`max_size`."""
+        if max_size is None:
+            max_size = self.max_size
+        if max_size is None:
+            return
+        entries = self.entries()
+        total = sum(size for key, size, mtime in entries)
+        for key, size, mtime in entries:
+            if total <= max_size:
+                break
+            self.remove(key)
+            total -= size
+
+    def remove(self, key):
+        """Delete the entry for `key` from the cache"""
+        shutil.rmtree(self._entryPath(key), ignore_errors=True)
+
+    def clear(self):
+        """Delete all the entries in the cache"""
+        for key, size, mtime in self.entries():
+            self.remove(key)
+
+    def __str__(self):
+        return '<DocumentCache directory=%s>' % (self.directory,)
+
+    def __repr__(self):
+        return str(self)
@@ -338,7 +338,42 @@ class OrthographicCamera(Camera):
 
 class BoundCamera(object):
     """Base class for bound cameras"""
-    pass
+
+    def frustumPlanes(self, aspect_ratio=None):
+        """Returns the planes bounding the volume seen by the camera, in world
+        coordinates, for culling geometry outside of the view. Pass them to
+        :meth:`collada.scene.Scene.objectsInFrustum` to get the visible
+        objects of a scene.
+
+        :param float aspect_ratio:
+          The aspect ratio of the image, width over height, used when the
+          camera only defines its horizontal or its vertical extent.
+          Defaults to 1.
+
+        :returns: A numpy.array of shape (6, 4) with one plane ``(a, b, c, d)``
+          per row, in order near, far, left, right, bottom and top. The
+          points seen by the camera have ``a*x + b*y + c*z + d >= 0`` for all
+          the planes, and ``(a, b, c)`` is a unit vector pointing inwards.
+
+        """
+        # camera space planes, where the camera looks down -Z with +Y up
+        planes = self._localFrustumPlanes(aspect_ratio)
+        # a point p in the world is at inverse(matrix)*p in camera space
+        planes = numpy.dot(planes, numpy.linalg.inv(self.matrix))
+        return planes / numpy.sqrt((planes[:,:3] ** 2).sum(axis=1))[:,numpy.newaxis]
+
+    def _halfExtents(self, x, y, aspect_ratio):
+        # the half width and height of the view from the camera attributes
+        if x is None:
+            ratio = self.aspect_ratio or aspect_ratio or 1.0
+            x = y * ratio
+        elif y is None:
+            ratio = self.aspect_ratio or aspect_ratio or 1.0
+            y = x / ratio
+        return x, y
+
+    def _depthPlanes(self):
+        return [[0, 0, -1, -self.znear], [0, 0, 1, self.zfar]]
 
 class BoundPerspectiveCamera(BoundCamera):
     """Perspective camera bound to a scene with a transform. This gets created when a
@@ -366,6 +401,15 @@ class BoundPerspectiveCamera(BoundCamera):
         self.original = cam
         """Original :class:`collada.camera.PerspectiveCamera` object this is bound to."""
 
+    def _localFrustumPlanes(self, aspect_ratio):
+        tanx = numpy.tan(numpy.radians(self.xfov) / 2) if self.xfov is not None else None
+        tany = numpy.tan(numpy.radians(self.yfov) / 2) if self.yfov is not None else None
+        tanx, tany = self._halfExtents(tanx, tany, aspect_ratio)
+        # the sides go through the camera position, at x = tanx * -z
+        return numpy.array(self._depthPlanes() +
+                           [[1, 0, -tanx, 0], [-1, 0, -tanx, 0],
+                            [0, 1, -tany, 0], [0, -1, -tany, 0]], dtype=numpy.float64)
+
     def __str__(self):
         return '<BoundPerspectiveCamera bound to %s>' % self.original.id
 
@@ -398,6 +442,13 @@ class BoundOrthographicCamera(BoundCamera):
         self.original = cam
         """Original :class:`collada.camera.OrthographicCamera` object this is bound to."""
 
+    def _localFrustumPlanes(self, aspect_ratio):
+        # xmag and ymag are half the width and height of the view
+        xmag, ymag = self._halfExtents(self.xmag, self.ymag, aspect_ratio)
+        return numpy.array(self._depthPlanes() +
+                           [[1, 0, 0, xmag], [-1, 0, 0, xmag],
+                            [0, 1, 0, ymag], [0, -1, 0, ymag]], dtype=numpy.float64)
+
     def __str__(self):
         return '<BoundOrthographicCamera bound to %s>' % self.original.id
 
@@ -18,11 +18,124 @@ class DaeObject(object):
     not read-only, it will also have a :meth:`save` method which saves the
     object's information back to the :attr:`xmlnode` attribute.
 
+    Objects keep track of whether they were modified since they were loaded
+    or last saved by :meth:`collada.Collada.save`, so that saving a document
+    skips the objects that didn't change. Replacing an attribute or changing
+    the items of a list or dictionary attribute is detected automatically
+    and also marks the objects that contain or refer to the modified one.
+    Changes made in place inside numpy arrays are not, so call
+    :meth:`markDirty` after making them.
+
     """
 
     xmlnode = None
     """ElementTree representation of the data."""
 
+    # objects start out saved, objects created outside of loading a
+    # document are marked as modified when their attributes are first set
+    _dirty = False
+    # the objects holding this one, a single one or a dict of them by id
+    _parents = None
+    # the modified objects held by this one, by id
+    _modified = None
+    # whether a list or dictionary attribute was replaced or changed
+    _restructured = False
+    _untracked = frozenset(['xmlnode', '_dirty', '_parents', '_modified', '_restructured'])
+    """Attributes that don't mark the object as modified when set, for
+    example caches of values computed from the others."""
+
+    def __setattr__(self, name, value):
+        if (type(value) in _CONTAINER_TYPES or isinstance(value, DaeObject)) \
+                and name not in self._untracked:
+            value = _track(self, value)
+            object.__setattr__(self, name, value)
+            if not _loading:
+                object.__setattr__(self, '_restructured', True)
+                self._setDirty()
+            return
+        object.__setattr__(self, name, value)
+        if not _loading and name not in self._untracked:
+            self._setDirty()
+
+    def _setDirty(self, child=None):
+        # marks the object and records it in its parents, which are marked
+        # in turn unless they already were
+        stack = [(self, child)]
+        while stack:
+            obj, child = stack.pop()
+            if child is not None:
+                modified = obj._modified
+                if modified is None:
+                    object.__setattr__(obj, '_modified', {id(child): child})
+                else:
+                    modified[id(child)] = child
+            if obj._dirty:
+                continue
+            object.__setattr__(obj, '_dirty', True)
+            parents = obj._parents
+            if type(parents) is dict:
+                stack.extend((parent, obj) for parent in parents.values())
+            elif parents is not None:
+                stack.append((parents, obj))
+
+    def markDirty(self):
+        """Mark the object as modified so that the next save writes it to
+        :attr:`xmlnode` again. This is only needed after changes that can't
+        be detected, like modifying a numpy array in place. This also drops
+        the values cached from the arrays, like bounding boxes."""
+        global _inPlaceChanges
+        _inPlaceChanges += 1
+        self._setDirty()
+
+    def isDirty(self):
+        """Returns True if the object, or any object it contains or refers to,
+        was modified since it was loaded or last saved, meaning :meth:`save`
+        has to be called to update :attr:`xmlnode`."""
+        return self._dirty
+
+    def _needsSave(self):
+        """Returns True if :attr:`xmlnode` is missing data even though the
+        object wasn't modified, like array text released to save memory."""
+        return False
+
+    def _markClean(self, stop=None):
+        """Mark the object, and the modified objects it contains, as saved.
+        Objects for which `stop` returns True are not marked and not
+        descended into."""
+        stack = [self]
+        while stack:
+            obj = stack.pop()
+            object.__setattr__(obj, '_dirty', False)
+            object.__setattr__(obj, '_restructured', False)
+            modified = obj._modified
+            if modified:
+                object.__setattr__(obj, '_modified', None)
+                for child in modified.values():
+                    if child._dirty and (stop is None or not stop(child)):
+                        stack.append(child)
+
+    def _modifiedChildren(self):
+        """Returns the objects held by this one that were modified since it
+        was last saved."""
+        if not self._modified:
+            return []
+        return [child for child in self._modified.values() if child._dirty]
+
+    def _markNeedsSave(self, stop=None):
+        """Mark the objects under this one that need to be saved according
+        to :meth:`_needsSave` as modified. Objects for which `stop` returns
+        True are not descended into."""
+        seen = set([id(self)])
+        stack = [self]
+        while stack:
+            obj = stack.pop()
+            if obj._needsSave():
+                obj._setDirty()
+            for child in _children(obj):
+                if id(child) not in seen and (stop is None or not stop(child)):
+                    seen.add(id(child))
+                    stack.append(child)
+
     @staticmethod
     def load(collada, localscope, node):
         """Load and return a class instance from an XML node.
@@ -44,6 +157,189 @@ class DaeObject(object):
     def save(self):
         """Put all the data to the internal xml node (xmlnode) so it can be serialized."""
 
+_inPlaceChanges = 0
+"""Number of calls to :meth:`DaeObject.markDirty`, used to tell when values
+cached from numpy arrays may be out of date"""
+
+_loading = 0
+"""Set while a document is being loaded, when the objects created start out
+saved"""
+
+def _containerChanged(container, items=()):
+    # links the new items of a tracked container and marks its owner
+    owner = container._owner
+    _adoptAll(owner, items)
+    if not _loading:
+        object.__setattr__(owner, '_restructured', True)
+        owner._setDirty()
+
+class _TrackedList(list):
+    """A list held by a :class:`DaeObject` that marks it as modified when its
+    items change."""
+
+    __slots__ = ('_owner',)
+
+    _changed = _containerChanged
+
+    def __reduce_ex__(self, protocol):
+        return _restoreContainer, (_TrackedList, self._owner, list(self))
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = list(value)
+            list.__setitem__(self, index, value)
+            self._changed(value)
+        else:
+            list.__setitem__(self, index, value)
+            self._changed((value,))
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self._changed()
+
+    def __iadd__(self, values):
+        values = list(values)
+        list.extend(self, values)
+        self._changed(values)
+        return self
+
+    def __imul__(self, count):
+        list.__imul__(self, count)
+        self._changed()
+        return self
+
+    def append(self, value):
+        list.append(self, value)
+        self._changed((value,))
+
+    def extend(self, values):
+        values = list(values)
+        list.extend(self, values)
+        self._changed(values)
+
+    def insert(self, index, value):
+        list.insert(self, index, value)
+        self._changed((value,))
+
+    def pop(self, *args):
+        value = list.pop(self, *args)
+        self._changed()
+        return value
+
+    def remove(self, value):
+        list.remove(self, value)
+        self._changed()
+
+    def clear(self):
+        del self[:]
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self._changed()
+
+class _TrackedDict(dict):
+    """A dictionary held by a :class:`DaeObject` that marks it as modified
+    when its items change."""
+
+    __slots__ = ('_owner',)
+
+    _changed = _containerChanged
+
+    def __reduce_ex__(self, protocol):
+        return _restoreContainer, (_TrackedDict, self._owner, dict(self))
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._changed((value,))
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed()
+
+    def pop(self, *args):
+        value = dict.pop(self, *args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        self._changed()
+        return item
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+def _restoreContainer(kind, owner, items):
+    # copies and unpickled objects get containers tracked like the originals
+    container = kind(items)
+    container._owner = owner
+    return container
+
+_CONTAINER_TYPES = frozenset([list, dict, tuple, _TrackedList, _TrackedDict])
+
+def _track(owner, value):
+    """Prepares a value assigned to an attribute of `owner`: lists and
+    dictionaries are replaced by tracked copies and the objects found in
+    them are linked to `owner`. Returns the value to store."""
+    kind = type(value)
+    if kind is list or (kind is _TrackedList and value._owner is not owner):
+        value = _TrackedList(value)
+        value._owner = owner
+        _adoptAll(owner, value)
+    elif kind is dict or (kind is _TrackedDict and value._owner is not owner):
+        value = _TrackedDict(value)
+        value._owner = owner
+        _adoptAll(owner, value.values())
+    else:
+        _adoptAll(owner, (value,))
+    return value
+
+def _adoptAll(owner, items):
+    """Links the objects in `items`, looking into tuples, to `owner` so that
+    modifying them marks it. Those already modified mark it right away."""
+    for item in items:
+        if isinstance(item, DaeObject):
+            # most objects have a single parent, stored without a dict
+            parents = item._parents
+            if parents is None:
+                object.__setattr__(item, '_parents', owner)
+            elif type(parents) is dict:
+                parents[id(owner)] = owner
+            elif parents is not owner:
+                object.__setattr__(item, '_parents', {id(parents): parents, id(owner): owner})
+            if item._dirty:
+                owner._setDirty(item)
+        elif type(item) is tuple:
+            _adoptAll(owner, item)
+
+def _children(obj):
+    """Iterate through the :class:`DaeObject` found in the attributes of
+    `obj`, in its lists, dictionaries and tuples."""
+    pending = [value for name, value in vars(obj).items()
+               if name not in obj._untracked]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, DaeObject):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, dict):
+            pending.extend(value.values())
+
 class DaeError(Exception):
     """General DAE exception."""
     def __init__(self, msg):
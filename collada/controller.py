@@ -16,12 +16,14 @@
 
 import numpy
 
+from collada import common
 from collada import source
 from collada.common import DaeObject, tag
 from collada.common import DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
 from collada.geometry import Geometry
-from collada.util import checkSource
+from collada.util import checkSource, parseNumericText, loadArrayData, \
+    setArrayText, arrayTextNeeded, unionBounds, transformBounds
 from collada.xmlutil import etree as ElementTree
 
 
@@ -31,6 +33,12 @@ class Controller(DaeObject):
     def bind(self, matrix, materialnodebysymbol):
         pass
 
+    def bounds(self):
+        """Returns the axis-aligned bounding box of the controlled geometry
+        in its rest pose, as a numpy.array of shape ``(2, 3)``, or None if
+        it is empty."""
+        return None
+
     @staticmethod
     def load( collada, localscope, node ):
         controller = node.find(tag('skin'))
@@ -115,7 +123,7 @@ class Skin(Controller):
 
         if len(bind_shape_matrix) != 16:
             raise DaeMalformedError('Corrupted bind shape matrix in skin')
-        self.bind_shape_matrix.shape = (4,4)
+        self.bind_shape_matrix = self.bind_shape_matrix.reshape(4, 4)
 
         if not(joint_source in sourcebyid and joint_matrix_source in sourcebyid):
             raise DaeBrokenRefError("Input in joints not found")
@@ -124,8 +132,7 @@ class Skin(Controller):
         if not type(sourcebyid[joint_matrix_source]) is source.FloatSource:
             raise DaeIncompleteError("Could not find joint matrix source for skin")
         joint_names = [j for j in sourcebyid[joint_source]]
-        joint_matrices = sourcebyid[joint_matrix_source].data
-        joint_matrices.shape = (-1,4,4)
+        joint_matrices = sourcebyid[joint_matrix_source].data.reshape(-1, 4, 4)
         if len(joint_names) != len(joint_matrices):
             raise DaeMalformedError("Skin joint and matrix inputs must be same length")
         self.joint_matrices = {}
@@ -141,39 +148,231 @@ class Skin(Controller):
         self.weights = sourcebyid[weight_source]
         self.weight_joints = sourcebyid[weight_joint_source]
 
-        try:
-            newshape = []
-            at = 0
-            for ct in self.vcounts:
-                this_set = self.vertex_weight_index[self.nindices*at:self.nindices*(at+ct)]
-                this_set.shape = (ct, self.nindices)
-                newshape.append(numpy.array(this_set))
-                at+=ct
-            self.index = newshape
-        except:
+        vcounts = numpy.asarray(self.vcounts, dtype=numpy.int64)
+        offsets = numpy.zeros(len(vcounts) + 1, dtype=numpy.int64)
+        numpy.cumsum(vcounts, out=offsets[1:])
+        if (vcounts < 0).any() or offsets[-1] * self.nindices > len(self.vertex_weight_index):
             raise DaeMalformedError('Corrupted vcounts or index in skin weights')
-
-        try:
-            self.joint_index = [influence[:, self.offsets[0]] for influence in self.index]
-            self.weight_index = [influence[:, self.offsets[1]] for influence in self.index]
-        except:
-            raise DaeMalformedError('Corrupted joint or weight index in skin')
-
-        self.max_joint_index = numpy.max( [numpy.max(joint) if len(joint) > 0 else 0 for joint in self.joint_index] )
-        self.max_weight_index = numpy.max( [numpy.max(weight) if len(weight) > 0 else 0 for weight in self.weight_index] )
+        self.influence_offsets = offsets
+        """A numpy.array of shape (V+1,) where the influences on vertex ``i``
+        are the entries ``influence_offsets[i]`` to ``influence_offsets[i+1]``
+        of :attr:`influence_joints` and :attr:`influence_weights`"""
+        self._influences = numpy.asarray(self.vertex_weight_index).reshape(-1)[
+                :offsets[-1] * self.nindices].reshape(-1, self.nindices)
+        self.influence_joints = self._influences[:, self.offsets[0]]
+        """A numpy.array with the index in :attr:`weight_joints` of the
+        joint of each influence, or -1 for the bind shape"""
+
+        self.max_joint_index = self.influence_joints.max() if len(self.influence_joints) else 0
+        self.max_weight_index = self._influences[:, self.offsets[1]].max() if len(self._influences) else 0
         checkSource(self.weight_joints, ('JOINT',), self.max_joint_index)
         checkSource(self.weights, ('WEIGHT',), self.max_weight_index)
+        self.influence_weights = self.weights.data.reshape(-1)[self._influences[:, self.offsets[1]]]
+        """A numpy.array with the weight of each influence"""
+
+    index = property(lambda s: [s[i] for i in range(len(s))], doc=
+    """A list with, for each vertex, the rows of the <v> array of its
+    influences. Kept for compatibility, :attr:`influence_offsets` and the
+    arrays it indexes hold the same data without a list of arrays.""")
+
+    joint_index = property(lambda s: [s[i][:, s.offsets[0]] for i in range(len(s))], doc=
+    """A list with the joint indices of the influences of each vertex, see
+    :attr:`index`""")
+
+    weight_index = property(lambda s: [s[i][:, s.offsets[1]] for i in range(len(s))], doc=
+    """A list with the weight indices of the influences of each vertex, see
+    :attr:`index`""")
 
     def __len__(self):
-        return len(self.index)
+        return len(self.influence_offsets) - 1
 
     def __getitem__(self, i):
-        return self.index[i]
+        return self._influences[self.influence_offsets[i]:self.influence_offsets[i+1]]
+
+    def denseWeights(self, k=4, normalize=True):
+        """Returns the influences as fixed-size arrays with the same number
+        of joints for every vertex, as used for skinning on the GPU. The `k`
+        largest weights of each vertex are kept and vertices with fewer
+        influences are padded with joint 0 and weight 0.
+
+        :param int k:
+          The number of influences per vertex
+        :param bool normalize:
+          If True, the weights kept for each vertex are scaled to add up to
+          1, so dropping the smallest ones doesn't shrink the skin
+
+        :returns: A tuple ``(joints, weights)`` of numpy.arrays of shape
+          (V, k), with the joint indices in :attr:`weight_joints` and the
+          weights
+
+        """
+        nvertices = len(self)
+        counts = numpy.diff(self.influence_offsets)
+        width = max(k, counts.max() if nvertices else 0)
+        vertex = numpy.repeat(numpy.arange(nvertices), counts)
+        rank = numpy.arange(len(vertex)) - self.influence_offsets[vertex]
+        joints = numpy.zeros((nvertices, width), dtype=self.influence_joints.dtype)
+        weights = numpy.zeros((nvertices, width), dtype=self.influence_weights.dtype)
+        joints[vertex, rank] = self.influence_joints
+        weights[vertex, rank] = self.influence_weights
+        if width > k:
+            largest = numpy.argsort(-weights, axis=1, kind='mergesort')[:, :k]
+            joints = numpy.take_along_axis(joints, largest, axis=1)
+            weights = numpy.take_along_axis(weights, largest, axis=1)
+        if normalize:
+            total = weights.sum(axis=1)[:, numpy.newaxis]
+            weights = numpy.where(total > 0, weights / numpy.where(total > 0, total, 1), weights)
+        return joints, weights
 
     def bind(self, matrix, materialnodebysymbol):
         """Create a bound morph from this one, transform and material mapping"""
         return BoundSkin(self, matrix, materialnodebysymbol)
 
+    def bounds(self):
+        """Returns the bounding box of :attr:`geometry` transformed by the
+        bind shape matrix, which is where the skin is before being posed.
+        The result is cached like :meth:`collada.geometry.Geometry.bounds`."""
+        bounds = self.geometry.bounds()
+        cached = self._bounds
+        if cached is None or cached[0] is not bounds or \
+                cached[1] is not self.bind_shape_matrix:
+            skinbounds = None
+            if bounds is not None:
+                skinbounds = transformBounds(bounds, self.bind_shape_matrix)
+            cached = (bounds, self.bind_shape_matrix, skinbounds)
+            self._bounds = cached
+        return cached[2]
+
+    _untracked = Controller._untracked | frozenset(['_skinning', '_bounds'])
+
+    _bounds = None
+
+    _skinning = None
+    def _skinningArrays(self):
+        # the start of the influences of the vertices that have some,
+        # which vertices have some and the inverse bind matrix of each joint
+        cached = self._skinning
+        if cached is None or cached[0] != common._inPlaceChanges:
+            counts = numpy.diff(self.influence_offsets)
+            hasweights = counts > 0
+            starts = self.influence_offsets[:-1][hasweights]
+            try:
+                inverse_bind = numpy.array([self.joint_matrices[name]
+                                            for name in self.weight_joints])
+            except KeyError as ex:
+                raise DaeBrokenRefError('Joint %s of skin %s has no inverse bind matrix' %
+                                        (ex.args[0], self.id))
+            cached = (common._inPlaceChanges, starts, hasweights, inverse_bind.reshape(-1, 4, 4))
+            self._skinning = cached
+        return cached[1:]
+
+    def skinMatrices(self, joint_matrices):
+        """Computes the matrix moving each vertex of :attr:`geometry` from
+        its bind position to its posed position in the world, the weighted
+        sum of the matrices of the joints influencing it. This is linear
+        blend skinning done for all the vertices at once.
+
+        :param numpy.array joint_matrices:
+          A numpy.array of shape (J, 4, 4) with the world matrix of each
+          joint, in the order of :attr:`weight_joints`. A stack of poses of
+          shape (F, J, 4, 4) can be given to compute F poses at once.
+
+        :returns: A numpy.array of shape (V, 4, 4), or (F, V, 4, 4), with one
+          matrix per vertex of the position source of :attr:`geometry`. The
+          bind shape matrix and the inverse bind matrices are included.
+          Vertices without any influence only get the bind shape matrix.
+
+        """
+        starts, hasweights, inverse_bind = self._skinningArrays()
+        joints = self.influence_joints
+        weights = self.influence_weights
+        joint_matrices = numpy.asarray(joint_matrices)
+        if joint_matrices.shape[-3:] != inverse_bind.shape:
+            raise ValueError('Expected %d joint matrices for skin %s, got shape %s' %
+                             (len(inverse_bind), self.id, joint_matrices.shape))
+        skinning = numpy.matmul(numpy.matmul(joint_matrices, inverse_bind),
+                                self.bind_shape_matrix)
+        # the joint index -1 stands for the bind shape itself
+        poses = skinning.shape[:-3]
+        skinning = numpy.concatenate((skinning, numpy.broadcast_to(
+                self.bind_shape_matrix, poses + (1, 4, 4))), axis=-3)
+
+        matrices = numpy.empty(poses + (len(hasweights), 4, 4), dtype=skinning.dtype)
+        matrices[...] = self.bind_shape_matrix
+        if len(starts) > 0:
+            weighted = skinning[..., joints, :3, :] * weights[:, numpy.newaxis, numpy.newaxis]
+            matrices[..., hasweights, :3, :] = numpy.add.reduceat(weighted, starts, axis=-3)
+        return matrices
+
+    def skinVertices(self, joint_matrices):
+        """Computes the posed positions of the vertices of :attr:`geometry`.
+
+        :param numpy.array joint_matrices:
+          The world matrices of the joints, as for :meth:`skinMatrices`
+
+        :returns: A numpy.array of shape (V, 3), or (F, V, 3) for a stack of
+          poses, in the order of the position source of :attr:`geometry`
+
+        """
+        vertices = None
+        for prim in self.geometry.primitives:
+            if prim.vertex is not None:
+                vertices = prim.vertex
+                break
+        if vertices is None:
+            raise DaeIncompleteError('Geometry of skin %s has no vertices' % self.id)
+        if len(vertices) != len(self.vcounts):
+            raise DaeMalformedError('Skin %s has weights for %d vertices but its geometry has %d' %
+                                    (self.id, len(self.vcounts), len(vertices)))
+        matrices = self.skinMatrices(joint_matrices)
+        return numpy.einsum('...ij,...j->...i', matrices[..., :3, :3], vertices) + \
+                matrices[..., :3, 3]
+
+    def skinNormals(self, joint_matrices, primitive):
+        """Computes the posed normals of a primitive of :attr:`geometry`. The
+        normal at each point of a shape is turned by the matrix of its
+        vertex from :meth:`skinMatrices` and normalized.
+
+        :param numpy.array joint_matrices:
+          The world matrices of the joints, as for :meth:`skinMatrices`
+        :param primitive:
+          One of the primitives of :attr:`geometry`
+
+        :returns: None if the primitive has no normals, otherwise a
+          numpy.array with one normal per point, of shape
+          ``primitive.normal_index.shape + (3,)`` with a leading axis for a
+          stack of poses
+
+        """
+        if primitive.normal is None:
+            return None
+        matrices = self.skinMatrices(joint_matrices)[..., :3, :3]
+        normals = numpy.einsum('...ij,...j->...i',
+                               matrices[..., primitive.vertex_index, :, :],
+                               primitive.normal[primitive.normal_index])
+        lengths = numpy.sqrt((normals ** 2).sum(axis=-1))[..., numpy.newaxis]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.where(lengths > 0, normals / lengths, normals)
+
+    def _needsSave(self):
+        weightsnode = self.skin_node.find(tag('vertex_weights'))
+        return any(arrayTextNeeded(weightsnode.find(tag(name)))
+                   for name in ('vcount', 'v'))
+
+    def save(self):
+        """Writes the source and vertex weight arrays back to :attr:`xmlnode`
+        if their text was released. The skin is otherwise read-only."""
+        for src in self.sourcebyid.values():
+            if isinstance(src, source.FloatSource):
+                src._restoreArrayText()
+        weightsnode = self.skin_node.find(tag('vertex_weights'))
+        vcountnode = weightsnode.find(tag('vcount'))
+        if arrayTextNeeded(vcountnode):
+            setArrayText(vcountnode, self.vcounts)
+        indexnode = weightsnode.find(tag('v'))
+        if arrayTextNeeded(indexnode):
+            setArrayText(indexnode, self.vertex_weight_index)
+
     @staticmethod
     def load( collada, localscope, skinnode, controllernode ):
         if len(localscope) < 3:
@@ -189,14 +388,12 @@ class Skin(Controller):
 
         bind_shape_mat = skinnode.find(tag('bind_shape_matrix'))
         if bind_shape_mat is None:
-            bind_shape_mat = numpy.identity(4, dtype=numpy.float32)
-            bind_shape_mat.shape = (-1,)
+            bind_shape_mat = numpy.identity(4, dtype=numpy.float32).reshape(-1)
         else:
             try:
-                values = [ float(v) for v in bind_shape_mat.text.split()]
+                bind_shape_mat = parseNumericText(bind_shape_mat.text, numpy.float32)
             except ValueError:
                 raise DaeMalformedError('Corrupted bind shape matrix in skin')
-            bind_shape_mat = numpy.array( values, dtype=numpy.float32 )
 
         inputnodes = skinnode.findall('%s/%s'%(tag('joints'), tag('input')))
         if inputnodes is None or len(inputnodes) < 2:
@@ -229,10 +426,12 @@ class Skin(Controller):
         inputnodes = weightsnode.findall(tag('input'))
 
         try:
-            index = numpy.array([float(v)
-                for v in indexnode.text.split()], dtype=numpy.int32)
-            vcounts = numpy.array([int(v)
-                for v in vcountnode.text.split()], dtype=numpy.int32)
+            try:
+                index = loadArrayData(collada, indexnode, numpy.int32)
+            except DaeMalformedError:
+                # some exporters write the indices as floats
+                index = loadArrayData(collada, indexnode, numpy.float64).astype(numpy.int32)
+            vcounts = loadArrayData(collada, vcountnode, numpy.int32)
             inputs = [(i.get('semantic'), i.get('source'), int(i.get('offset')))
                            for i in inputnodes]
         except ValueError as ex:
@@ -267,15 +466,16 @@ class BoundSkin(BoundController):
         self.materialnodebysymbol = materialnodebysymbol
         self.skin = skin
         self.id = skin.id
-        self.index = skin.index
         self.joint_matrices = skin.joint_matrices
         self.geometry = skin.geometry.bind(numpy.dot(matrix,skin.bind_shape_matrix), materialnodebysymbol)
 
+    index = property(lambda s: s.skin.index)
+
     def __len__(self):
-        return len(self.index)
+        return len(self.skin)
 
     def __getitem__(self, i):
-        return self.index[i]
+        return self.skin[i]
 
     def getJoint(self, i):
         return self.skin.weight_joints[i]
@@ -308,7 +508,7 @@ class BoundSkinPrimitive(object):
 class Morph(Controller):
     """Class containing data collada holds in the <morph> tag"""
 
-    def __init__(self, source_geometry, target_list, xmlnode=None):
+    def __init__(self, source_geometry, target_list, xmlnode=None, method='NORMALIZED'):
         """Create a morph instance
 
         :Parameters:
@@ -319,6 +519,8 @@ class Morph(Controller):
             a Geometry (g) and a float weight value (w)
           xmlnode
             When loaded, the xmlnode it comes from
+          method
+            How the targets are combined, either 'NORMALIZED' or 'RELATIVE'
 
         """
         self.id = xmlnode.get('id')
@@ -329,9 +531,16 @@ class Morph(Controller):
         self.target_list = target_list
         """A list of tuples where each tuple (g,w) contains
             a Geometry (g) and a float weight value (w)"""
+        if method not in ('NORMALIZED', 'RELATIVE'):
+            raise DaeMalformedError("Morph method must be either NORMALIZED or RELATIVE. Found '%s'" % method)
+        self.method = method
+        """Either 'NORMALIZED', where the result is
+        ``(1 - sum(w)) * base + sum(w * target)``, or 'RELATIVE', where the
+        result is ``base + sum(w * target)``"""
 
+        # only the vertex positions are morphed, and changes to a morph are
+        # not written back by save()
         self.xmlnode = xmlnode
-        #TODO
 
     def __len__(self):
         return len(self.target_list)
@@ -343,6 +552,84 @@ class Morph(Controller):
         """Create a bound morph from this one, transform and material mapping"""
         return BoundMorph(self, matrix, materialnodebysymbol)
 
+    def bounds(self):
+        """Returns the bounding box containing the source geometry and all
+        the target geometries. The result is cached like
+        :meth:`collada.geometry.Geometry.bounds`."""
+        bounds = [self.source_geometry.bounds()] + \
+                 [target.bounds() for target, weight in self.target_list]
+        cached = self._bounds
+        if cached is None or len(cached[0]) != len(bounds) or \
+                any(a is not b for a, b in zip(cached[0], bounds)):
+            cached = (bounds, unionBounds(bounds))
+            self._bounds = cached
+        return cached[1]
+
+    def weights(self):
+        """Returns the weights of the targets in :attr:`target_list` as a
+        numpy.array of shape (T,)"""
+        return numpy.array([weight for target, weight in self.target_list], dtype=numpy.float32)
+
+    _untracked = Controller._untracked | frozenset(['_morphing', '_bounds'])
+
+    _bounds = None
+
+    _morphing = None
+    def _morphArrays(self):
+        # the base vertices and the (T, V, 3) stack of what each target
+        # adds to them for a weight of 1, built once
+        geometries = [self.source_geometry] + [target for target, weight in self.target_list]
+        arrays = []
+        for geometry in geometries:
+            vertices = None
+            for prim in geometry.primitives:
+                if prim.vertex is not None:
+                    vertices = prim.vertex
+                    break
+            if vertices is None:
+                raise DaeIncompleteError('Geometry %s of morph %s has no vertices' %
+                                         (geometry.id, self.id))
+            arrays.append(vertices)
+        # like the cache of Primitive.bounds, keyed on the vertex arrays
+        # themselves so that replacing one of them is noticed
+        cached = self._morphing
+        if cached is None or cached[0] != common._inPlaceChanges or \
+                cached[1] != self.method or len(cached[2]) != len(arrays) or \
+                not all(a is b for a, b in zip(arrays, cached[2])):
+            for geometry, vertices in zip(geometries[1:], arrays[1:]):
+                if len(vertices) != len(arrays[0]):
+                    raise DaeMalformedError('Target %s of morph %s does not have the same '
+                                            'number of vertices as its base' % (geometry.id, self.id))
+            base = arrays[0]
+            targets = numpy.array(arrays[1:], dtype=base.dtype).reshape(-1, len(base), 3)
+            if self.method == 'NORMALIZED':
+                targets -= base
+            cached = (common._inPlaceChanges, self.method, arrays, base, targets)
+            self._morphing = cached
+        return cached[3:]
+
+    def morphVertices(self, weights=None):
+        """Computes the vertices of the morphed geometry.
+
+        :param numpy.array weights:
+          The weight of each target, of shape (T,), or a batch of F weight
+          vectors of shape (F, T), for example one per frame of an
+          animation. Defaults to :meth:`weights`.
+
+        :returns: A numpy.array of shape (V, 3), or (F, V, 3), with the
+          positions of the vertices of the position source of
+          :attr:`source_geometry`, blended as described in :attr:`method`
+
+        """
+        base, targets = self._morphArrays()
+        if weights is None:
+            weights = self.weights()
+        weights = numpy.asarray(weights, dtype=targets.dtype)
+        if weights.shape[-1:] != (len(targets),):
+            raise ValueError('Expected %d weights for morph %s, got shape %s' %
+                             (len(targets), self.id, weights.shape))
+        return base + numpy.tensordot(weights, targets, axes=(-1, 0))
+
     @staticmethod
     def load( collada, localscope, morphnode, controllernode ):
         baseid = morphnode.get('source')
@@ -389,7 +676,7 @@ class Morph(Controller):
                 raise DaeBrokenRefError("Targeted geometry %s in morph not found"%target)
             target_list.append((collada.geometries[target], weight[0]))
 
-        return Morph(basegeom, target_list, controllernode)
+        return Morph(basegeom, target_list, controllernode, method)
 
     def save(self):
         #TODO
@@ -410,3 +697,9 @@ class BoundMorph(BoundController):
     def __getitem__(self, i):
         return self.original[i]
 
+    def morphVertices(self, weights=None):
+        """Computes the vertices of the morphed geometry like
+        :meth:`Morph.morphVertices`, transformed by :attr:`matrix`."""
+        vertices = self.original.morphVertices(weights)
+        return numpy.dot(vertices, self.matrix[:3,:3].T) + self.matrix[:3,3]
+
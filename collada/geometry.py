@@ -23,7 +23,9 @@ from collada import primitive
 from collada.common import DaeObject, E, tag
 from collada.common import DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
+from collada.util import unionBounds, transformBounds
 from collada.xmlutil import etree as ElementTree
+from collada.xmlutil import removeChildren
 
 
 class Geometry(DaeObject):
@@ -225,20 +227,19 @@ class Geometry(DaeObject):
     def save(self):
         """Saves the geometry back to :attr:`xmlnode`"""
         meshnode = self.xmlnode.find(tag('mesh'))
+        present = set(meshnode)
         for src in self.sourceById.values():
             if isinstance(src, source.Source):
-                src.save()
-                if src.xmlnode not in meshnode.getchildren():
+                if src.isDirty():
+                    src.save()
+                if src.xmlnode not in present:
                     meshnode.insert(0, src.xmlnode)
+                    present.add(src.xmlnode)
 
-        deletenodes = []
-        for oldsrcnode in meshnode.findall(tag('source')):
-            if oldsrcnode not in [src.xmlnode
-                    for src in self.sourceById.values()
-                    if isinstance(src, source.Source)]:
-                deletenodes.append(oldsrcnode)
-        for d in deletenodes:
-            meshnode.remove(d)
+        srcnodes = set(src.xmlnode for src in self.sourceById.values()
+                       if isinstance(src, source.Source))
+        removeChildren(meshnode, lambda child: child.tag != tag('source')
+                                               or child in srcnodes)
 
         #Look through primitives to find a vertex source
         vnode = self.xmlnode.find(tag('mesh')).find(tag('vertices'))
@@ -290,16 +291,16 @@ class Geometry(DaeObject):
         for prim in self.primitives:
             if type(prim) is triangleset.TriangleSet and prim.xmlnode.tag != tag('triangles'):
                 prim._recreateXmlNode()
-            if prim.xmlnode not in meshnode.getchildren():
+            else:
+                prim._restoreArrayText()
+            if prim.xmlnode not in present:
                 meshnode.append(prim.xmlnode)
+                present.add(prim.xmlnode)
 
-        deletenodes = []
-        primnodes = [prim.xmlnode for prim in self.primitives]
-        for child in meshnode.getchildren():
-            if child.tag != tag('vertices') and child.tag != tag('source') and child not in primnodes:
-                deletenodes.append(child)
-        for d in deletenodes:
-            meshnode.remove(d)
+        primnodes = set(prim.xmlnode for prim in self.primitives)
+        keeptags = (tag('vertices'), tag('source'))
+        removeChildren(meshnode, lambda child: child.tag in keeptags
+                                               or child in primnodes)
 
     def bind(self, matrix, materialnodebysymbol):
         """Binds this geometry to a transform matrix and material mapping.
@@ -318,6 +319,23 @@ class Geometry(DaeObject):
         """
         return BoundGeometry(self, matrix, materialnodebysymbol)
 
+    _untracked = DaeObject._untracked | frozenset(['_bounds'])
+    _bounds = None
+    def bounds(self):
+        """Returns the axis-aligned bounding box of the vertices used by the
+        primitives of the geometry. See :meth:`collada.primitive.Primitive.bounds`.
+
+        :returns: A numpy.array of shape ``(2, 3)`` with the minimum and the
+          maximum corners of the box, or None if the geometry is empty
+        """
+        primbounds = [prim.bounds() for prim in self.primitives]
+        cached = self._bounds
+        if cached is None or len(cached[0]) != len(primbounds) or \
+                any(a is not b for a, b in zip(cached[0], primbounds)):
+            cached = (primbounds, unionBounds(primbounds))
+            self._bounds = cached
+        return cached[1]
+
     def __str__(self):
         return '<Geometry id=%s, %d primitives>' % (self.id, len(self.primitives))
 
@@ -354,6 +372,28 @@ class BoundGeometry( object ):
             boundp = p.bind( self.matrix, self.materialnodebysymbol )
             yield boundp
 
+    def bounds(self):
+        """Returns the axis-aligned box containing the bounding box of the
+        original geometry once transformed by :attr:`matrix`. This doesn't
+        transform the vertices, so it can be larger than the box around the
+        transformed vertices when the matrix has a rotation.
+
+        :returns: A numpy.array of shape ``(2, 3)``, or None if the geometry
+          is empty
+        """
+        bounds = self.original.bounds()
+        if bounds is None:
+            return None
+        return transformBounds(bounds, self.matrix)
+
+    def vertexBuffers(self):
+        """Returns a list of ``(primitive, vertexbuffer)`` tuples, one for
+        each primitive of the geometry made of polygons or triangles, where
+        `primitive` is the bound primitive and `vertexbuffer` its
+        :class:`collada.vertexbuffer.VertexBuffer`. Line sets are left out."""
+        return [(boundp, boundp.vertexBuffer()) for boundp in self.primitives()
+                if hasattr(boundp, 'vertexBuffer')]
+
     def __str__(self):
         return '<BoundGeometry id=%s, %d primitives>' % (self.original.id, len(self))
 
@@ -15,7 +15,8 @@
 import numpy
 
 from collada import primitive
-from collada.util import toUnitVec, checkSource, xrange
+from collada.util import toUnitVec, checkSource, xrange, loadArrayData, \
+    formatNumericArray, setArrayText, arrayTextNeeded
 from collada.common import E, tag
 from collada.common import DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
@@ -76,10 +77,9 @@ class LineSet(primitive.Primitive):
 
         self.sources = sources
         self.material = material
-        self.index = index
-        self.indices = self.index
         self.nindices = max_offset + 1
-        self.index.shape = (-1, 2, self.nindices)
+        self.index = index.reshape(-1, 2, self.nindices)
+        self.indices = self.index
         self.nlines = len(self.index)
 
         if len(self.index) > 0:
@@ -124,10 +124,7 @@ class LineSet(primitive.Primitive):
             self.xmlnode = xmlnode
             """ElementTree representation of the line set."""
         else:
-            self.index.shape = (-1)
-            acclen = len(self.index)
-            txtindices = ' '.join(map(str, self.index.tolist()))
-            self.index.shape = (-1, 2, self.nindices)
+            txtindices = formatNumericArray(self.index)
 
             self.xmlnode = E.lines(count=str(self.nlines),
                     material=self.material)
@@ -148,6 +145,12 @@ class LineSet(primitive.Primitive):
         """The number of lines in this line set."""
         return len(self.index)
 
+    def _restoreArrayText(self):
+        """Writes the index array back to :attr:`xmlnode` if its text was released."""
+        pnode = self.xmlnode.find(tag('p'))
+        if pnode is not None and arrayTextNeeded(pnode):
+            setArrayText(pnode, self.index)
+
     def __getitem__(self, i):
         v = self._vertex[ self._vertex_index[i] ]
         if self._normal is None:
@@ -167,11 +170,7 @@ class LineSet(primitive.Primitive):
         source_array = primitive.Primitive._getInputs(collada, localscope, node.findall(tag('input')))
 
         try:
-            if indexnode.text is None or indexnode.text.isspace():
-                index = numpy.array([],  dtype=numpy.int32)
-            else:
-                index = numpy.fromstring(indexnode.text, dtype=numpy.int32, sep=' ')
-            index[numpy.isnan(index)] = 0
+            index = loadArrayData(collada, indexnode, numpy.int32)
         except: raise DaeMalformedError('Corrupted index in line set')
 
         lineset = LineSet(source_array, node.get('material'), index, node)
@@ -201,13 +200,7 @@ class BoundLineSet(primitive.BoundPrimitive):
     def __init__(self, ls, matrix, materialnodebysymbol):
         """Create a bound line set from a line set, transform and material mapping. This gets created when a
         line set is instantiated in a scene. Do not create this manually."""
-        M = numpy.asmatrix(matrix).transpose()
-        self._vertex = None
-        if ls._vertex is not None:
-            self._vertex = numpy.asarray(ls._vertex * M[:3,:3]) + matrix[:3,3]
-        self._normal = None
-        if ls._normal is not None:
-            self._normal = numpy.asarray(ls._normal * M[:3,:3])
+        self._bindData(ls, matrix)
         self._texcoordset = ls._texcoordset
         matnode = materialnodebysymbol.get( ls.material )
         if matnode:
@@ -27,6 +27,7 @@ from collada.common import DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
 from collada.util import falmostEqual, BytesIO
 from collada.xmlutil import etree as ElementTree
+from collada.xmlutil import removeChildren
 
 try:
     from PIL import Image as pil
@@ -705,18 +706,17 @@ class Effect(DaeObject):
 
         self._fixColorValues()
 
+        present = set(profilenode)
         for param in self.params:
             param.save()
-            if param.xmlnode not in profilenode.getchildren():
+            if param.xmlnode not in present:
                 profilenode.insert(list(profilenode).index(tecnode),
                         param.xmlnode)
+                present.add(param.xmlnode)
 
-        deletenodes = []
-        for oldparam in profilenode.findall( tag('newparam') ):
-            if oldparam not in [param.xmlnode for param in self.params]:
-                deletenodes.append(oldparam)
-        for d in deletenodes:
-            profilenode.remove(d)
+        paramnodes = set(param.xmlnode for param in self.params)
+        removeChildren(profilenode, lambda child: child.tag != tag('newparam')
+                                                  or child in paramnodes)
 
         for shader in self.shaders:
             shadnode = tecnode.find(tag(shader))
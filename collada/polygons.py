@@ -20,7 +20,8 @@ from collada import triangleset
 from collada.common import E, tag
 from collada.common import DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
-from collada.util import toUnitVec, checkSource
+from collada.util import toUnitVec, checkSource, loadArrayData, \
+    formatNumericArray, setArrayText, arrayTextNeeded
 from collada.xmlutil import etree as ElementTree
 
 
@@ -73,7 +74,14 @@ class Polygons(polylist.Polylist):
                 self.xmlnode.append(inpnode)
 
             for poly in polygons:
-                self.xmlnode.append(E.p(' '.join(map(str, poly.flatten().tolist()))))
+                self.xmlnode.append(E.p(formatNumericArray(poly)))
+
+    def _restoreArrayText(self):
+        """Writes the polygon index arrays back to :attr:`xmlnode` if their
+        text was released."""
+        for pnode, (start, end) in zip(self.xmlnode.findall(tag('p')), self.polyindex):
+            if arrayTextNeeded(pnode):
+                setArrayText(pnode, self.index[start:end])
 
     @staticmethod
     def load( collada, localscope, node ):
@@ -82,9 +90,7 @@ class Polygons(polylist.Polylist):
 
         polygon_indices = []
         for indexnode in indexnodes:
-            index = numpy.fromstring(indexnode.text, dtype=numpy.int32, sep=' ')
-            index[numpy.isnan(index)] = 0
-            polygon_indices.append(index)
+            polygon_indices.append(loadArrayData(collada, indexnode, numpy.int32))
 
         all_inputs = primitive.Primitive._getInputs(collada, localscope, node.findall(tag('input')))
 
@@ -19,7 +19,8 @@ from collada import triangleset
 from collada.common import E, tag
 from collada.common import DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
-from collada.util import toUnitVec, checkSource, xrange
+from collada.util import toUnitVec, checkSource, xrange, loadArrayData, \
+    formatNumericArray, setArrayText, arrayTextNeeded
 from collada.xmlutil import etree as ElementTree
 
 
@@ -135,12 +136,11 @@ class Polylist(primitive.Primitive):
                           for input_type_array in sources.values() if len(input_type_array) > 0])
 
         self.material = material
-        self.index = index
-        self.indices = self.index
         self.nindices = max_offset + 1
+        self.index = index.reshape(-1, self.nindices)
+        self.indices = self.index
         self.vcounts = vcounts
         self.sources = sources
-        self.index.shape = (-1, self.nindices)
         self.npolygons = len(self.vcounts)
         self.nvertices = numpy.sum(self.vcounts) if len(self.index) > 0 else 0
         self.polyends = numpy.cumsum(self.vcounts)
@@ -186,7 +186,7 @@ class Polylist(primitive.Primitive):
             self.xmlnode = xmlnode
             """ElementTree representation of the line set."""
         else:
-            txtindices = ' '.join(map(str, self.indices.flatten().tolist()))
+            txtindices = formatNumericArray(self.indices)
             acclen = len(self.indices)
 
             self.xmlnode = E.polylist(count=str(self.npolygons),
@@ -202,13 +202,23 @@ class Polylist(primitive.Primitive):
                     inpnode.set('set', str(set))
                 self.xmlnode.append(inpnode)
 
-            vcountnode = E.vcount(' '.join(map(str, self.vcounts)))
+            vcountnode = E.vcount(formatNumericArray(self.vcounts))
             self.xmlnode.append(vcountnode)
             self.xmlnode.append(E.p(txtindices))
 
     def __len__(self):
         return self.npolygons
 
+    def _restoreArrayText(self):
+        """Writes the vcount and index arrays back to :attr:`xmlnode` if
+        their text was released."""
+        vcountnode = self.xmlnode.find(tag('vcount'))
+        if vcountnode is not None and arrayTextNeeded(vcountnode):
+            setArrayText(vcountnode, self.vcounts)
+        pnode = self.xmlnode.find(tag('p'))
+        if pnode is not None and arrayTextNeeded(pnode):
+            setArrayText(pnode, self.index)
+
     def __getitem__(self, i):
         polyrange = self.polyindex[i]
         vertindex = self._vertex_index[polyrange[0]:polyrange[1]]
@@ -229,6 +239,8 @@ class Polylist(primitive.Primitive):
 
         return Polygon(vertindex, v, normalindex, n, uvindices, uv, self.material)
 
+    _untracked = primitive.Primitive._untracked | frozenset(['_triangleset'])
+
     _triangleset = None
     def triangleset(self):
         """This performs a simple triangulation of the polylist using the fanning method.
@@ -259,6 +271,14 @@ class Polylist(primitive.Primitive):
             self._triangleset = triset
         return self._triangleset
 
+    def vertexBuffer(self):
+        """Returns the triangulated polylist as an interleaved vertex buffer
+        with a single index, as needed by graphics APIs.
+
+        :rtype: :class:`collada.vertexbuffer.VertexBuffer`
+        """
+        return self.triangleset().vertexBuffer()
+
     @staticmethod
     def load( collada, localscope, node ):
         indexnode = node.find(tag('p'))
@@ -267,22 +287,14 @@ class Polylist(primitive.Primitive):
         if vcountnode is None: raise DaeIncompleteError('Missing vcount in polylist')
 
         try:
-            if vcountnode.text is None or vcountnode.text.isspace():
-                vcounts = numpy.array([], dtype=numpy.int32)
-            else:
-                vcounts = numpy.fromstring(vcountnode.text, dtype=numpy.int32, sep=' ')
-            vcounts[numpy.isnan(vcounts)] = 0
+            vcounts = loadArrayData(collada, vcountnode, numpy.int32)
         except ValueError as ex:
             raise DaeMalformedError('Corrupted vcounts in polylist')
 
         all_inputs = primitive.Primitive._getInputs(collada, localscope, node.findall(tag('input')))
 
         try:
-            if indexnode.text is None or indexnode.text.isspace():
-                index = numpy.array([], dtype=numpy.int32)
-            else:
-                index = numpy.fromstring(indexnode.text, dtype=numpy.int32, sep=' ')
-            index[numpy.isnan(index)] = 0
+            index = loadArrayData(collada, indexnode, numpy.int32)
         except: raise DaeMalformedError('Corrupted index in polylist')
 
         polylist = Polylist(all_inputs, node.get('material'), index, vcounts, node)
@@ -310,9 +322,7 @@ class BoundPolylist(primitive.BoundPrimitive):
     def __init__(self, pl, matrix, materialnodebysymbol):
         """Create a bound polylist from a polylist, transform and material mapping.
         This gets created when a polylist is instantiated in a scene. Do not create this manually."""
-        M = numpy.asmatrix(matrix).transpose()
-        self._vertex = None if pl._vertex is None else numpy.asarray(pl._vertex * M[:3,:3]) + matrix[:3,3]
-        self._normal = None if pl._normal is None else numpy.asarray(pl._normal * M[:3,:3])
+        self._bindData(pl, matrix)
         self._texcoordset = pl._texcoordset
         matnode = materialnodebysymbol.get( pl.material )
         if matnode:
@@ -326,7 +336,6 @@ class BoundPolylist(primitive.BoundPrimitive):
         self._texcoord_indexset = pl._texcoord_indexset
         self.polyindex = pl.polyindex
         self.npolygons = pl.npolygons
-        self.matrix = matrix
         self.materialnodebysymbol = materialnodebysymbol
         self.original = pl
 
@@ -364,6 +373,15 @@ class BoundPolylist(primitive.BoundPrimitive):
             self._triangleset = boundtriset
         return self._triangleset
 
+    def vertexBuffer(self):
+        """Returns the triangulated polylist as an interleaved vertex buffer
+        with a single index, as needed by graphics APIs. The vertices are
+        transformed by the bound matrix.
+
+        :rtype: :class:`collada.vertexbuffer.VertexBuffer`
+        """
+        return self.triangleset().vertexBuffer()
+
     def polygons(self):
         """Iterate through all the polygons contained in the set.
 
@@ -14,10 +14,12 @@
 import numpy
 import types
 
-from collada.common import DaeObject
+from collada import common
+from collada.common import DaeObject, tag
 from collada.common import DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
 from collada.source import InputList
+from collada.util import arrayTextNeeded, pointBounds
 
 class Primitive(DaeObject):
     """Base class for all primitive sets like TriangleSet, LineSet, Polylist, etc."""
@@ -65,6 +67,35 @@ class Primitive(DaeObject):
     ``texbinormalset[0][texbinormal_indexset[0]]`` would select the first set of texture
     binormals.""" )
 
+    _untracked = DaeObject._untracked | frozenset(['_bounds'])
+    _bounds = None
+    def bounds(self):
+        """Returns the axis-aligned bounding box of the vertices used by the
+        primitive. Points of the vertex source that no shape refers to are
+        left out. The result is cached until the vertex or index arrays are
+        replaced or :meth:`~collada.common.DaeObject.markDirty` is called.
+
+        :returns: A numpy.array of shape ``(2, 3)`` with the minimum and the
+          maximum corners of the box, or None if the primitive is empty
+        """
+        cached = self._bounds
+        if cached is None or cached[0] is not self._vertex or \
+                cached[1] is not self._vertex_index or \
+                cached[2] != common._inPlaceChanges:
+            bounds = None
+            if self._vertex is not None and self._vertex_index is not None:
+                used = numpy.zeros(len(self._vertex), dtype=bool)
+                used[numpy.asarray(self._vertex_index).reshape(-1)] = True
+                bounds = pointBounds(self._vertex[used])
+            cached = (self._vertex, self._vertex_index, common._inPlaceChanges, bounds)
+            self._bounds = cached
+        return cached[3]
+
+    def _needsSave(self):
+        arraytags = (tag('p'), tag('vcount'))
+        return any(node.tag in arraytags and arrayTextNeeded(node)
+                   for node in self.xmlnode)
+
     def bind(self, matrix, materialnodebysymbol):
         """Binds this primitive to a transform matrix and material mapping.
         The primitive's points get transformed by the given matrix and its
@@ -183,7 +214,48 @@ class Primitive(DaeObject):
 
 class BoundPrimitive(object):
     """A :class:`collada.primitive.Primitive` bound to a transform matrix
-    and material mapping."""
+    and material mapping.
+
+    The vertices and normals are only transformed by the matrix the first
+    time they are used, so binding a primitive is cheap. Consumers that
+    can apply the matrix themselves, like a renderer drawing many instances
+    of the same geometry, can use :attr:`local_vertex` and
+    :attr:`local_normal` together with :attr:`matrix`, which share the data
+    of the original primitive instead of copying it.
+    """
+
+    matrix = None
+    """The 4x4 transform matrix the primitive is bound to"""
+
+    def _bindData(self, prim, matrix):
+        """Keep the untransformed vertices and normals of `prim` to transform
+        them by `matrix` on first use."""
+        self.matrix = matrix
+        self._localVertex = prim._vertex
+        self._localNormal = prim._normal
+        self._transformedVertex = _PENDING
+        self._transformedNormal = _PENDING
+
+    def _getVertex(self):
+        if self._transformedVertex is _PENDING:
+            self._transformedVertex = None if self._localVertex is None else \
+                    numpy.dot(self._localVertex, self.matrix[:3,:3].T) + self.matrix[:3,3]
+        return self._transformedVertex
+
+    def _setVertex(self, vertex):
+        self._transformedVertex = vertex
+
+    def _getNormal(self):
+        if self._transformedNormal is _PENDING:
+            self._transformedNormal = None if self._localNormal is None else \
+                    numpy.dot(self._localNormal, self.matrix[:3,:3].T)
+        return self._transformedNormal
+
+    def _setNormal(self, normal):
+        self._transformedNormal = normal
+
+    _vertex = property(_getVertex, _setVertex)
+    _normal = property(_getNormal, _setNormal)
 
     def shapes(self):
         """Iterate through the items in this primitive. The shape returned
@@ -198,6 +270,13 @@ class BoundPrimitive(object):
     """Read-only numpy.array of size Nx3 where N is the number of normal values in the
     primitive's normal source array. The values will be transformed according to the
     bound transformation matrix.""" )
+    local_vertex = property( lambda s: s._localVertex, doc=
+    """Read-only numpy.array of size Nx3 with the vertex points of the original
+    primitive, not transformed by :attr:`matrix`. This is the same array as in
+    the original primitive, so it is shared by all its instances.""" )
+    local_normal = property( lambda s: s._localNormal, doc=
+    """Read-only numpy.array of size Nx3 with the normals of the original
+    primitive, not transformed by :attr:`matrix`, or None.""" )
     texcoordset = property( lambda s: s._texcoordset, doc=
     """Read-only tuple of texture coordinate arrays. Each value is a numpy.array of size
     Nx2 where N is the number of texture coordinates in the primitive's source array. The
@@ -218,3 +297,5 @@ class BoundPrimitive(object):
     coordinates, one can use the array to select into the texcoordset array, e.g.
     ``texcoordset[0][texcoord_indexset[0]]`` would select the first set of texture
     coordinates. The values will be transformed according to the bound transformation matrix.""" )
+
+_PENDING = object()
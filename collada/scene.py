@@ -26,11 +26,14 @@ Supported scene nodes are:
 import copy
 import numpy
 
+from collada.animation import evaluateSamplers
+from collada.bvh import SceneBVH
 from collada.common import DaeObject, E, tag
 from collada.common import DaeError, DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
-from collada.util import toUnitVec
+from collada.util import toUnitVec, parseNumericText, transformBounds
 from collada.xmlutil import etree as ElementTree
+from collada.xmlutil import removeChildren
 
 
 class DaeInstanceNotLoadedError(Exception):
@@ -75,9 +78,34 @@ def makeRotationMatrix(x, y, z, angle):
 class Transform(DaeObject):
     """Base class for all transformation types"""
 
+    # index in _parameters() of the members animation channels can target
+    _members = {}
+
     def save(self):
         pass
 
+    def _parameters(self):
+        # the values of the transform as an array, the matrix by default
+        return numpy.asarray(self.matrix, dtype=numpy.float32).reshape(-1)
+
+    @staticmethod
+    def _matrices(parameters):
+        # the matrices for an array of shape (..., P) of parameters
+        return parameters.reshape(parameters.shape[:-1] + (4, 4))
+
+    def _parameterIndex(self, member):
+        # the indices in _parameters() set by a channel with this member,
+        # or None if it cannot be animated
+        count = len(self._parameters())
+        if member is None:
+            return numpy.arange(count)
+        if isinstance(member, tuple):
+            index = member[0] * 4 + member[1] if len(member) == 2 else member[0]
+            return numpy.array([index]) if index < count else None
+        if member in self._members:
+            return numpy.array([self._members[member]])
+        return None
+
 
 class TranslateTransform(Transform):
     """Contains a translation transformation as defined in the collada <translate> tag."""
@@ -111,11 +139,23 @@ class TranslateTransform(Transform):
 
     @staticmethod
     def load(collada, node):
-        floats = numpy.fromstring(node.text, dtype=numpy.float32, sep=' ')
+        floats = parseNumericText(node.text, numpy.float32)
         if len(floats) != 3:
             raise DaeMalformedError("Translate node requires three float values")
         return TranslateTransform(floats[0], floats[1], floats[2], node)
 
+    _members = {'X': 0, 'Y': 1, 'Z': 2}
+
+    def _parameters(self):
+        return numpy.array([self.x, self.y, self.z], dtype=numpy.float32)
+
+    @staticmethod
+    def _matrices(parameters):
+        matrices = numpy.zeros(parameters.shape[:-1] + (4, 4), dtype=numpy.float32)
+        matrices[..., [0, 1, 2, 3], [0, 1, 2, 3]] = 1
+        matrices[..., :3, 3] = parameters
+        return matrices
+
     def __str__(self):
         return '<TranslateTransform (%s, %s, %s)>' % (self.x, self.y, self.z)
 
@@ -158,11 +198,37 @@ class RotateTransform(Transform):
 
     @staticmethod
     def load(collada, node):
-        floats = numpy.fromstring(node.text, dtype=numpy.float32, sep=' ')
+        floats = parseNumericText(node.text, numpy.float32)
         if len(floats) != 4:
             raise DaeMalformedError("Rotate node requires four float values")
         return RotateTransform(floats[0], floats[1], floats[2], floats[3], node)
 
+    _members = {'X': 0, 'Y': 1, 'Z': 2, 'ANGLE': 3}
+
+    def _parameters(self):
+        return numpy.array([self.x, self.y, self.z, self.angle], dtype=numpy.float32)
+
+    @staticmethod
+    def _matrices(parameters):
+        # the same as makeRotationMatrix for arrays of axes and angles
+        x, y, z = parameters[..., 0], parameters[..., 1], parameters[..., 2]
+        angle = parameters[..., 3] * (numpy.pi / 180.0)
+        c = numpy.cos(angle)
+        s = numpy.sin(angle)
+        t = 1 - c
+        matrices = numpy.zeros(parameters.shape[:-1] + (4, 4), dtype=numpy.float32)
+        matrices[..., 0, 0] = t*x*x + c
+        matrices[..., 0, 1] = t*x*y - s*z
+        matrices[..., 0, 2] = t*x*z + s*y
+        matrices[..., 1, 0] = t*x*y + s*z
+        matrices[..., 1, 1] = t*y*y + c
+        matrices[..., 1, 2] = t*y*z - s*x
+        matrices[..., 2, 0] = t*x*z - s*y
+        matrices[..., 2, 1] = t*y*z + s*x
+        matrices[..., 2, 2] = t*z*z + c
+        matrices[..., 3, 3] = 1
+        return matrices
+
     def __str__(self):
         return '<RotateTransform (%s, %s, %s) angle=%s>' % (self.x, self.y, self.z, self.angle)
 
@@ -204,11 +270,23 @@ class ScaleTransform(Transform):
 
     @staticmethod
     def load(collada, node):
-        floats = numpy.fromstring(node.text, dtype=numpy.float32, sep=' ')
+        floats = parseNumericText(node.text, numpy.float32)
         if len(floats) != 3:
             raise DaeMalformedError("Scale node requires three float values")
         return ScaleTransform(floats[0], floats[1], floats[2], node)
 
+    _members = {'X': 0, 'Y': 1, 'Z': 2}
+
+    def _parameters(self):
+        return numpy.array([self.x, self.y, self.z], dtype=numpy.float32)
+
+    @staticmethod
+    def _matrices(parameters):
+        matrices = numpy.zeros(parameters.shape[:-1] + (4, 4), dtype=numpy.float32)
+        matrices[..., [0, 1, 2], [0, 1, 2]] = parameters
+        matrices[..., 3, 3] = 1
+        return matrices
+
     def __str__(self):
         return '<ScaleTransform (%s, %s, %s)>' % (self.x, self.y, self.z)
 
@@ -239,7 +317,7 @@ class MatrixTransform(Transform):
 
     @staticmethod
     def load(collada, node):
-        floats = numpy.fromstring(node.text, dtype=numpy.float32, sep=' ')
+        floats = parseNumericText(node.text, numpy.float32)
         return MatrixTransform(floats, node)
 
     def __str__(self):
@@ -292,11 +370,30 @@ class LookAtTransform(Transform):
                                         numpy.concatenate((self.eye, self.interest, self.upvector)) )))
     @staticmethod
     def load(collada, node):
-        floats = numpy.fromstring(node.text, dtype=numpy.float32, sep=' ')
+        floats = parseNumericText(node.text, numpy.float32)
         if len(floats) != 9:
             raise DaeMalformedError("Lookat node requires 9 float values")
         return LookAtTransform(floats[0:3], floats[3:6], floats[6:9], node)
 
+    def _parameters(self):
+        return numpy.concatenate((self.eye, self.interest, self.upvector)).astype(numpy.float32)
+
+    @staticmethod
+    def _matrices(parameters):
+        # laid out the same way as the matrix of a single lookat
+        eye, interest, up = parameters[..., 0:3], parameters[..., 3:6], parameters[..., 6:9]
+        front = eye - interest
+        front = front / numpy.linalg.norm(front, axis=-1)[..., numpy.newaxis]
+        side = numpy.cross(front, up)
+        side = -side / numpy.linalg.norm(side, axis=-1)[..., numpy.newaxis]
+        matrices = numpy.zeros(parameters.shape[:-1] + (4, 4), dtype=numpy.float32)
+        matrices[..., 0, :3] = side
+        matrices[..., 1, :3] = up
+        matrices[..., 2, :3] = front
+        matrices[..., 3, :3] = eye
+        matrices[..., 3, 3] = 1
+        return matrices
+
     def __str__(self):
         return '<LookAtTransform>'
 
@@ -310,6 +407,9 @@ class Node(SceneNode):
     Contains the list of transformations effecting the node as well as any children.
     """
 
+    _untracked = SceneNode._untracked | frozenset(['_flattened'])
+    _flattened = None
+
     def __init__(self, id, children=None, transforms=None, xmlnode=None):
         """Create a node in the scene graph.
 
@@ -374,6 +474,22 @@ class Node(SceneNode):
             for obj in node.objects(tipo, M):
                 yield obj
 
+    def bounds(self):
+        """Returns the axis-aligned bounding box of the geometry and
+        controller instances under the node, in the coordinate system of the
+        parent of the node. See :meth:`Scene.bounds`. The node keeps its
+        :class:`FlattenedScene`, so the box is only recomputed when the nodes
+        under it or the instantiated geometries change.
+
+        :returns: A numpy.array of shape ``(2, 3)``, or None if there is no
+          geometry under the node
+        """
+        flattened = self._flattened
+        if flattened is None or not flattened.isCurrent([self]):
+            flattened = FlattenedScene([self])
+            self._flattened = flattened
+        return flattened.bounds()
+
     def save(self):
         """Saves the geometry back to :attr:`xmlnode`. Also updates
         :attr:`matrix` if :attr:`transforms` has been modified."""
@@ -382,22 +498,24 @@ class Node(SceneNode):
             self.matrix = numpy.dot(self.matrix, t.matrix)
 
         for child in self.children:
-            child.save()
+            if child.isDirty():
+                child.save()
 
         if self.id is not None:
             self.xmlnode.set('id', self.id)
             self.xmlnode.set('name', self.id)
+        present = set(self.xmlnode)
         for t in self.transforms:
-            if t.xmlnode not in self.xmlnode:
+            if t.xmlnode not in present:
                 self.xmlnode.append(t.xmlnode)
+                present.add(t.xmlnode)
         for c in self.children:
-            if c.xmlnode not in self.xmlnode:
+            if c.xmlnode not in present:
                 self.xmlnode.append(c.xmlnode)
-        xmlnodes = [c.xmlnode for c in self.children]
-        xmlnodes.extend([t.xmlnode for t in self.transforms])
-        for n in self.xmlnode:
-            if n not in xmlnodes:
-                self.xmlnode.remove(n)
+                present.add(c.xmlnode)
+        xmlnodes = set(c.xmlnode for c in self.children)
+        xmlnodes.update(t.xmlnode for t in self.transforms)
+        removeChildren(self.xmlnode, lambda n: n in xmlnodes)
 
     @staticmethod
     def load( collada, node, localscope ):
@@ -461,6 +579,8 @@ class NodeNode(Node):
         referred_node = localscope.get(url[1:])
         if not referred_node:
             referred_node = collada.nodes.get(url[1:])
+        if not referred_node and 'nodes' in collada.skippedLibraries:
+            return None
         if not referred_node:
             raise DaeInstanceNotLoadedError('Node %s not found in library'%url)
         return NodeNode(referred_node, xmlnode=node)
@@ -526,11 +646,14 @@ class GeometryNode(SceneNode):
         url = node.get('url')
         if not url.startswith('#'): raise DaeMalformedError('Invalid url in geometry instance %s' % url)
         geometry = collada.geometries.get(url[1:])
+        if not geometry and 'geometries' in collada.skippedLibraries: return None
         if not geometry: raise DaeBrokenRefError('Geometry %s not found in library'%url)
         matnodes = node.findall('%s/%s/%s'%( tag('bind_material'), tag('technique_common'), tag('instance_material') ) )
         materials = []
         for matnode in matnodes:
-            materials.append( MaterialNode.load(collada, matnode) )
+            mat = MaterialNode.load(collada, matnode)
+            if mat is not None:
+                materials.append(mat)
         return GeometryNode( geometry, materials, xmlnode=node)
 
     def save(self):
@@ -538,7 +661,8 @@ class GeometryNode(SceneNode):
         self.xmlnode.set('url', "#%s" % self.geometry.id)
 
         for m in self.materials:
-            m.save()
+            if m.isDirty():
+                m.save()
 
         matparent = self.xmlnode.find('%s/%s'%( tag('bind_material'), tag('technique_common') ) )
         if matparent is None and len(self.materials)==0:
@@ -551,13 +675,13 @@ class GeometryNode(SceneNode):
             self.xmlnode.remove(bindnode)
             return
 
+        present = set(matparent)
         for m in self.materials:
-            if m.xmlnode not in matparent:
+            if m.xmlnode not in present:
                 matparent.append(m.xmlnode)
-        xmlnodes = [m.xmlnode for m in self.materials]
-        for n in matparent:
-            if n not in xmlnodes:
-                matparent.remove(n)
+                present.add(m.xmlnode)
+        xmlnodes = set(m.xmlnode for m in self.materials)
+        removeChildren(matparent, lambda n: n in xmlnodes)
 
     def __str__(self):
         return '<GeometryNode geometry=%s>' % (self.geometry.id,)
@@ -614,18 +738,22 @@ class ControllerNode(SceneNode):
         url = node.get('url')
         if not url.startswith('#'): raise DaeMalformedError('Invalid url in controller instance %s' % url)
         controller = collada.controllers.get(url[1:])
+        if not controller and 'controllers' in collada.skippedLibraries: return None
         if not controller: raise DaeBrokenRefError('Controller %s not found in library'%url)
         matnodes = node.findall('%s/%s/%s'%( tag('bind_material'), tag('technique_common'), tag('instance_material') ) )
         materials = []
         for matnode in matnodes:
-            materials.append( MaterialNode.load(collada, matnode) )
+            mat = MaterialNode.load(collada, matnode)
+            if mat is not None:
+                materials.append(mat)
         return ControllerNode( controller, materials, xmlnode=node)
 
     def save(self):
         """Saves the controller node back to :attr:`xmlnode`"""
         self.xmlnode.set('url', '#'+self.controller.id)
         for mat in self.materials:
-            mat.save()
+            if mat.isDirty():
+                mat.save()
 
     def __str__(self):
         return '<ControllerNode controller=%s>' % (self.controller.id,)
@@ -681,6 +809,7 @@ class MaterialNode(SceneNode):
         targetid = node.get('target')
         if not targetid.startswith('#'): raise DaeMalformedError('Incorrect target id in material '+targetid)
         target = collada.materials.get(targetid[1:])
+        if not target and 'materials' in collada.skippedLibraries: return None
         if not target: raise DaeBrokenRefError('Material %s not found'%targetid)
         return MaterialNode(node.get('symbol'), target, inputs, xmlnode = node)
 
@@ -741,6 +870,7 @@ class CameraNode(SceneNode):
         url = node.get('url')
         if not url.startswith('#'): raise DaeMalformedError('Invalid url in camera instance %s' % url)
         camera = collada.cameras.get(url[1:])
+        if not camera and 'cameras' in collada.skippedLibraries: return None
         if not camera: raise DaeBrokenRefError('Camera %s not found in library'%url)
         return CameraNode( camera, xmlnode=node)
 
@@ -786,6 +916,7 @@ class LightNode(SceneNode):
         url = node.get('url')
         if not url.startswith('#'): raise DaeMalformedError('Invalid url in light instance %s' % url)
         light = collada.lights.get(url[1:])
+        if not light and 'lights' in collada.skippedLibraries: return None
         if not light: raise DaeBrokenRefError('Light %s not found in library'%url)
         return LightNode( light, xmlnode=node)
 
@@ -854,6 +985,9 @@ def loadNode( collada, node, localscope ):
 class Scene(DaeObject):
     """The root object for a scene, as defined in a collada <scene> tag"""
 
+    _untracked = DaeObject._untracked | frozenset(['_flattened'])
+    _flattened = None
+
     def __init__(self, id, nodes, xmlnode=None, collada=None):
         """Create a scene
 
@@ -892,9 +1026,131 @@ class Scene(DaeObject):
         :rtype: generator that yields the type specified
 
         """
-        matrix = None
-        for node in self.nodes:
-            for obj in node.objects(tipo, matrix): yield obj
+        return self.flatten().objects(tipo)
+
+    def bounds(self):
+        """Returns the axis-aligned bounding box of the scene, containing all
+        its geometry and controller instances. This transforms the cached
+        box of each instantiated object instead of its vertices, so it is
+        quick but can be larger than the box around the transformed vertices.
+
+        :returns: A numpy.array of shape ``(2, 3)`` with the minimum and the
+          maximum corners of the box, or None if the scene has no geometry
+
+        """
+        return self.flatten().bounds()
+
+    def instanceGroups(self, tipo='geometry'):
+        """Returns the instances of geometries or controllers in the scene
+        grouped by the object they instantiate and their material bindings,
+        each with one untransformed object and the matrices of all its
+        instances. See :meth:`FlattenedScene.instanceGroups`.
+
+        :param str tipo:
+          Either 'geometry' or 'controller'
+
+        :rtype: list of :class:`collada.scene.InstanceGroup`
+
+        """
+        return self.flatten().instanceGroups(tipo)
+
+    def evaluateWorld(self, times, channels=None):
+        """Returns the world matrices of the nodes of the scene at every
+        time, with the animations applied. See
+        :meth:`FlattenedScene.evaluateWorld`.
+
+        :param times:
+          A time or an array of ``T`` times
+        :param list channels:
+          The :class:`collada.animation.Channel` objects to apply, by
+          default all the channels of the animations of :attr:`collada`
+
+        :rtype: numpy.array
+        :return: An array of shape ``(T, N, 4, 4)`` with the world matrix of
+          each node of ``flatten().nodes`` at each time
+
+        """
+        if channels is None:
+            channels = []
+            if self.collada is not None:
+                for anim in self.collada.animations:
+                    channels.extend(anim.allChannels())
+        return self.flatten().evaluateWorld(times, channels)
+
+    def raycast(self, origin, direction, maxdist=None):
+        """Find the first triangle of the scene hit by a ray. See
+        :meth:`collada.bvh.SceneBVH.raycast`.
+
+        :returns: ``None`` or a tuple ``(distance, primitive, triangle)``
+          with the bound primitive hit and the index of the triangle in it
+
+        """
+        return self.flatten().bvh().raycast(origin, direction, maxdist)
+
+    def nearest(self, point, maxdist=None):
+        """Find the triangle of the scene closest to a point. See
+        :meth:`collada.bvh.SceneBVH.nearest`.
+
+        :returns: ``None`` or a tuple ``(distance, primitive, triangle)``
+          like :meth:`raycast`
+
+        """
+        return self.flatten().bvh().nearest(point, maxdist)
+
+    def queryBox(self, lower, upper):
+        """Find the triangles of the scene whose bounding box overlaps the
+        box from `lower` to `upper`. See :meth:`collada.bvh.SceneBVH.queryBox`.
+
+        :rtype: list of ``(primitive, triangles)`` tuples with a bound
+          primitive and an int numpy.array of triangle indices in it
+
+        """
+        return self.flatten().bvh().queryBox(lower, upper)
+
+    def objectsInFrustum(self, planes, tipo='geometry'):
+        """Iterate through the geometries or controllers of the scene whose
+        world bounding box intersects a frustum, bound and transformed like
+        :meth:`objects`. Instances outside of the frustum are skipped without
+        transforming their vertices. See
+        :meth:`collada.bvh.SceneBVH.objectsInFrustum`.
+
+        :param numpy.array planes:
+          The planes of the frustum, usually from
+          :meth:`collada.camera.BoundCamera.frustumPlanes`
+        :param str tipo:
+          Either 'geometry' or 'controller'
+
+        :rtype: generator that yields the type specified
+
+        """
+        return self.flatten().bvh().objectsInFrustum(planes, tipo)
+
+    def queryFrustum(self, planes):
+        """Find the triangles of the scene that are not entirely outside
+        one of `planes`. See :meth:`collada.bvh.SceneBVH.queryFrustum`.
+
+        :param numpy.array planes:
+          A numpy.array of shape (P, 4) with a plane ``(a, b, c, d)`` per
+          row, holding the points with ``a*x + b*y + c*z + d >= 0``
+
+        :rtype: list of ``(primitive, triangles)`` tuples like :meth:`queryBox`
+
+        """
+        return self.flatten().bvh().queryFrustum(planes)
+
+    def flatten(self):
+        """Returns the :class:`FlattenedScene` of this scene. It is built the
+        first time and reused until the nodes of the scene graph, their
+        children or their :attr:`Node.matrix` change.
+
+        :rtype: :class:`collada.scene.FlattenedScene`
+
+        """
+        flattened = self._flattened
+        if flattened is None or not flattened.isCurrent(self.nodes):
+            flattened = FlattenedScene(self.nodes)
+            self._flattened = flattened
+        return flattened
 
     @staticmethod
     def load( collada, node ):
@@ -940,14 +1196,21 @@ class Scene(DaeObject):
     def save(self):
         """Saves the scene back to :attr:`xmlnode`"""
         self.xmlnode.set('id', self.id)
+        if not self._restructured:
+            # the nodes are the ones written by the last save, so only
+            # those that were modified since have to be saved again
+            for node in self._modifiedChildren():
+                node.save()
+            return
+        present = set(self.xmlnode)
         for node in self.nodes:
-            node.save()
-            if node.xmlnode not in self.xmlnode:
+            if node.isDirty():
+                node.save()
+            if node.xmlnode not in present:
                 self.xmlnode.append(node.xmlnode)
-        xmlnodes = [n.xmlnode for n in self.nodes]
-        for node in self.xmlnode:
-            if node not in xmlnodes:
-                self.xmlnode.remove(node)
+                present.add(node.xmlnode)
+        xmlnodes = set(n.xmlnode for n in self.nodes)
+        removeChildren(self.xmlnode, lambda node: node in xmlnodes)
 
     def __str__(self):
         return '<Scene id=%s nodes=%d>' % (self.id, len(self.nodes))
@@ -955,3 +1218,459 @@ class Scene(DaeObject):
     def __repr__(self):
         return str(self)
 
+
+class FlattenedScene(object):
+    """The nodes of a scene graph laid out in flat arrays, with the world
+    matrix of every node computed once.
+
+    Every time a node is reached from the scene, including through an
+    <instance_node>, it gets its own entry so that it has a single world
+    matrix. Nodes come before their children. The leaves of the graph,
+    like :class:`GeometryNode` and :class:`CameraNode`, are stored as
+    instances pointing to the entry of the node holding them.
+
+    Use :meth:`Scene.flatten` to get the flattened scene of a scene, which
+    is rebuilt when nodes are added or removed or when :attr:`Node.matrix`
+    is replaced. As with :attr:`Node.matrix`, changes to
+    :attr:`Node.transforms` are only taken into account after calling
+    :meth:`Node.save`.
+
+    """
+
+    def __init__(self, nodes):
+        """Flatten a scene graph
+
+        :param list nodes:
+          The root nodes of the scene graph, like :attr:`Scene.nodes`
+
+        """
+        self.nodes = []
+        """A list with the :class:`Node` of each entry"""
+        self.instances = []
+        """A list of the leaf scene nodes of the graph, like
+        :class:`GeometryNode` or :class:`LightNode`"""
+        parents = []
+        depths = []
+        instance_nodes = []
+
+        # (parent entry, scene node), popped in the same order as a
+        # recursive traversal would visit them
+        stack = [(-1, node) for node in reversed(nodes)]
+        while stack:
+            parent, node = stack.pop()
+            if isinstance(node, NodeNode):
+                node = node.node
+                ancestor = parent
+                while ancestor >= 0:
+                    if self.nodes[ancestor] is node:
+                        raise DaeMalformedError('Node %s instantiates itself' % node.id)
+                    ancestor = parents[ancestor]
+            if isinstance(node, Node):
+                entry = len(self.nodes)
+                self.nodes.append(node)
+                parents.append(parent)
+                depths.append(depths[parent] + 1 if parent >= 0 else 0)
+                stack.extend((entry, child) for child in reversed(node.children))
+            else:
+                self.instances.append(node)
+                instance_nodes.append(parent)
+
+        self.parents = numpy.array(parents, dtype=numpy.int32)
+        """An int numpy.array with the index of the parent entry of each
+        entry, or -1 for the root nodes"""
+        self.instance_nodes = numpy.array(instance_nodes, dtype=numpy.int32)
+        """An int numpy.array with the index of the entry holding each of
+        :attr:`instances`, or -1 if it is at the root of the scene"""
+        # what the graph looked like, to tell when it has to be rebuilt
+        self._roots = list(nodes)
+        self._children = [list(node.children) for node in self.nodes]
+        self._matrices = [node.matrix for node in self.nodes]
+
+        self.local = numpy.empty((len(self.nodes), 4, 4), dtype=numpy.float32)
+        """A numpy.array of shape (N, 4, 4) with :attr:`Node.matrix` of
+        each entry"""
+        if self.nodes:
+            self.local[:] = numpy.concatenate(self._matrices).reshape(-1, 4, 4)
+
+        # entries grouped by depth, so that the world matrices of a whole
+        # level are computed at once from those of the level above
+        depths = numpy.array(depths, dtype=numpy.int32)
+        order = numpy.argsort(depths, kind='mergesort')
+        ends = numpy.cumsum(numpy.bincount(depths)) if len(depths) else []
+        self._levels = numpy.split(order, ends[:-1])
+        self.world = numpy.empty_like(self.local)
+        """A numpy.array of shape (N, 4, 4) with the world matrix of each
+        entry, the product of the matrices of the entry and its ancestors"""
+        self._computeWorld()
+        self._typeIndex = {}
+        self._bvh = None
+        self._boxes = None
+        self._bounds = None
+
+    def isCurrent(self, nodes):
+        """Returns True if the scene graph with root `nodes` still has the
+        same nodes and node matrices as when this was built."""
+        return self._roots == list(nodes) and \
+               self._children == [node.children for node in self.nodes] and \
+               list(map(id, self._matrices)) == [id(node.matrix) for node in self.nodes]
+
+    def _computeWorld(self):
+        if not self._levels:
+            return
+        roots = self._levels[0]
+        self.world[roots] = self.local[roots]
+        for level in self._levels[1:]:
+            self.world[level] = numpy.matmul(self.world[self.parents[level]],
+                                             self.local[level])
+
+    def _instanceIndex(self, tipo, strict):
+        # with strict, only the instances of the class for tipo, otherwise
+        # also the instances of unknown classes that might yield tipo
+        index = self._typeIndex.get((tipo, strict))
+        if index is None:
+            cls = _INSTANCE_TYPES.get(tipo, ())
+            others = () if strict else \
+                    tuple(c for c in _INSTANCE_TYPES.values() if c is not cls)
+            index = numpy.array([i for i, inst in enumerate(self.instances)
+                                 if isinstance(inst, cls) or
+                                 not (strict or isinstance(inst, others))],
+                                dtype=numpy.int32)
+            self._typeIndex[(tipo, strict)] = index
+        return index
+
+    def _instanceMatrices(self, index):
+        nodes = self.instance_nodes[index]
+        matrices = numpy.empty((len(index), 4, 4), dtype=numpy.float32)
+        matrices[:] = numpy.identity(4, dtype=numpy.float32)
+        inner = nodes >= 0
+        matrices[inner] = self.world[nodes[inner]]
+        return [self.instances[i] for i in index], matrices
+
+    def instanceMatrices(self, tipo=None):
+        """Returns the world matrices of the instances of a type.
+
+        :param str tipo:
+          The type of the instances, one of 'geometry', 'controller',
+          'camera' or 'light'. All the instances are returned if ``None``.
+
+        :returns: A tuple ``(instances, matrices)`` where `instances` is the
+          list of matching scene nodes from :attr:`instances` and `matrices`
+          a numpy.array of shape (K, 4, 4) with their world matrices
+
+        """
+        if tipo is None:
+            index = numpy.arange(len(self.instances), dtype=numpy.int32)
+        else:
+            index = self._instanceIndex(tipo, True)
+        return self._instanceMatrices(index)
+
+    def objects(self, tipo):
+        """Iterate through all objects in the scene that match `tipo`, bound
+        and transformed with their world matrices. This yields the same
+        objects as :meth:`Scene.objects`.
+
+        :param str tipo:
+          A string for the desired object type. This can be one of 'geometry',
+          'camera', 'light', or 'controller'.
+
+        :rtype: generator that yields the type specified
+
+        """
+        instances, matrices = self._instanceMatrices(self._instanceIndex(tipo, False))
+        for inst, matrix in zip(instances, matrices):
+            for obj in inst.objects(tipo, matrix):
+                yield obj
+
+    def _instanceBoxes(self):
+        # (instances, distinct instantiated objects, index in them of the
+        # object of each instance, world matrices, world boxes) of the
+        # geometry and controller instances with a non-empty box, kept
+        # until the box of one of the objects is replaced
+        cached = self._boxes
+        if cached is not None and \
+                all(o.bounds() is b for o, b in zip(cached[1], cached[5])):
+            return cached[:5]
+        instances = []
+        matrices = []
+        codes = []
+        codebyid = {}
+        originals = []
+        for tipo in ('geometry', 'controller'):
+            insts, mats = self.instanceMatrices(tipo)
+            instances.extend(insts)
+            matrices.append(mats)
+            for inst in insts:
+                original = getattr(inst, tipo)
+                code = codebyid.get(id(original))
+                if code is None:
+                    code = codebyid[id(original)] = len(originals)
+                    originals.append(original)
+                codes.append(code)
+
+        # the box of each distinct object, with NaN for empty ones
+        originalbounds = [original.bounds() for original in originals]
+        localbounds = numpy.empty((len(originals), 2, 3), dtype=numpy.float32)
+        for i, bounds in enumerate(originalbounds):
+            localbounds[i] = numpy.nan if bounds is None else bounds
+        codes = numpy.array(codes, dtype=numpy.int32)
+        boxes = localbounds[codes]
+        keep = ~numpy.isnan(boxes[:,0,0])
+        matrices = numpy.concatenate(matrices)[keep]
+        instances = [inst for inst, k in zip(instances, keep) if k]
+        cached = (instances, originals, codes[keep], matrices,
+                  transformBounds(boxes[keep], matrices), originalbounds)
+        self._boxes = cached
+        return cached[:5]
+
+    def instanceBounds(self):
+        """Returns the world bounding boxes of the geometry and controller
+        instances. The box of each instantiated object, which is cached, is
+        transformed by the world matrix of the instance, without touching
+        the vertices. The result is kept until the box of one of the
+        instantiated objects changes.
+
+        :returns: A tuple ``(instances, bounds)`` where `instances` is the
+          list of :class:`GeometryNode` and :class:`ControllerNode` with a
+          non-empty geometry and `bounds` a numpy.array of shape (K, 2, 3)
+          with the minimum and maximum corners of their boxes
+
+        """
+        instances, originals, codes, matrices, bounds = self._instanceBoxes()
+        return instances, bounds
+
+    def bvh(self):
+        """Returns the bounding volume hierarchy over the geometry of the
+        scene, used for ray casts and spatial queries. It is built on the
+        first call and rebuilt when one of the instantiated geometries
+        changes.
+
+        :rtype: :class:`collada.bvh.SceneBVH`
+
+        """
+        if self._bvh is None or not self._bvh.isCurrent():
+            self._bvh = SceneBVH(self)
+        return self._bvh
+
+    def bounds(self):
+        """Returns the bounding box of all the geometry and controller
+        instances, as a numpy.array of shape ``(2, 3)``, or None if there are
+        none. See :meth:`instanceBounds`."""
+        instances, bounds = self.instanceBounds()
+        cached = self._bounds
+        if cached is None or cached[0] is not bounds:
+            total = None
+            if len(instances) > 0:
+                total = numpy.array([bounds[:,0].min(axis=0), bounds[:,1].max(axis=0)])
+            cached = (bounds, total)
+            self._bounds = cached
+        return cached[1]
+
+    def evaluateWorld(self, times, channels):
+        """Returns the world matrices of every entry at every time, as set by
+        animation channels.
+
+        Only the nodes with animated transforms are rebuilt from their
+        transforms, and only the entries below them have their world
+        matrices recomputed. The others keep :attr:`world`.
+
+        :param times:
+          A time or an array of ``T`` times
+        :param list channels:
+          The :class:`collada.animation.Channel` objects to apply. Channels
+          that do not target a transform of a node of the scene, or a
+          member of it that can be animated, are ignored.
+
+        :rtype: numpy.array
+        :return: An array of shape ``(T, N, 4, 4)`` with the world matrix
+          of each of :attr:`nodes` at each time
+
+        """
+        times = numpy.atleast_1d(numpy.asarray(times, dtype=numpy.float64)).reshape(-1)
+        world = numpy.empty((len(times), len(self.nodes), 4, 4), dtype=numpy.float32)
+        world[:] = self.world
+
+        entriesbynode = {}
+        for entry, node in enumerate(self.nodes):
+            entriesbynode.setdefault(id(node), []).append(entry)
+        applied = []
+        for channel in channels:
+            transform, node = channel.transform, channel.node
+            if transform is None or id(node) not in entriesbynode:
+                continue
+            index = transform._parameterIndex(channel.member)
+            if index is not None and len(index) == channel.sampler.output.shape[1]:
+                applied.append((channel, node, transform, index))
+        if not applied:
+            return world
+
+        # the parameters of the animated transforms at every time
+        values = evaluateSamplers([channel.sampler for channel, node, transform, index in applied], times)
+        parameters = {}
+        nodes = []
+        seen = set()
+        for (channel, node, transform, index), value in zip(applied, values):
+            params = parameters.get(id(transform))
+            if params is None:
+                params = parameters[id(transform)] = numpy.empty((len(times), len(transform._parameters())),
+                                                                 dtype=numpy.float32)
+                params[:] = transform._parameters()
+                if id(node) not in seen:
+                    seen.add(id(node))
+                    nodes.append(node)
+            params[:, index] = value
+
+        local = self._animatedLocal(nodes, parameters, len(times))
+
+        # entries that are animated or below an animated one
+        rowofentry = numpy.full(len(self.nodes), -1, dtype=numpy.intp)
+        for row, node in enumerate(nodes):
+            rowofentry[entriesbynode[id(node)]] = row
+        dynamic = rowofentry >= 0
+        for level in self._levels[1:]:
+            dynamic[level] |= dynamic[self.parents[level]]
+        for level in self._levels:
+            level = level[dynamic[level]]
+            if len(level) == 0:
+                continue
+            levellocal = numpy.empty((len(times), len(level), 4, 4), dtype=numpy.float32)
+            levellocal[:] = self.local[level]
+            rows = rowofentry[level]
+            animated = rows >= 0
+            levellocal[:, animated] = local[rows[animated]].swapaxes(0, 1)
+            parents = self.parents[level]
+            root = parents < 0
+            world[:, level[root]] = levellocal[:, root]
+            world[:, level[~root]] = numpy.matmul(world[:, parents[~root]], levellocal[:, ~root])
+        return world
+
+    def _animatedLocal(self, nodes, parameters, ntimes):
+        # the local matrices of the nodes at every time, shape (K, T, 4, 4),
+        # as the static matrices between animated transforms times the
+        # animated ones, computed for all the nodes one animated transform
+        # at a time
+        first = numpy.empty((len(nodes), 4, 4), dtype=numpy.float32)
+        steps = []
+        for row, node in enumerate(nodes):
+            matrix = numpy.identity(4, dtype=numpy.float32)
+            animated = []
+            for transform in node.transforms:
+                if id(transform) in parameters:
+                    animated.append([transform, numpy.identity(4, dtype=numpy.float32)])
+                elif animated:
+                    animated[-1][1] = numpy.dot(animated[-1][1], transform.matrix)
+                else:
+                    matrix = numpy.dot(matrix, transform.matrix)
+            first[row] = matrix
+            for i, (transform, after) in enumerate(animated):
+                if i == len(steps):
+                    steps.append([])
+                steps[i].append((row, transform, after))
+
+        local = numpy.empty((len(nodes), ntimes, 4, 4), dtype=numpy.float32)
+        local[:] = first[:, numpy.newaxis]
+        for step in steps:
+            rows = numpy.array([row for row, transform, after in step], dtype=numpy.intp)
+            animated = numpy.empty((len(step), ntimes, 4, 4), dtype=numpy.float32)
+            bytype = {}
+            for i, (row, transform, after) in enumerate(step):
+                bytype.setdefault(type(transform), []).append(i)
+            for cls, members in bytype.items():
+                params = numpy.stack([parameters[id(step[i][1])] for i in members])
+                animated[members] = cls._matrices(params)
+            after = numpy.array([after for row, transform, after in step])
+            local[rows] = numpy.matmul(numpy.matmul(local[rows], animated), after[:, numpy.newaxis])
+        return local
+
+    def instanceGroups(self, tipo='geometry'):
+        """Returns the instances of geometries or controllers grouped by the
+        object they instantiate and the materials they are bound to, so that
+        each group can be drawn with hardware instancing.
+
+        :param str tipo:
+          Either 'geometry' or 'controller'
+
+        :rtype: list of :class:`collada.scene.InstanceGroup`, in order of
+          the first instance of each group
+
+        """
+        if tipo not in ('geometry', 'controller'):
+            raise ValueError('Instances of %s cannot be grouped' % tipo)
+        instances, matrices = self.instanceMatrices(tipo)
+        groups = []
+        members = []
+        groupbykey = {}
+        for i, inst in enumerate(instances):
+            original = getattr(inst, tipo)
+            key = (id(original),) + tuple(sorted(
+                    (m.symbol, id(m.target), tuple(tuple(inp) for inp in m.inputs))
+                    for m in inst.materials))
+            index = groupbykey.get(key)
+            if index is None:
+                index = groupbykey[key] = len(groups)
+                materialnodesbysymbol = dict((m.symbol, m) for m in inst.materials)
+                groups.append((original, materialnodesbysymbol))
+                members.append([])
+            members[index].append(i)
+        return [InstanceGroup(original, materialnodesbysymbol,
+                              [instances[i] for i in index],
+                              matrices[numpy.array(index)])
+                for (original, materialnodesbysymbol), index in zip(groups, members)]
+
+    def __len__(self):
+        """Returns the number of entries"""
+        return len(self.nodes)
+
+    def __str__(self):
+        return '<FlattenedScene nodes=%d, instances=%d>' % (len(self.nodes), len(self.instances))
+
+    def __repr__(self):
+        return str(self)
+
+
+class InstanceGroup(object):
+    """All the instances in a scene of the same geometry or controller with
+    the same material bindings. Get them with :meth:`Scene.instanceGroups`.
+
+    Instead of a transformed copy of the geometry for every instance, as
+    returned by :meth:`Scene.objects`, a group gives the geometry once,
+    bound without any transform, and the world matrix of each instance.
+    """
+
+    def __init__(self, original, materialnodebysymbol, instances, matrices):
+        self.original = original
+        """The :class:`collada.geometry.Geometry` or
+        :class:`collada.controller.Controller` being instantiated"""
+        self.materialnodebysymbol = materialnodebysymbol
+        """Dictionary mapping the material symbols of the geometry to the
+        :class:`MaterialNode` they are bound to"""
+        self.instances = instances
+        """A list with the :class:`GeometryNode` or :class:`ControllerNode`
+        of each instance. The same scene node appears more than once when it
+        is reached through several <instance_node>."""
+        self.matrices = matrices
+        """A numpy.array of shape (N, 4, 4) with the world matrix of each
+        instance"""
+
+    def bind(self):
+        """Returns :attr:`original` bound to the materials of the group and
+        to the identity matrix, so its vertices are not transformed.
+
+        :rtype: :class:`collada.geometry.BoundGeometry` or
+          :class:`collada.controller.BoundController`
+        """
+        return self.original.bind(numpy.identity(4, dtype=numpy.float32),
+                                  self.materialnodebysymbol)
+
+    def __len__(self):
+        """Returns the number of instances"""
+        return len(self.matrices)
+
+    def __str__(self):
+        return '<InstanceGroup original=%s, instances=%d>' % (self.original.id, len(self))
+
+    def __repr__(self):
+        return str(self)
+
+
+_INSTANCE_TYPES = {'geometry': GeometryNode, 'controller': ControllerNode,
+                   'camera': CameraNode, 'light': LightNode}
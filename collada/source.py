@@ -14,8 +14,11 @@
 
 import numpy
 
+from collada import common
 from collada.common import DaeObject, E, tag
 from collada.common import DaeIncompleteError, DaeBrokenRefError, DaeMalformedError, DaeUnsupportedError
+from collada.util import loadArrayData, formatNumericArray, setArrayText, \
+    arrayTextNeeded, pointBounds
 from collada.xmlutil import etree as ElementTree
 
 class InputList(object):
@@ -105,6 +108,12 @@ class FloatSource(Source):
     item in the source array.
     """
 
+    float_format = '%.7g'
+    """printf-style format used to write the values when saving. The
+    default keeps 7 significant digits; use ``'%.9g'`` for values that
+    read back exactly as the same float32. It can be set on a single
+    source or on the class to change all of them."""
+
     def __init__(self, id, data, components, xmlnode=None):
         """Create a float source instance.
 
@@ -123,19 +132,17 @@ class FloatSource(Source):
 
         self.id = id
         """The unique string identifier for the source"""
-        self.data = data
+        self.data = data.reshape(-1, len(components))
         """Numpy array with the source values. This will be shaped as ``(-1,N)`` where ``N = len(self.components)``"""
-        self.data.shape = (-1, len(components) )
         self.components = components
         """Tuple of strings describing the semantic of the data, e.g. ``('X','Y','Z')``"""
         if xmlnode != None:
             self.xmlnode = xmlnode
             """ElementTree representation of the source."""
         else:
-            self.data.shape = (-1,)
-            txtdata = ' '.join(map(str, self.data.tolist() ))
-            rawlen = len( self.data )
-            self.data.shape = (-1, len(self.components) )
+            flat = self.data.reshape(-1)
+            txtdata = formatNumericArray(flat)
+            rawlen = len( flat )
             acclen = len( self.data )
             stridelen = len(self.components)
             sourcename = "%s-array"%self.id
@@ -153,17 +160,35 @@ class FloatSource(Source):
 
     def __getitem__(self, i): return self.data[i]
 
-    def save(self):
-        """Saves the source back to :attr:`xmlnode`"""
-        self.data.shape = (-1,)
+    _untracked = DaeObject._untracked | frozenset(['_bounds'])
+    _bounds = None
+    def bounds(self):
+        """Returns the minimum and maximum of each component of the values.
+        The result is cached until :attr:`data` is replaced or
+        :meth:`~collada.common.DaeObject.markDirty` is called.
 
-        txtdata = ' '.join(map(lambda x: '%.7g'%x , self.data.tolist()))
+        :returns: A numpy.array of shape ``(2, N)``, or None if the source
+          is empty
+        """
+        cached = self._bounds
+        if cached is None or cached[0] is not self.data or \
+                cached[1] != common._inPlaceChanges:
+            cached = (self.data, common._inPlaceChanges, pointBounds(self.data))
+            self._bounds = cached
+        return cached[2]
 
-        rawlen = len( self.data )
-        self.data.shape = (-1, len(self.components) )
-        acclen = len( self.data )
+    def save(self):
+        """Saves the source back to :attr:`xmlnode`"""
+        flat = self.data.reshape(-1)
+
+        rawlen = len( flat )
+        acclen = rawlen // len(self.components)
+        if self.data.shape != (acclen, len(self.components)):
+            # only data assigned with another shape is reshaped, so that
+            # saving keeps the array and what is cached from it
+            self.data = flat.reshape(-1, len(self.components))
         node = self.xmlnode.find(tag('float_array'))
-        node.text = txtdata
+        setArrayText(node, flat, self.float_format)
         node.set('count', str(rawlen))
         node.set('id', self.id+'-array' )
         node = self.xmlnode.find('%s/%s'%(tag('technique_common'), tag('accessor')))
@@ -175,17 +200,29 @@ class FloatSource(Source):
             node.append(E.param(type='float', name=c))
         self.xmlnode.set('id', self.id )
 
+    def _needsSave(self):
+        node = self.xmlnode.find(tag('float_array'))
+        return node is not None and arrayTextNeeded(node)
+
+    def _restoreArrayText(self):
+        """Writes the float array back to :attr:`xmlnode` if its text was
+        released, leaving the accessor untouched."""
+        node = self.xmlnode.find(tag('float_array'))
+        if node is not None and arrayTextNeeded(node):
+            setArrayText(node, self.data, self.float_format)
+
     @staticmethod
     def load( collada, localscope, node ):
         sourceid = node.get('id')
         arraynode = node.find(tag('float_array'))
         if arraynode is None: raise DaeIncompleteError('No float_array in source node')
-        if arraynode.text is None or arraynode.text.isspace():
-            data = numpy.array([], dtype=numpy.float32)
-        else:
-            try: data = numpy.fromstring(arraynode.text, dtype=numpy.float32, sep=' ')
-            except ValueError: raise DaeMalformedError('Corrupted float array')
-        data[numpy.isnan(data)] = 0
+        try: data = loadArrayData(collada, arraynode, numpy.float32)
+        except ValueError: raise DaeMalformedError('Corrupted float array')
+        # data may be a read-only view of shared memory, so NaNs are
+        # replaced in a copy, and only if there are any
+        nans = numpy.isnan(data)
+        if nans.any():
+            data = numpy.where(nans, numpy.float32(0), data)
 
         paramnodes = node.findall('%s/%s/%s'%(tag('technique_common'), tag('accessor'), tag('param')))
         if not paramnodes: raise DaeIncompleteError('No accessor info in source node')
@@ -195,10 +232,8 @@ class FloatSource(Source):
             components = ['S', 'T']
         if len(components) == 3 and components[0] == 'S' and components[1] == 'T' and components[2] == 'P':
             components = ['S', 'T']
-            data.shape = (-1, 3)
             #remove 3d texcoord dimension because we don't support it
-            data = numpy.delete(data, -1, 1)
-            data.shape = (-1)
+            data = numpy.delete(data.reshape(-1, 3), -1, 1).reshape(-1)
         return FloatSource( sourceid, data, tuple(components), xmlnode=node )
 
     def __str__(self): return '<FloatSource size=%d>' % (len(self),)
@@ -233,19 +268,17 @@ class IDRefSource(Source):
 
         self.id = id
         """The unique string identifier for the source"""
-        self.data = data
+        self.data = data.reshape(-1, len(components))
         """Numpy array with the source values. This will be shaped as ``(-1,N)`` where ``N = len(self.components)``"""
-        self.data.shape = (-1, len(components) )
         self.components = components
         """Tuple of strings describing the semantic of the data, e.g. ``('MORPH_TARGET')``"""
         if xmlnode != None:
             self.xmlnode = xmlnode
             """ElementTree representation of the source."""
         else:
-            self.data.shape = (-1,)
-            txtdata = ' '.join(map(str, self.data.tolist() ))
-            rawlen = len( self.data )
-            self.data.shape = (-1, len(self.components) )
+            flat = self.data.reshape(-1)
+            txtdata = ' '.join(map(str, flat.tolist() ))
+            rawlen = len( flat )
             acclen = len( self.data )
             stridelen = len(self.components)
             sourcename = "%s-array"%self.id
@@ -265,11 +298,14 @@ class IDRefSource(Source):
 
     def save(self):
         """Saves the source back to :attr:`xmlnode`"""
-        self.data.shape = (-1,)
-        txtdata = ' '.join(map(str, self.data.tolist() ))
-        rawlen = len( self.data )
-        self.data.shape = (-1, len(self.components) )
-        acclen = len( self.data )
+        flat = self.data.reshape(-1)
+        txtdata = ' '.join(map(str, flat.tolist() ))
+        rawlen = len( flat )
+        acclen = rawlen // len(self.components)
+        if self.data.shape != (acclen, len(self.components)):
+            # only data assigned with another shape is reshaped, so that
+            # saving keeps the array and what is cached from it
+            self.data = flat.reshape(-1, len(self.components))
 
         node = self.xmlnode.find(tag('IDREF_array'))
         node.text = txtdata
@@ -332,19 +368,17 @@ class NameSource(Source):
 
         self.id = id
         """The unique string identifier for the source"""
-        self.data = data
+        self.data = data.reshape(-1, len(components))
         """Numpy array with the source values. This will be shaped as ``(-1,N)`` where ``N = len(self.components)``"""
-        self.data.shape = (-1, len(components) )
         self.components = components
         """Tuple of strings describing the semantic of the data, e.g. ``('JOINT')``"""
         if xmlnode != None:
             self.xmlnode = xmlnode
             """ElementTree representation of the source."""
         else:
-            self.data.shape = (-1,)
-            txtdata = ' '.join(map(str, self.data.tolist() ))
-            rawlen = len( self.data )
-            self.data.shape = (-1, len(self.components) )
+            flat = self.data.reshape(-1)
+            txtdata = ' '.join(map(str, flat.tolist() ))
+            rawlen = len( flat )
             acclen = len( self.data )
             stridelen = len(self.components)
             sourcename = "%s-array"%self.id
@@ -364,11 +398,14 @@ class NameSource(Source):
 
     def save(self):
         """Saves the source back to :attr:`xmlnode`"""
-        self.data.shape = (-1,)
-        txtdata = ' '.join(map(str, self.data.tolist() ))
-        rawlen = len( self.data )
-        self.data.shape = (-1, len(self.components) )
-        acclen = len( self.data )
+        flat = self.data.reshape(-1)
+        txtdata = ' '.join(map(str, flat.tolist() ))
+        rawlen = len( flat )
+        acclen = rawlen // len(self.components)
+        if self.data.shape != (acclen, len(self.components)):
+            # only data assigned with another shape is reshaped, so that
+            # saving keeps the array and what is cached from it
+            self.data = flat.reshape(-1, len(self.components))
 
         node = self.xmlnode.find(tag('Name_array'))
         node.text = txtdata
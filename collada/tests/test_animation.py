@@ -0,0 +1,145 @@
+import os
+
+import numpy
+
+import collada
+from collada.animation import Sampler, evaluateSamplers
+from collada.util import unittest
+
+
+class TestAnimation(unittest.TestCase):
+
+    def setUp(self):
+        self.datadir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+    def test_animation_channels(self):
+        mesh = collada.Collada(os.path.join(self.datadir, "skinned_box.dae"))
+        anim = mesh.animations['bend']
+        self.assertEqual(len(anim.samplers), 1)
+        sampler = anim.samplers[0]
+        numpy.testing.assert_array_equal(sampler.input, [0, 1, 2])
+        self.assertEqual(sampler.output.shape, (3, 1))
+        numpy.testing.assert_array_equal(sampler.interpolation,
+                                         [collada.animation.LINEAR, collada.animation.STEP, collada.animation.LINEAR])
+
+        channel = anim.channels[0]
+        self.assertIs(channel.sampler, sampler)
+        self.assertEqual((channel.nodeid, channel.sid, channel.member), ('tip', 'rotateX', 'ANGLE'))
+        self.assertEqual(channel.node.id, 'tip')
+        self.assertIsInstance(channel.transform, collada.scene.RotateTransform)
+        self.assertEqual(channel.transform.xmlnode.get('sid'), 'rotateX')
+
+        # clamped at both ends, stepping from 90 to 45 at the last key
+        values = channel.evaluate([-1, 0, 0.5, 1, 1.5, 2, 3])
+        numpy.testing.assert_array_almost_equal(values[:,0], [0, 0, 45, 90, 90, 45, 45])
+
+        matrix = collada.animation.Channel(sampler, 'node/transform(0)(3)')
+        self.assertEqual((matrix.sid, matrix.member), ('transform', (0, 3)))
+        self.assertIsNone(matrix.transform)
+        self.assertRaises(collada.DaeMalformedError, collada.animation.Channel, sampler, 'node/a.b.c')
+
+        # a target without a sid does not pick a transform of the node
+        tip = channel.node
+        tip.transforms.append(collada.scene.TranslateTransform(0, 0, 0))
+        nosid = collada.animation.Channel(sampler, 'tip.X')
+        self.assertIsNone(nosid.sid)
+        nosid.resolve({'tip': tip})
+        self.assertIs(nosid.node, tip)
+        self.assertIsNone(nosid.transform)
+
+    def test_bezier_evaluation(self):
+        sampler = Sampler('curve', [0, 2], [0, 1], ['BEZIER', 'LINEAR'],
+                          in_tangent=[[0, 0], [1, -0.5]], out_tangent=[[0.5, 1.5], [2, 1]])
+        self.assertEqual(sampler.in_tangent.shape, (2, 1, 2))
+        s = numpy.linspace(0, 1, 11)
+        r = 1 - s
+        times = 3 * r * r * s * 0.5 + 3 * r * s * s * 1.0 + s ** 3 * 2
+        values = 3 * r * r * s * 1.5 + 3 * r * s * s * -0.5 + s ** 3
+        numpy.testing.assert_array_almost_equal(sampler.evaluate(times)[:,0], values, decimal=5)
+
+        # without tangents a bezier segment is a straight line
+        straight = Sampler('straight', [0, 4], [[0, 0], [4, 8]], ['BEZIER'] * 2)
+        numpy.testing.assert_array_almost_equal(straight.evaluate([1, 3]), [[1, 2], [3, 6]], decimal=5)
+
+        # hermite slopes make the same curve as a bezier with control points a third along
+        hermite = Sampler('hermite', [0, 1], [0, 1], ['HERMITE'] * 2, in_tangent=[0, 3], out_tangent=[3, 0])
+        self.assertEqual(hermite.interpolation[0], collada.animation.BEZIER)
+        numpy.testing.assert_array_almost_equal(hermite.out_tangent[0,0], [1 / 3., 1])
+        t = numpy.linspace(0, 1, 7)
+        expected = 3 * (t ** 3 - 2 * t ** 2 + t) + (3 * t ** 2 - 2 * t ** 3) + 3 * (t ** 3 - t ** 2)
+        numpy.testing.assert_array_almost_equal(hermite.evaluate(t)[:,0], expected, decimal=5)
+
+    def test_mixed_hermite(self):
+        # the interpolation of each key decides how the tangents of its
+        # segment are read: a HERMITE segment followed by a LINEAR key, and
+        # a LINEAR segment followed by a HERMITE one
+        sampler = Sampler('mixed', [0, 1, 2, 3], [0, 1, 0, 2], ['HERMITE', 'LINEAR', 'HERMITE', 'LINEAR'],
+                          in_tangent=[0, 3, 5, -1], out_tangent=[3, 5, 1, 0])
+        t = numpy.linspace(0, 1, 9)
+        h00, h10, h01, h11 = 2*t**3 - 3*t**2 + 1, t**3 - 2*t**2 + t, 3*t**2 - 2*t**3, t**3 - t**2
+        values = sampler.evaluate(numpy.concatenate((t, 1 + t, 2 + t)))[:,0]
+        numpy.testing.assert_array_almost_equal(values[:9], 3 * h10 + h01 + 3 * h11, decimal=5)
+        numpy.testing.assert_array_almost_equal(values[9:18], 1 - t, decimal=5)
+        numpy.testing.assert_array_almost_equal(values[18:], 1 * h10 + 2 * h01 - 1 * h11, decimal=5)
+
+    def test_evaluate_samplers(self):
+        rand = numpy.random.RandomState(2)
+        samplers = []
+        for i in range(50):
+            nkeys = rand.randint(1, 8)
+            times = numpy.sort(rand.uniform(0, 10, nkeys))
+            width = (1, 3, 16)[i % 3]
+            interpolation = rand.choice(['LINEAR', 'STEP', 'BEZIER'], nkeys)
+            samplers.append(Sampler('s%d' % i, times, rand.uniform(-1, 1, (nkeys, width)), interpolation))
+        times = rand.uniform(-1, 11, 40)
+        results = evaluateSamplers(samplers, times)
+        for sampler, result in zip(samplers, results):
+            self.assertEqual(result.shape, (len(times), sampler.output.shape[1]))
+            for t, value in zip(times, result):
+                # one key at a time
+                keys = sampler.input
+                k = min(max(numpy.searchsorted(keys, t, side='right') - 1, 0), len(keys) - 1)
+                if t <= keys[0] or t >= keys[-1] or sampler.interpolation[k] == collada.animation.STEP:
+                    expected = sampler.output[k]
+                else:
+                    u = (t - keys[k]) / (keys[k + 1] - keys[k])
+                    expected = sampler.output[k] + u * (sampler.output[k + 1] - sampler.output[k])
+                numpy.testing.assert_array_almost_equal(value, expected, decimal=4)
+
+        self.assertRaises(collada.DaeMalformedError, Sampler, 'bad', [1, 0], [0, 1])
+        self.assertRaises(collada.DaeMalformedError, Sampler, 'bad', [0, 1], [0, 1, 2])
+
+    def test_scene_evaluate_world(self):
+        mesh = collada.Collada(os.path.join(self.datadir, "skinned_box.dae"))
+        flattened = mesh.scene.flatten()
+        ids = [node.id for node in flattened.nodes]
+        times = [0, 0.5, 1.5, 2]
+        world = mesh.scene.evaluateWorld(times)
+        self.assertEqual(world.shape, (4, len(ids), 4, 4))
+
+        # only the tip is animated, everything else keeps its matrix
+        tip = ids.index('tip')
+        others = [i for i in range(len(ids)) if i != tip]
+        for frame in world:
+            numpy.testing.assert_array_almost_equal(frame[others], flattened.world[others])
+        root = flattened.world[ids.index('root')]
+        offset = collada.scene.TranslateTransform(0, 0, 1).matrix
+        for frame, angle in zip(world, [0, 45, 90, 45]):
+            rotation = collada.scene.RotateTransform(1, 0, 0, angle).matrix
+            numpy.testing.assert_array_almost_equal(frame[tip], numpy.dot(numpy.dot(root, offset), rotation))
+
+        # children of animated nodes follow them, and unusable channels are ignored
+        child = collada.scene.Node('child', transforms=[collada.scene.TranslateTransform(0, 1, 0)])
+        tipnode = flattened.nodes[tip]
+        tipnode.children.append(child)
+        channel = mesh.animations['bend'].channels[0]
+        wrong = collada.animation.Channel(channel.sampler, 'tip/location')
+        wrong.resolve({'tip': tipnode})
+        world = mesh.scene.evaluateWorld(1, [channel, wrong])
+        entries = [node.id for node in mesh.scene.flatten().nodes]
+        numpy.testing.assert_array_almost_equal(world[0, entries.index('child')],
+                                                numpy.dot(world[0, entries.index('tip')], child.matrix))
+        numpy.testing.assert_array_almost_equal(mesh.scene.evaluateWorld([1], [])[0], mesh.scene.flatten().world)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import os
+
+import numpy
+
+import collada
+from collada.bvh import BVH, intersectTriangles, pointTriangleDistances
+from collada.util import unittest
+
+
+class TestBVH(unittest.TestCase):
+
+    def setUp(self):
+        self.datadir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+        rand = numpy.random.RandomState(1)
+        lower = rand.uniform(-100, 100, (1000, 3))
+        self.bounds = numpy.stack((lower, lower + rand.uniform(0, 10, (1000, 3))), axis=1).astype(numpy.float32)
+        self.bounds[5] = numpy.nan
+
+    def test_bvh_queries(self):
+        bvh = BVH(self.bounds)
+        self.assertEqual(len(bvh), 1000)
+        self.assertEqual(bvh.depth, 7)
+        lower, upper = self.bounds[:,0], self.bounds[:,1]
+
+        qlower, qupper = numpy.array([-20, -30, 0]), numpy.array([10, 40, 50])
+        expected = numpy.flatnonzero((lower <= qupper).all(axis=1) & (upper >= qlower).all(axis=1))
+        self.assertTrue(len(expected) > 0)
+        numpy.testing.assert_array_equal(bvh.queryBox(qlower, qupper), expected)
+
+        # the inside of the box as planes keeps the same items
+        identity = numpy.identity(3)
+        planes = numpy.concatenate((numpy.column_stack((identity, -qlower)),
+                                    numpy.column_stack((-identity, qupper))))
+        numpy.testing.assert_array_equal(bvh.queryFrustum(planes), expected)
+
+        origins = numpy.array([[-150, 0, 0], [0, 0, 0], [3, 4, 5]], dtype=numpy.float32)
+        directions = numpy.array([[1, 0.1, 0], [0, 0, -1], [0, 0, 0]], dtype=numpy.float32)
+        rays, items, near = bvh.intersectRays(origins, directions)
+        for r in range(len(origins)):
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                t1 = (lower - origins[r]) / directions[r]
+                t2 = (upper - origins[r]) / directions[r]
+            enter = numpy.fmax.reduce(numpy.fmin(t1, t2), axis=1)
+            leave = numpy.fmin.reduce(numpy.fmax(t1, t2), axis=1)
+            hit = (enter <= leave) & (leave >= 0)
+            hit[5] = False
+            numpy.testing.assert_array_equal(numpy.sort(items[rays == r]), numpy.flatnonzero(hit))
+        self.assertTrue((near >= 0).all())
+
+        # the items come out in order of the distance to their box
+        point = numpy.array([3, -20, 7], dtype=numpy.float32)
+        outside = numpy.maximum(numpy.maximum(lower - point, point - upper), 0)
+        expected = numpy.sqrt((outside ** 2).sum(axis=1))
+        expected[5] = numpy.inf
+        found = list(bvh.nearestItems(point))
+        self.assertEqual(len(found), 999)
+        distances = [d for d, item in found]
+        self.assertEqual(distances, sorted(distances))
+        numpy.testing.assert_array_almost_equal(distances, numpy.sort(expected)[:999])
+        numpy.testing.assert_array_almost_equal([expected[item] for d, item in found], distances)
+        self.assertEqual(len(list(bvh.nearestItems(point, 5))), (expected <= 5).sum())
+
+        empty = BVH(numpy.zeros((0, 2, 3)))
+        self.assertEqual(len(empty.queryBox(qlower, qupper)), 0)
+        self.assertEqual(len(empty.intersectRays(origins, directions)[0]), 0)
+        self.assertEqual(list(empty.nearestItems(point)), [])
+
+    def test_point_triangle_distances(self):
+        triangles = numpy.array([[[0, 0, 0], [1, 0, 0], [0, 1, 0]]] * 4 +
+                                [[[0, 0, 0], [1, 0, 0], [2, 0, 0]]], dtype=numpy.float32)
+        points = [[0.2, 0.2, 3], [2, 0, 0], [-1, -1, 0], [1, 1, -1], [1, 1, 0]]
+        expected = [3, 1, numpy.sqrt(2), numpy.sqrt(1.5), 1]
+        for point, triangle, distance in zip(points, triangles, expected):
+            self.assertAlmostEqual(pointTriangleDistances(point, triangle[numpy.newaxis])[0], distance)
+
+    def test_scene_raycast(self):
+        mesh = collada.Collada(os.path.join(self.datadir, "duck_triangles.dae"))
+        bound = list(mesh.scene.objects('geometry'))[0]
+        boundset = list(bound.primitives())[0]
+        triangles = boundset.triangleVertices()
+        center = triangles.reshape(-1, 3).mean(axis=0)
+
+        origin = center + [0, 0, 500]
+        for direction in ([0, 0, -1], [0.1, 0.2, -1], [0, 0, 1]):
+            expected = intersectTriangles(origin, numpy.array(direction, dtype=numpy.float32), triangles)
+            hit = mesh.scene.raycast(origin, direction)
+            if numpy.isinf(expected.min()):
+                self.assertIsNone(hit)
+                continue
+            distance, prim, triangle = hit
+            self.assertAlmostEqual(distance, expected.min(), places=2)
+            self.assertAlmostEqual(expected[triangle], expected.min(), places=2)
+            self.assertIs(prim.original, boundset.original)
+            numpy.testing.assert_array_almost_equal(prim.triangleVertices()[triangle], triangles[triangle])
+        self.assertIsNone(mesh.scene.raycast(origin, [0, 0, -1], maxdist=1))
+        self.assertIs(mesh.scene.flatten().bvh(), mesh.scene.flatten().bvh())
+
+        lower = center - 20
+        upper = center + 20
+        found = mesh.scene.queryBox(lower, upper)
+        self.assertEqual(len(found), 1)
+        prim, ids = found[0]
+        expected = numpy.flatnonzero((triangles.min(axis=1) <= upper).all(axis=1) &
+                                     (triangles.max(axis=1) >= lower).all(axis=1))
+        numpy.testing.assert_array_equal(ids, expected)
+
+        # moving the node moves the hits
+        node = mesh.scene.nodes[0]
+        node.transforms.append(collada.scene.TranslateTransform(1000, 0, 0))
+        node.save()
+        self.assertIsNone(mesh.scene.raycast(origin, [0, 0, -1]))
+        self.assertEqual(mesh.scene.queryBox(lower, upper), [])
+
+    def test_scene_nearest(self):
+        mesh = collada.Collada(os.path.join(self.datadir, "duck_triangles.dae"))
+        node = mesh.scene.nodes[0]
+        node.transforms.append(collada.scene.RotateTransform(1, 1, 0, 30))
+        node.transforms.append(collada.scene.ScaleTransform(1, 2, 0.5))
+        node.save()
+        boundset = list(list(mesh.scene.objects('geometry'))[0].primitives())[0]
+        triangles = boundset.triangleVertices()
+        center = triangles.reshape(-1, 3).mean(axis=0)
+
+        # the same triangle as a brute force search over all of them
+        for offset in ([0, 0, 0], [0, 0, 300], [150, -40, 20], [-500, 500, 500]):
+            point = center + offset
+            expected = pointTriangleDistances(point, triangles)
+            distance, prim, triangle = mesh.scene.nearest(point)
+            self.assertAlmostEqual(distance, expected.min(), places=2)
+            self.assertAlmostEqual(expected[triangle], expected.min(), places=2)
+            self.assertIs(prim.original, boundset.original)
+            numpy.testing.assert_array_almost_equal(prim.triangleVertices()[triangle], triangles[triangle], decimal=3)
+
+        point = center + [-500, 500, 500]
+        self.assertIsNone(mesh.scene.nearest(point, maxdist=pointTriangleDistances(point, triangles).min() - 1))
+        self.assertIsNone(collada.scene.Scene('empty', []).nearest(point))
+
+    def test_scene_objects_in_frustum(self):
+        mesh = collada.Collada()
+        vert_src = collada.source.FloatSource("verts", numpy.array([0, 0, 0, 1, 0, 0, 0, 1, 0], dtype=numpy.float32), ('X', 'Y', 'Z'))
+        geometry = collada.geometry.Geometry(mesh, "geometry0", "triangle", [vert_src])
+        input_list = collada.source.InputList()
+        input_list.addInput(0, 'VERTEX', "#verts")
+        geometry.primitives.append(geometry.createTriangleSet(numpy.array([0, 1, 2]), input_list, None))
+        nodes = [collada.scene.Node('node%d' % i, children=[collada.scene.GeometryNode(geometry)],
+                                    transforms=[collada.scene.TranslateTransform(i * 10, 0, 0)])
+                 for i in range(20)]
+
+        # looking down -Z from above the node at x=50, seeing x from 40 to 60 at z=0
+        cam = collada.camera.PerspectiveCamera("cam", 1, 1000, xfov=90, aspect_ratio=1)
+        camnode = collada.scene.Node('camnode', children=[collada.scene.CameraNode(cam)],
+                                     transforms=[collada.scene.TranslateTransform(50, 0, 10)])
+        scene = collada.scene.Scene('scene', nodes + [camnode])
+        boundcam = list(scene.objects('camera'))[0]
+
+        visible = list(scene.objectsInFrustum(boundcam.frustumPlanes()))
+        self.assertEqual(sorted(g.matrix[0,3] for g in visible), [40, 50, 60])
+        self.assertEqual(list(scene.objectsInFrustum(boundcam.frustumPlanes(), 'controller')), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+
+import numpy
+
+import collada
+from collada.cache import DocumentCache
+from collada.util import unittest, BytesIO
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.datadir = os.path.join(os.path.dirname(os.path.realpath( __file__ )), "data")
+        self.cachedir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir, ignore_errors=True)
+
+    def assertSameArrays(self, mesh, other):
+        self.assertEqual(len(mesh.geometries), len(other.geometries))
+        for geom, ogeom in zip(mesh.geometries, other.geometries):
+            for prim, oprim in zip(geom.primitives, ogeom.primitives):
+                numpy.testing.assert_array_equal(prim.index, oprim.index)
+                numpy.testing.assert_array_almost_equal(prim.vertex, oprim.vertex)
+        self.assertEqual(len(mesh.controllers), len(other.controllers))
+
+    def test_cache_hit(self):
+        cache = DocumentCache(self.cachedir)
+        f = os.path.join(self.datadir, "skinned_box.dae")
+        mesh = collada.Collada(f, cache=cache)
+        self.assertEqual(1, len(cache.entries()))
+
+        cached = collada.Collada(f, cache=self.cachedir)
+        self.assertSameArrays(mesh, cached)
+        positions = cached.geometries['box'].sourceById['box-positions'].data
+        self.assertFalse(positions.flags.writeable)
+        base = positions
+        while base is not None and not isinstance(base, numpy.memmap):
+            base = base.base
+        self.assertIsInstance(base, numpy.memmap)
+        skin = cached.controllers['box-skin']
+        numpy.testing.assert_array_equal(skin.vertex_weight_index, mesh.controllers['box-skin'].vertex_weight_index)
+
+        # arrays are written back when saving a document loaded from the cache
+        out = BytesIO()
+        cached.write(out)
+        self.assertSameArrays(mesh, collada.Collada(BytesIO(out.getvalue())))
+
+    def test_cache_invalidation(self):
+        cache = DocumentCache(self.cachedir)
+        f = os.path.join(self.datadir, "duck_triangles.dae")
+        with open(f, 'rb') as fp:
+            data = fp.read()
+        collada.Collada(BytesIO(data), cache=cache)
+        changed = data.replace(b'<p>89 0 23', b'<p>88 0 23')
+        self.assertNotEqual(data, changed)
+        mesh = collada.Collada(BytesIO(changed), cache=cache)
+        self.assertEqual(2, len(cache.entries()))
+        self.assertEqual(88, mesh.geometries[0].primitives[0].index[0][0][0])
+
+        # broken entries are ignored and replaced
+        key = DocumentCache.key(changed)
+        with open(os.path.join(self.cachedir, key, 'arrays.bin'), 'wb') as fp:
+            fp.write(b'broken')
+        self.assertIsNone(cache.load(key))
+        self.assertSameArrays(mesh, collada.Collada(BytesIO(changed), cache=cache))
+        self.assertIsNotNone(cache.load(key))
+
+    def test_cache_eviction(self):
+        cache = DocumentCache(self.cachedir)
+        collada.Collada(os.path.join(self.datadir, "duck_triangles.dae"), cache=cache)
+        collada.Collada(os.path.join(self.datadir, "skinned_box.dae"), cache=cache)
+        entries = cache.entries()
+        self.assertEqual(2, len(entries))
+        self.assertEqual(sum(e[1] for e in entries), cache.size())
+
+        newest = entries[-1]
+        cache.max_size = newest[1]
+        cache.evict()
+        self.assertEqual([newest[0]], [e[0] for e in cache.entries()])
+
+        cache.clear()
+        self.assertEqual(0, cache.size())
+
+    def test_cache_stream(self):
+        f = os.path.join(self.datadir, "duck_triangles.dae")
+        self.assertRaises(ValueError, collada.Collada, f, stream=True, cache=self.cachedir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import numpy
+
 import collada
 from collada.common import DaeMalformedError
 from collada.util import unittest
@@ -180,5 +182,38 @@ class TestCamera(unittest.TestCase):
         with self.assertRaises(DaeMalformedError):
             cam.save()
 
+    def test_camera_frustum_planes(self):
+        def inside(planes, point):
+            return (numpy.dot(planes[:,:3], point) + planes[:,3] >= 0).all()
+
+        # looking down -X from (10, 0, 0), with +Y up
+        matrix = numpy.array([[0, 0, 1, 10], [0, 1, 0, 0], [-1, 0, 0, 0], [0, 0, 0, 1]],
+                             dtype=numpy.float32)
+        cam = collada.camera.PerspectiveCamera("mycam", 1, 100, yfov=90, aspect_ratio=2)
+        planes = cam.bind(matrix).frustumPlanes()
+        self.assertEqual(planes.shape, (6, 4))
+        numpy.testing.assert_array_almost_equal((planes[:,:3] ** 2).sum(axis=1), numpy.ones(6))
+        self.assertTrue(inside(planes, [0, 0, 0]))
+        self.assertTrue(inside(planes, [0, 9.9, 0]))
+        self.assertFalse(inside(planes, [0, 10.1, 0]))
+        self.assertTrue(inside(planes, [0, 0, 19.9]))
+        self.assertFalse(inside(planes, [0, 0, 20.1]))
+        self.assertFalse(inside(planes, [9.5, 0, 0]))
+        self.assertFalse(inside(planes, [-91, 0, 0]))
+        self.assertFalse(inside(planes, [20, 0, 0]))
+
+        # only xfov, the aspect ratio comes from the image
+        cam = collada.camera.PerspectiveCamera("mycam", 1, 100, xfov=90)
+        planes = cam.bind(matrix).frustumPlanes(aspect_ratio=2)
+        self.assertTrue(inside(planes, [0, 4.9, 9.9]))
+        self.assertFalse(inside(planes, [0, 5.1, 0]))
+
+        cam = collada.camera.OrthographicCamera("mycam", 1, 100, xmag=3, ymag=2)
+        planes = cam.bind(matrix).frustumPlanes()
+        self.assertTrue(inside(planes, [0, 1.9, -2.9]))
+        self.assertFalse(inside(planes, [0, 2.1, 0]))
+        self.assertFalse(inside(planes, [0, 0, 3.1]))
+        self.assertFalse(inside(planes, [-95, 0, 0]))
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,5 @@
 import os
+import zipfile
 import numpy
 import dateutil.parser
 
@@ -132,6 +133,41 @@ class TestCollada(unittest.TestCase):
         self.assertEqual(len(mesh.nodes), 0)
         self.assertIn('VisualSceneNode', mesh.scenes)
 
+    def test_collada_zip_in_place(self):
+        f = os.path.join(self.datadir, "duck.zip")
+        with open(f, 'rb') as fp:
+            data = fp.read()
+
+        class CountingFile(object):
+            def __init__(self, data, seekable=True):
+                self.fp = BytesIO(data)
+                self.nread = 0
+                if seekable:
+                    self.seek = self.fp.seek
+                    self.tell = self.fp.tell
+                    self.seekable = self.fp.seekable
+            def read(self, n=-1):
+                chunk = self.fp.read(n)
+                self.nread += len(chunk)
+                return chunk
+
+        counting = CountingFile(data)
+        mesh = collada.Collada(counting, skip_libraries=['images'])
+        self.assertIn('LOD3spShape-lib', mesh.geometries)
+        # the texture stored in the archive is never read
+        texture = zipfile.ZipFile(BytesIO(data)).getinfo('duckCM.tga')
+        self.assertLess(counting.nread, len(data) - texture.compress_size)
+
+        with open(f, 'rb') as fp:
+            mesh = collada.Collada(fp)
+            self.assertGreater(len(mesh.images['file2'].data), 0)
+        mesh = collada.Collada(CountingFile(data, seekable=False))
+        self.assertIn('LOD3spShape-lib', mesh.geometries)
+        self.assertGreater(len(mesh.images['file2'].data), 0)
+
+        self.assertRaises(collada.DaeIncompleteError, collada.Collada,
+                          BytesIO(data), zip_filename='missing.dae')
+
     def test_collada_saving(self):
         mesh = collada.Collada(validate_output=True)
 
@@ -350,5 +386,260 @@ class TestCollada(unittest.TestCase):
         triangles = mesh.geometries[0].primitives[0]
         self.assertEqual(0, len(triangles))
 
+    def test_collada_stream(self):
+        for name in ("duck_triangles.dae", "duck_polylist.dae", "skinned_box.dae"):
+            f = os.path.join(self.datadir, name)
+            mesh = collada.Collada(f)
+            streamed = collada.Collada(f, stream=True, validate_output=True)
+
+            self.assertEqual(len(mesh.geometries), len(streamed.geometries))
+            self.assertEqual(len(mesh.controllers), len(streamed.controllers))
+            for geom, sgeom in zip(mesh.geometries, streamed.geometries):
+                self.assertEqual(geom.id, sgeom.id)
+                for src_id, src in geom.sourceById.items():
+                    if isinstance(src, collada.source.Source):
+                        numpy.testing.assert_array_equal(src.data, sgeom.sourceById[src_id].data)
+                for prim, sprim in zip(geom.primitives, sgeom.primitives):
+                    numpy.testing.assert_array_equal(prim.index, sprim.index)
+                for arraynode in sgeom.xmlnode.iter(collada.tag('float_array')):
+                    self.assertIsNone(arraynode.text)
+
+            out = BytesIO()
+            streamed.write(out)
+            reloaded = collada.Collada(BytesIO(out.getvalue()))
+            for geom, rgeom in zip(mesh.geometries, reloaded.geometries):
+                for prim, rprim in zip(geom.primitives, rgeom.primitives):
+                    numpy.testing.assert_array_equal(prim.index, rprim.index)
+                    numpy.testing.assert_array_almost_equal(prim.vertex, rprim.vertex)
+            for cont, rcont in zip(mesh.controllers, reloaded.controllers):
+                self.assertEqual(type(cont), type(rcont))
+
+    def test_collada_stream_unloaded(self):
+        # arrays of a spline and of a controller that fails to load keep
+        # their text, since no object can write them back
+        with open(os.path.join(self.datadir, "skinned_box.dae"), 'rb') as f:
+            text = f.read()
+        spline = b'''<geometry id="curve"><spline><source id="curve-points">
+          <float_array id="curve-points-array" count="3">1 2 3</float_array>
+          </source></spline></geometry>'''
+        broken = b'''<controller id="broken"><skin source="#missing">
+          <source id="broken-weights"><float_array id="broken-weights-array" count="1">0.5</float_array>
+          </source></skin></controller>'''
+        text = text.replace(b'<library_geometries>', b'<library_geometries>' + spline)
+        text = text.replace(b'<library_controllers>', b'<library_controllers>' + broken)
+        errors = [collada.DaeIncompleteError, collada.DaeBrokenRefError]
+        streamed = collada.Collada(BytesIO(text), stream=True, ignore=errors)
+        self.assertNotIn('curve', streamed.geometries)
+        self.assertNotIn('broken', streamed.controllers)
+
+        arrays = dict((node.get('id'), node.text) for node in streamed.xmlnode.iter(collada.tag('float_array')))
+        self.assertEqual(arrays['curve-points-array'], '1 2 3')
+        self.assertEqual(arrays['broken-weights-array'], '0.5')
+        self.assertIsNone(arrays['box-positions-array'])
+
+    def test_collada_malformed_arrays(self):
+        with open(os.path.join(self.datadir, "skinned_box.dae"), 'rb') as f:
+            text = f.read()
+        for good, bad in ((b'<v>0 0 0 0', b'<v>0 0 x 0'),
+                          (b'<vcount>1 1 1', b'<vcount>1 1; 1'),
+                          (b'<p>0 0 2 0 3', b'<p>0 0 2 0 three'),
+                          (b'count="3">0 1 2</float_array>', b'count="3">0 1 2,</float_array>')):
+            self.assertIn(good, text)
+            broken = text.replace(good, bad, 1)
+            self.assertRaises(collada.DaeMalformedError, collada.Collada, BytesIO(broken))
+
+    def test_collada_write_stream(self):
+        for name in ("duck_triangles.dae", "duck_polylist.dae", "skinned_box.dae", "tristrips.dae"):
+            f = os.path.join(self.datadir, name)
+            for stream in (False, True):
+                mesh = collada.Collada(f, stream=stream)
+                expected = BytesIO()
+                mesh.write(expected)
+
+                streamed = collada.Collada(f, stream=stream)
+                out = BytesIO()
+                streamed.write(out, stream=True)
+                self.assertEqual(expected.getvalue(), out.getvalue())
+                if stream:
+                    # arrays written from their numpy data have their text released
+                    for arraynode in streamed.geometries[0].xmlnode.iter(collada.tag('float_array')):
+                        self.assertIsNone(arraynode.text)
+
+                # the released text is written again by the next save, which
+                # saves the geometries again as if they had been modified
+                if stream:
+                    for geom in mesh.geometries:
+                        geom.markDirty()
+                expected = BytesIO()
+                mesh.write(expected)
+                out = BytesIO()
+                streamed.write(out)
+                self.assertEqual(expected.getvalue(), out.getvalue())
+
+    def test_collada_dirty_tracking(self):
+        f = os.path.join(self.datadir, "duck_triangles.dae")
+        mesh = collada.Collada(f)
+        geom = mesh.geometries[0]
+        effect = mesh.effects['blinn3-fx']
+        normals = geom.sourceById['LOD3spShape-lib-normals']
+        positions = geom.sourceById['LOD3spShape-lib-positions']
+        for obj in (geom, effect, mesh.materials['blinn3'], mesh.scene, normals):
+            self.assertFalse(obj.isDirty())
+
+        # replacing an attribute marks the object and what refers to it
+        effect.shininess = 0.5
+        self.assertTrue(effect.isDirty())
+        self.assertTrue(mesh.materials['blinn3'].isDirty())
+        self.assertFalse(geom.isDirty())
+
+        # changes made in place in a numpy array need markDirty
+        normals.data[0] = [1, 0, 0]
+        self.assertFalse(normals.isDirty())
+        normals.markDirty()
+        self.assertTrue(normals.isDirty())
+        self.assertTrue(geom.isDirty())
+
+        # unchanged sources keep their original text when saving
+        arraynode = positions.xmlnode.find(collada.tag('float_array'))
+        arraynode.text = arraynode.text.replace(' ', '  ')
+        mesh.save()
+        self.assertIn('  ', arraynode.text)
+        self.assertNotIn('  ', normals.xmlnode.find(collada.tag('float_array')).text)
+        for obj in (geom, effect, normals):
+            self.assertFalse(obj.isDirty())
+        reloaded = collada.Collada(BytesIO(tostring(mesh.xmlnode)))
+        self.assertAlmostEqual(0.5, reloaded.effects['blinn3-fx'].shininess)
+        numpy.testing.assert_array_almost_equal(
+            [1, 0, 0], reloaded.geometries[0].sourceById['LOD3spShape-lib-normals'].data[0])
+
+        # changes to the items of lists are detected
+        scene = mesh.scene
+        node = scene.nodes[0]
+        scene.nodes.remove(node)
+        self.assertTrue(scene.isDirty())
+        scene.nodes.insert(0, node)
+        mesh.save()
+        self.assertFalse(scene.isDirty())
+        node.transforms.append(collada.scene.ScaleTransform(2, 2, 2))
+        self.assertTrue(node.isDirty())
+        self.assertTrue(scene.isDirty())
+        self.assertFalse(scene.nodes[1].isDirty())
+
+        # saving only visits what was modified
+        saved = []
+        nodesave = collada.scene.Node.save
+        def countingSave(self):
+            saved.append(self)
+            nodesave(self)
+        collada.scene.Node.save = countingSave
+        try:
+            mesh.save()
+            self.assertEqual(saved, [node])
+            del saved[:]
+            mesh.save()
+            self.assertEqual(saved, [])
+        finally:
+            collada.scene.Node.save = nodesave
+        self.assertFalse(scene.isDirty())
+        self.assertFalse(node.isDirty())
+
+    def test_collada_lazy(self):
+        f = os.path.join(self.datadir, "skinned_box.dae")
+        mesh = collada.Collada(f)
+        lazy = collada.Collada(f, lazy=True)
+
+        # only the geometry asked for is created
+        box = lazy.geometries['box']
+        self.assertIsNotNone(box)
+        self.assertIn('box-wide', lazy._geometries._pendingkeys)
+        self.assertIn('_effects', lazy._pendingLibraries)
+
+        # the controllers pull in the other geometry on demand
+        self.assertEqual(len(mesh.controllers), len(lazy.controllers))
+        morph = lazy.controllers['box-morph']
+        self.assertIs(morph.target_list[0][0], lazy.geometries['box-wide'])
+
+        self.assertEqual([g.id for g in mesh.geometries], [g.id for g in lazy.geometries])
+        self.assertIs(lazy.geometries[0], box)
+        self.assertEqual(mesh.scene.id, lazy.scene.id)
+        self.assertEqual(len(list(mesh.scene.objects('geometry'))),
+                         len(list(lazy.scene.objects('geometry'))))
+
+        out = BytesIO()
+        lazy.write(out)
+        reloaded = collada.Collada(BytesIO(out.getvalue()))
+        self.assertEqual(len(mesh.geometries), len(reloaded.geometries))
+        self.assertEqual(len(mesh.controllers), len(reloaded.controllers))
+
+        # the default scene survives writing without being read first
+        untouched = collada.Collada(f, lazy=True)
+        out = BytesIO()
+        untouched.write(out)
+        reloaded = collada.Collada(BytesIO(out.getvalue()))
+        self.assertIsNotNone(reloaded.scene)
+        self.assertEqual(reloaded.scene.id, mesh.scene.id)
+
+        # objects loaded on demand start out saved
+        lazy = collada.Collada(f, lazy=True)
+        self.assertFalse(lazy.geometries['box'].isDirty())
+        self.assertFalse(any(c.isDirty() for c in lazy.controllers))
+        self.assertFalse(lazy.scene.isDirty())
+
+    def test_collada_skip_libraries(self):
+        f = os.path.join(self.datadir, "duck_triangles.dae")
+        mesh = collada.Collada(f, skip_libraries=['images'], validate_output=True)
+        self.assertEqual(mesh.skippedLibraries, frozenset(['images', 'effects', 'materials']))
+        self.assertEqual(0, len(mesh.effects))
+        self.assertEqual(0, len(mesh.materials))
+        self.assertEqual(1, len(mesh.geometries))
+        boundgeoms = list(mesh.scene.objects('geometry'))
+        self.assertEqual(1, len(boundgeoms))
+        self.assertEqual(4212, len(list(boundgeoms[0].primitives())[0]))
+
+        # skipped libraries are written back untouched
+        out = BytesIO()
+        mesh.write(out)
+        reloaded = collada.Collada(BytesIO(out.getvalue()))
+        self.assertEqual(1, len(reloaded.effects))
+        self.assertEqual(1, len(reloaded.materials))
+
+        mesh = collada.Collada(f, libraries=['geometries'])
+        self.assertIsNone(mesh.scene)
+        self.assertEqual(0, len(mesh.scenes))
+        self.assertEqual(1, len(mesh.geometries))
+        self.assertIn('scenes', mesh.skippedLibraries)
+
+        f = os.path.join(self.datadir, "skinned_box.dae")
+        mesh = collada.Collada(f, skip_libraries=['geometries'])
+        self.assertEqual(0, len(mesh.controllers))
+        self.assertEqual(0, len(list(mesh.scene.objects('controller'))))
+        self.assertEqual(0, len(list(mesh.scene.objects('geometry'))))
+
+        self.assertRaises(ValueError, collada.Collada, f, libraries=['notalibrary'])
+
+    def test_collada_workers(self):
+        f = os.path.join(self.datadir, "skinned_box.dae")
+        mesh = collada.Collada(f)
+        parallel = collada.Collada(f, workers=4)
+        self.assertEqual([g.id for g in mesh.geometries], [g.id for g in parallel.geometries])
+        for geom, pgeom in zip(mesh.geometries, parallel.geometries):
+            self.assertIs(pgeom.collada, parallel)
+            numpy.testing.assert_array_equal(geom.primitives[0].vertex, pgeom.primitives[0].vertex)
+            numpy.testing.assert_array_equal(geom.primitives[0].index, pgeom.primitives[0].index)
+        self.assertEqual(len(mesh.controllers), len(parallel.controllers))
+
+        with open(f, 'rb') as fp:
+            data = fp.read()
+        data = data.replace(b'semantic="NORMAL" source="#box-normals"', b'semantic="FOO" source="#box-normals"')
+        data = data.replace(b'semantic="NORMAL" source="#box-wide-normals"', b'semantic="BAR" source="#box-wide-normals"')
+        serial = collada.Collada(BytesIO(data), ignore=[collada.DaeUnsupportedError])
+        parallel = collada.Collada(BytesIO(data), ignore=[collada.DaeUnsupportedError], workers=2)
+        self.assertEqual([str(e) for e in serial.errors], [str(e) for e in parallel.errors])
+        self.assertIn('FOO', str(parallel.errors[0]))
+        self.assertIn('BAR', str(parallel.errors[1]))
+
+        # without ignoring, the first error is raised
+        self.assertRaises(collada.DaeUnsupportedError, collada.Collada, BytesIO(data), workers=2)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,121 @@
+import os
+
+import numpy
+
+import collada
+from collada.util import unittest, BytesIO
+
+
+class TestController(unittest.TestCase):
+
+    def setUp(self):
+        self.datadir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+        self.mesh = collada.Collada(os.path.join(self.datadir, "skinned_box.dae"))
+        self.skin = self.mesh.controllers['box-skin']
+
+    def referencePose(self, skin, joint_matrices):
+        # linear blend skinning one vertex at a time
+        names = list(skin.weight_joints)
+        vertices = skin.geometry.primitives[0].vertex
+        posed = []
+        for vertex, influence in zip(vertices, skin.index):
+            point = numpy.dot(skin.bind_shape_matrix, numpy.append(vertex, 1))
+            total = numpy.zeros(4)
+            for joint, weight in zip(influence[:, skin.offsets[0]], influence[:, skin.offsets[1]]):
+                matrix = numpy.dot(joint_matrices[joint], skin.joint_matrices[names[joint]])
+                total += skin.weights.data[weight][0] * numpy.dot(matrix, point)
+            posed.append(total[:3])
+        return numpy.array(posed)
+
+    def test_skin_weights(self):
+        skin = self.skin
+        self.assertEqual(len(skin), 8)
+        numpy.testing.assert_array_equal(skin.influence_offsets, [0, 1, 2, 3, 4, 6, 8, 10, 12])
+        numpy.testing.assert_array_equal(skin.influence_joints, [0, 0, 0, 0, 0, 1, 0, 1, 0, 1, 0, 1])
+        numpy.testing.assert_array_almost_equal(skin.influence_weights[4:6], [0.25, 0.75])
+        numpy.testing.assert_array_equal(skin[4], [[0, 1], [1, 2]])
+        self.assertEqual(len(skin.index), 8)
+        numpy.testing.assert_array_equal(skin.joint_index[4], [0, 1])
+        numpy.testing.assert_array_equal(skin.weight_index[4], [1, 2])
+
+        joints, weights = skin.denseWeights()
+        self.assertEqual(joints.shape, (8, 4))
+        numpy.testing.assert_array_equal(joints[0], [0, 0, 0, 0])
+        numpy.testing.assert_array_almost_equal(weights[0], [1, 0, 0, 0])
+        numpy.testing.assert_array_equal(joints[4], [0, 1, 0, 0])
+        numpy.testing.assert_array_almost_equal(weights[4], [0.25, 0.75, 0, 0])
+
+        # keeping the largest weight only, scaled back to 1 or not
+        joints, weights = skin.denseWeights(k=1)
+        numpy.testing.assert_array_equal(joints[:, 0], [0, 0, 0, 0, 1, 1, 1, 1])
+        numpy.testing.assert_array_almost_equal(weights[:, 0], numpy.ones(8))
+        joints, weights = skin.denseWeights(k=1, normalize=False)
+        numpy.testing.assert_array_almost_equal(weights[4:, 0], [0.75] * 4)
+
+    def test_skin_float_indices(self):
+        # <v> is read as integers, and indices written as floats still load
+        with open(os.path.join(self.datadir, "skinned_box.dae"), 'rb') as f:
+            text = f.read()
+        text = text.replace(b'<v>0 0 0 0 0 0 0 0 0 1 1 2', b'<v>0 0 0 0 0 0 0 0 0 1.0 1 2.0')
+        skin = collada.Collada(BytesIO(text)).controllers['box-skin']
+        numpy.testing.assert_array_equal(skin.influence_joints, self.skin.influence_joints)
+        numpy.testing.assert_array_equal(skin.influence_weights, self.skin.influence_weights)
+
+    def test_skin_vertices(self):
+        skin = self.skin
+        prim = skin.geometry.primitives[0]
+
+        # the joints at their bind positions leave the skin as it is
+        bind = numpy.array([numpy.linalg.inv(skin.joint_matrices[name]) for name in skin.weight_joints])
+        numpy.testing.assert_array_almost_equal(skin.skinVertices(bind), prim.vertex)
+
+        # bend the tip joint by 90 degrees around X
+        tip = numpy.dot(bind[1], collada.scene.makeRotationMatrix(1, 0, 0, numpy.pi / 2))
+        pose = numpy.array([bind[0], tip])
+        posed = skin.skinVertices(pose)
+        numpy.testing.assert_array_almost_equal(posed, self.referencePose(skin, pose), decimal=5)
+        self.assertTrue((numpy.abs(posed - prim.vertex) > 0.1).any())
+
+        # several poses at once
+        poses = numpy.array([bind, pose])
+        numpy.testing.assert_array_almost_equal(skin.skinVertices(poses), [prim.vertex, posed])
+        self.assertEqual(skin.skinMatrices(poses).shape, (2, len(prim.vertex), 4, 4))
+
+        normals = skin.skinNormals(pose, prim)
+        self.assertEqual(normals.shape, prim.normal_index.shape + (3,))
+        numpy.testing.assert_array_almost_equal((normals ** 2).sum(axis=-1), numpy.ones(prim.normal_index.shape))
+        numpy.testing.assert_array_almost_equal(skin.skinNormals(bind, prim), prim.normal[prim.normal_index])
+
+        self.assertRaises(ValueError, skin.skinVertices, bind[:1])
+
+    def test_morph_vertices(self):
+        morph = self.mesh.controllers['box-morph']
+        self.assertEqual(morph.method, 'NORMALIZED')
+        numpy.testing.assert_array_almost_equal(morph.weights(), [0.5])
+        base = morph.source_geometry.primitives[0].vertex
+        target = morph.target_list[0][0].primitives[0].vertex
+
+        numpy.testing.assert_array_almost_equal(morph.morphVertices(), 0.5 * base + 0.5 * target)
+        numpy.testing.assert_array_almost_equal(morph.morphVertices([1]), target)
+        frames = morph.morphVertices(numpy.linspace(0, 1, 5)[:, numpy.newaxis])
+        self.assertEqual(frames.shape, (5, len(base), 3))
+        numpy.testing.assert_array_almost_equal(frames[0], base)
+        numpy.testing.assert_array_almost_equal(frames[1], 0.75 * base + 0.25 * target)
+        self.assertRaises(ValueError, morph.morphVertices, [0.5, 0.5])
+
+        # replacing the vertex array of a target is picked up
+        targetprim = morph.target_list[0][0].primitives[0]
+        targetprim._vertex = target + 1
+        numpy.testing.assert_array_almost_equal(morph.morphVertices([1]), target + 1)
+        targetprim._vertex = target
+
+        relative = collada.controller.Morph(morph.source_geometry, morph.target_list,
+                                            morph.xmlnode, 'RELATIVE')
+        numpy.testing.assert_array_almost_equal(relative.morphVertices([2]), base + 2 * target)
+
+        matrix = collada.scene.TranslateTransform(0, 0, 10).matrix
+        bound = morph.bind(matrix, {})
+        numpy.testing.assert_array_almost_equal(bound.morphVertices([0]), base + [0, 0, 10])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -167,5 +167,41 @@ class TestGeometry(unittest.TestCase):
         self.assertEqual(len(loaded_geometry.primitives), 1)
         self.assertEqual(len(loaded_geometry.primitives[0]), 6)
 
+    def test_geometry_bounds(self):
+        vert_floats = [0,0,0, 1,0,0, 0,2,0, 0,0,3, 100,100,100]
+        vert_src = collada.source.FloatSource("verts-array", numpy.array(vert_floats, dtype=numpy.float32), ('X', 'Y', 'Z'))
+        geometry = collada.geometry.Geometry(self.dummy, "geometry0", "mygeom", [vert_src])
+        input_list = collada.source.InputList()
+        input_list.addInput(0, 'VERTEX', "#verts-array")
+        triset = geometry.createTriangleSet(numpy.array([0, 1, 2]), input_list, None)
+        lineset = geometry.createLineSet(numpy.array([0, 3]), input_list, "materialref")
+        geometry.primitives.append(triset)
+
+        # the source covers all its points, primitives only the ones they use
+        numpy.testing.assert_array_equal(vert_src.bounds(), [[0, 0, 0], [100, 100, 100]])
+        numpy.testing.assert_array_equal(triset.bounds(), [[0, 0, 0], [1, 2, 0]])
+        numpy.testing.assert_array_equal(lineset.bounds(), [[0, 0, 0], [0, 0, 3]])
+        numpy.testing.assert_array_equal(geometry.bounds(), [[0, 0, 0], [1, 2, 0]])
+        self.assertIs(triset.bounds(), triset.bounds())
+        self.assertIs(geometry.bounds(), geometry.bounds())
+
+        geometry.primitives.append(lineset)
+        numpy.testing.assert_array_equal(geometry.bounds(), [[0, 0, 0], [1, 2, 3]])
+
+        # changes made in place are seen after markDirty
+        vert_src.data[1] = [-5, 0, 0]
+        vert_src.markDirty()
+        numpy.testing.assert_array_equal(vert_src.bounds()[0], [-5, 0, 0])
+        numpy.testing.assert_array_equal(geometry.bounds()[0], [-5, 0, 0])
+
+        # a rotation of 90 degrees around Z swaps X and Y
+        matrix = collada.scene.makeRotationMatrix(0, 0, 1, numpy.pi / 2)
+        matrix[:3,3] = [10, 0, 0]
+        bound = geometry.bind(matrix, {})
+        numpy.testing.assert_array_almost_equal(bound.bounds(), [[8, -5, 0], [10, 0, 3]])
+
+        empty = collada.geometry.Geometry(self.dummy, "geometry1", "empty", [vert_src])
+        self.assertIsNone(empty.bounds())
+
 if __name__ == '__main__':
     unittest.main()
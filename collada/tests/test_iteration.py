@@ -1,3 +1,5 @@
+import os
+
 import numpy
 from collada.xmlutil import etree
 fromstring = etree.fromstring
@@ -61,6 +63,61 @@ class TestIteration(unittest.TestCase):
         self.assertEqual(list(tris[0].normal_indices), [0, 1, 2])
         self.assertEqual(tris[0].texcoord_indices, [])
 
+    def test_triangle_arrays(self):
+        datadir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+        mesh = collada.Collada(os.path.join(datadir, "duck_triangles.dae"))
+        triset = mesh.geometries[0].primitives[0]
+        bound = list(mesh.scene.objects('geometry'))[0]
+        boundset = list(bound.primitives())[0]
+
+        for prim in (triset, boundset):
+            tris = list(prim)
+            verts = prim.triangleVertices()
+            self.assertEqual(verts.shape, (len(prim), 3, 3))
+            numpy.testing.assert_array_equal(verts, [t.vertices for t in tris])
+            numpy.testing.assert_array_equal(prim.triangleNormals(), [t.normals for t in tris])
+            texcoords = prim.triangleTexcoords()
+            self.assertEqual(len(texcoords), 1)
+            self.assertEqual(texcoords[0].shape, (len(prim), 3, 2))
+            numpy.testing.assert_array_equal(texcoords[0], [t.texcoords[0] for t in tris])
+
+            numpy.testing.assert_array_almost_equal(prim.faceCentroids()[5], tris[5].vertices.mean(axis=0))
+            v = tris[5].vertices
+            cross = numpy.cross(v[1] - v[0], v[2] - v[0])
+            area = numpy.linalg.norm(cross)
+            self.assertAlmostEqual(prim.faceAreas()[5], area / 2, places=3)
+            numpy.testing.assert_array_almost_equal(prim.faceNormals()[5], cross / area)
+
+        # normals are computed from the faces when the set has none
+        input_list = collada.source.InputList()
+        input_list.addInput(0, 'VERTEX', triset.sources['VERTEX'][0][2])
+        nonormals = mesh.geometries[0].createTriangleSet(
+            triset.vertex_index.flatten(), input_list, None)
+        tris = list(nonormals)
+        numpy.testing.assert_array_almost_equal(nonormals.triangleNormals(), [t.normals for t in tris])
+
+    def test_bound_primitive_lazy_transform(self):
+        datadir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+        for name in ("duck_triangles.dae", "duck_polylist.dae"):
+            mesh = collada.Collada(os.path.join(datadir, name))
+            prim = mesh.geometries[0].primitives[0]
+            matrix = numpy.array([[0, -2, 0, 1], [2, 0, 0, 2], [0, 0, 2, 3], [0, 0, 0, 1]], dtype=numpy.float32)
+            bound = prim.bind(matrix, {})
+
+            # nothing is transformed until the vertices or normals are used
+            self.assertEqual(len(bound), len(prim))
+            self.assertIs(bound.local_vertex, prim.vertex)
+            self.assertIs(bound.local_normal, prim.normal)
+            self.assertIs(bound.matrix, matrix)
+            self.assertIs(bound._transformedVertex, collada.primitive._PENDING)
+            self.assertIs(bound._transformedNormal, collada.primitive._PENDING)
+
+            expected = numpy.dot(prim.vertex, matrix[:3,:3].T) + matrix[:3,3]
+            numpy.testing.assert_array_almost_equal(bound.vertex, expected)
+            self.assertIs(bound.vertex, bound.vertex)
+            self.assertIs(bound._transformedNormal, collada.primitive._PENDING)
+            numpy.testing.assert_array_almost_equal(bound.normal, numpy.dot(prim.normal, matrix[:3,:3].T))
+
     def test_polylist_iterator_vert_normals(self):
         mesh = collada.Collada(validate_output=True)
 
@@ -39,8 +39,10 @@ class TestLineset(unittest.TestCase):
 
         # Check the initial values for the lineset.
         self.assertIsNotNone(str(lineset))
-        assert_array_equal(lineset.index, indices)
-        self.assertEqual(lineset.nlines, len(indices))
+        assert_array_equal(lineset.index, indices.reshape(-1, 2, 1))
+        self.assertEqual(lineset.nlines, len(indices) // 2)
+        # the array passed in is not modified
+        self.assertEqual(indices.shape, (10,))
         self.assertEqual(lineset.material, "mymaterial")
 
         # Serialize and deserialize.
@@ -190,6 +190,14 @@ class TestScene(unittest.TestCase):
         self.assertTrue(type(yournode.transforms[0]) is collada.scene.ScaleTransform)
         self.assertTrue(type(yournode.transforms[1]) is collada.scene.TranslateTransform)
 
+        # consecutive children that were removed are all deleted
+        del mynode.children[:]
+        mynode.transforms.pop(0)
+        mynode.save()
+        yournode = collada.scene.Node.load(self.dummy, fromstring(tostring(mynode.xmlnode)), {})
+        self.assertEqual(len(yournode.children), 0)
+        self.assertEqual(len(yournode.transforms), 1)
+
     def test_scene_material_node(self):
         binding1 = ("TEX0", "TEXCOORD", "0")
         binding2 = ("TEX1", "TEXCOORD", "1")
@@ -310,5 +318,126 @@ class TestScene(unittest.TestCase):
         self.assertEqual(loaded_scene.nodes[1].id, 'othernode')
         self.assertEqual(loaded_scene.nodes[2].id, 'anothernode')
 
+    def test_scene_flatten(self):
+        geomnode = collada.scene.GeometryNode(self.geometry)
+        camnode = collada.scene.CameraNode(self.yourcam)
+        inner = collada.scene.Node('inner', children=[geomnode],
+                                   transforms=[collada.scene.ScaleTransform(2, 2, 2)])
+        middle = collada.scene.Node('middle', children=[inner, camnode],
+                                    transforms=[collada.scene.RotateTransform(0, 0, 1, 90)])
+        outer = collada.scene.Node('outer', children=[middle, collada.scene.NodeNode(inner)],
+                                   transforms=[collada.scene.TranslateTransform(1, 2, 3)])
+        scene = collada.scene.Scene('myscene', [outer, collada.scene.GeometryNode(self.geometry2)])
+
+        flat = scene.flatten()
+        self.assertIs(flat, scene.flatten())
+        self.assertEqual([n.id for n in flat.nodes], ['outer', 'middle', 'inner', 'inner'])
+        self.assertEqual(list(flat.parents), [-1, 0, 1, 0])
+        numpy.testing.assert_array_almost_equal(flat.world[2],
+                numpy.dot(numpy.dot(outer.matrix, middle.matrix), inner.matrix))
+        numpy.testing.assert_array_almost_equal(flat.world[3], numpy.dot(outer.matrix, inner.matrix))
+
+        instances, matrices = flat.instanceMatrices('geometry')
+        self.assertEqual(instances, [geomnode, geomnode, scene.nodes[1]])
+        numpy.testing.assert_array_almost_equal(matrices[:2], flat.world[[2, 3]])
+        numpy.testing.assert_array_almost_equal(matrices[2], numpy.identity(4))
+        expected = [o for node in scene.nodes for o in node.objects('geometry')]
+        bound = list(scene.objects('geometry'))
+        self.assertEqual([b.original for b in bound], [e.original for e in expected])
+        for b, e in zip(bound, expected):
+            numpy.testing.assert_array_almost_equal(b.matrix, e.matrix)
+        self.assertEqual(1, len(list(scene.objects('camera'))))
+
+        # the flattened scene is rebuilt when the graph changes
+        middle.children.remove(camnode)
+        self.assertIsNot(flat, scene.flatten())
+        self.assertEqual(0, len(list(scene.objects('camera'))))
+        flat = scene.flatten()
+        inner.transforms.append(collada.scene.TranslateTransform(1, 0, 0))
+        self.assertIs(flat, scene.flatten())
+        inner.save()
+        self.assertIsNot(flat, scene.flatten())
+        numpy.testing.assert_array_almost_equal(scene.flatten().world[3], numpy.dot(outer.matrix, inner.matrix))
+
+        # instantiating a node inside itself is an error
+        inner.children.append(collada.scene.NodeNode(middle))
+        self.assertRaises(collada.DaeMalformedError, scene.flatten)
+
+    def test_scene_bounds(self):
+        vert_src = collada.source.FloatSource("verts-array", numpy.array([0, 0, 0, 1, 1, 1], dtype=numpy.float32), ('X', 'Y', 'Z'))
+        geometry = collada.geometry.Geometry(self.dummy, "geometry2", "box", [vert_src])
+        input_list = collada.source.InputList()
+        input_list.addInput(0, 'VERTEX', "#verts-array")
+        geometry.primitives.append(geometry.createLineSet(numpy.array([0, 1]), input_list, "materialref"))
+
+        child = collada.scene.Node('child', children=[collada.scene.GeometryNode(geometry)],
+                                   transforms=[collada.scene.ScaleTransform(2, 2, 2)])
+        parent = collada.scene.Node('parent', children=[child, collada.scene.GeometryNode(self.geometry)],
+                                    transforms=[collada.scene.TranslateTransform(10, 0, 0)])
+        other = collada.scene.Node('other', children=[collada.scene.GeometryNode(geometry)],
+                                   transforms=[collada.scene.TranslateTransform(0, -5, 0)])
+        scene = collada.scene.Scene('myscene', [parent, other])
+
+        numpy.testing.assert_array_almost_equal(child.bounds(), [[0, 0, 0], [2, 2, 2]])
+        numpy.testing.assert_array_almost_equal(parent.bounds(), [[10, 0, 0], [12, 2, 2]])
+        numpy.testing.assert_array_almost_equal(scene.bounds(), [[0, -5, 0], [12, 2, 2]])
+        instances, bounds = scene.flatten().instanceBounds()
+        self.assertEqual(len(instances), 2)
+        self.assertEqual(bounds.shape, (2, 2, 3))
+
+        # the boxes are kept, and a second call doesn't recompute them
+        self.assertIs(scene.bounds(), scene.bounds())
+        self.assertIs(parent.bounds(), parent.bounds())
+        calls = []
+        transformBounds = collada.scene.transformBounds
+        collada.scene.transformBounds = lambda *args: calls.append(args)
+        try:
+            scene.bounds()
+            parent.bounds()
+            scene.flatten().instanceBounds()
+        finally:
+            collada.scene.transformBounds = transformBounds
+        self.assertEqual(calls, [])
+
+        child.transforms.append(collada.scene.TranslateTransform(0, 0, 5))
+        child.save()
+        numpy.testing.assert_array_almost_equal(scene.bounds(), [[0, -5, 0], [12, 2, 12]])
+        numpy.testing.assert_array_almost_equal(parent.bounds(), [[10, 0, 10], [12, 2, 12]])
+
+        # replacing the vertices of a geometry updates the boxes
+        lines = geometry.primitives[0]
+        lines._vertex = lines._vertex * 2
+        numpy.testing.assert_array_almost_equal(scene.bounds(), [[0, -5, 0], [14, 4, 14]])
+        numpy.testing.assert_array_almost_equal(child.bounds(), [[0, 0, 10], [4, 4, 14]])
+        self.assertIsNone(collada.scene.Scene('empty', []).bounds())
+
+    def test_scene_instance_groups(self):
+        mat = collada.material.Material("mymaterial", "mymat", self.effect)
+        mat2 = collada.material.Material("yourmaterial", "yourmat", self.effect2)
+        nodes = []
+        for i in range(5):
+            materials = [collada.scene.MaterialNode("mysymbol", mat2 if i == 3 else mat, [])]
+            geometry = self.geometry2 if i == 4 else self.geometry
+            geomnode = collada.scene.GeometryNode(geometry, materials)
+            nodes.append(collada.scene.Node('node%d' % i, children=[geomnode],
+                    transforms=[collada.scene.TranslateTransform(i, 0, 0)]))
+        scene = collada.scene.Scene('myscene', nodes)
+
+        groups = scene.instanceGroups()
+        self.assertEqual([(g.original, len(g)) for g in groups],
+                         [(self.geometry, 3), (self.geometry, 1), (self.geometry2, 1)])
+        self.assertIs(groups[0].materialnodebysymbol['mysymbol'].target, mat)
+        self.assertIs(groups[1].materialnodebysymbol['mysymbol'].target, mat2)
+        self.assertEqual(groups[0].instances, [nodes[i].children[0] for i in (0, 1, 2)])
+        self.assertEqual(groups[0].matrices.shape, (3, 4, 4))
+        numpy.testing.assert_array_almost_equal(groups[0].matrices[:,0,3], [0, 1, 2])
+        numpy.testing.assert_array_almost_equal(groups[1].matrices[:,0,3], [3])
+
+        bound = groups[0].bind()
+        self.assertIs(bound.original, self.geometry)
+        numpy.testing.assert_array_almost_equal(bound.matrix, numpy.identity(4))
+        self.assertEqual(0, len(scene.instanceGroups('controller')))
+        self.assertRaises(ValueError, scene.instanceGroups, 'camera')
+
 if __name__ == '__main__':
     unittest.main()
@@ -65,5 +65,84 @@ class TestSource(unittest.TestCase):
         self.assertEqual(len(loaded_namesource), 3)
         self.assertTupleEqual(loaded_namesource.components, ('WEIGHT', 'WHATEVER'))
 
+    def test_numeric_parser(self):
+        values = numpy.arange(1000, dtype=numpy.float32) / 8
+        text = '\n'.join(' '.join('%g' % v for v in values[i:i+10]) for i in range(0, len(values), 10))
+        floatsource = collada.source.FloatSource("myfloatsource", values.copy(), ('X',))
+        floatsource.save()
+        floatsource.xmlnode.find(collada.tag('float_array')).text = text
+
+        self.assertEqual(0, len(collada.util.parseNumericText(None, numpy.float32)))
+        self.assertEqual(0, len(collada.util.parseNumericText(' \n ', numpy.int32)))
+
+        with collada.util.ThreadedNumericParser(workers=3, chunk_size=100) as parser:
+            self.assertGreater(len(list(parser._chunks(text))), 10)
+            numpy.testing.assert_array_equal(parser.parse(text, numpy.float32), values)
+            numpy.testing.assert_array_equal(parser.parse('1 2\t3\n4 5 6', numpy.int32), [1, 2, 3, 4, 5, 6])
+
+            collada.util.setNumericParser(parser)
+            try:
+                self.assertIs(collada.util.getNumericParser(), parser)
+                loaded = collada.source.Source.load(self.dummy, {}, fromstring(tostring(floatsource.xmlnode)))
+            finally:
+                collada.util.setNumericParser(None)
+        self.assertIsNone(parser._pool)
+        # closing is final for the threads only, the parser starts new ones
+        numpy.testing.assert_array_equal(parser.parse(text, numpy.float32), values)
+        parser.close()
+        self.assertIsNot(collada.util.getNumericParser(), parser)
+        numpy.testing.assert_array_equal(loaded.data.flatten(), values)
+
+    def test_format_numeric_array(self):
+        formatNumericArray = collada.util.formatNumericArray
+        ints = numpy.array([0, 7, -3, 10, 99, -100, 2147483647, -2147483648], dtype=numpy.int32)
+        self.assertEqual(formatNumericArray(ints), ' '.join(map(str, ints.tolist())))
+        big = numpy.array([2**40, -5], dtype=numpy.int64)
+        self.assertEqual(formatNumericArray(big), '1099511627776 -5')
+        self.assertEqual(formatNumericArray(numpy.array([], dtype=numpy.int32)), '')
+
+        indices = numpy.random.randint(0, 100000, 3000).reshape(-1, 3)
+        self.assertEqual(formatNumericArray(indices), ' '.join(map(str, indices.flatten().tolist())))
+
+        floats = numpy.random.uniform(-1000, 1000, 3000).astype(numpy.float32)
+        self.assertEqual(formatNumericArray(floats, '%.7g'), ' '.join('%.7g' % x for x in floats.tolist()))
+        self.assertEqual(formatNumericArray(floats), ' '.join(map(str, floats.tolist())))
+
+        floatsource = collada.source.FloatSource("myfloatsource", floats.copy(), ('X', 'Y', 'Z'))
+        floatsource.float_format = '%.9g'
+        floatsource.save()
+        loaded = collada.source.Source.load(self.dummy, {}, fromstring(tostring(floatsource.xmlnode)))
+        numpy.testing.assert_array_equal(loaded.data.flatten(), floats)
+
+    def test_float_source_readonly(self):
+        values = numpy.array([0.1, 0.2, 0.3, 0.4, 0.5, 0.6], dtype=numpy.float32)
+        values.flags.writeable = False
+        floatsource = collada.source.FloatSource("myfloatsource", values, ('X', 'Y', 'Z'))
+        self.assertEqual(values.shape, (6,))
+        self.assertEqual(floatsource.data.shape, (2, 3))
+        self.assertTrue(numpy.may_share_memory(values, floatsource.data))
+        floatsource.save()
+        self.assertEqual(values.shape, (6,))
+
+        node = fromstring(tostring(floatsource.xmlnode))
+        node.find(collada.tag('float_array')).text = '1 nan 3 4 5 6'
+        loaded = collada.source.Source.load(self.dummy, {}, node)
+        numpy.testing.assert_array_equal(loaded.data, [[1, 0, 3], [4, 5, 6]])
+
+    def test_source_save_keeps_data(self):
+        floatsource = collada.source.FloatSource("myfloatsource", numpy.arange(6, dtype=numpy.float32), ('X', 'Y', 'Z'))
+        floatsource._markClean()
+        bounds = floatsource.bounds()
+        data = floatsource.data
+        floatsource.save()
+        self.assertIs(floatsource.data, data)
+        self.assertFalse(floatsource.isDirty())
+        self.assertIs(floatsource.bounds(), bounds)
+
+        namesource = collada.source.NameSource("mynamesource", numpy.array(['a', 'b']), ('JOINT',))
+        data = namesource.data
+        namesource.save()
+        self.assertIs(namesource.data, data)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+import os
+
+import numpy
+
+import collada
+from collada.util import unittest
+
+
+class TestVertexBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.datadir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+    def assertBufferMatches(self, prim, vb):
+        tris = prim.triangleVertices()
+        self.assertEqual(vb.index.shape, (len(tris), 3))
+        numpy.testing.assert_array_almost_equal(vb.attribute('VERTEX')[vb.index], tris)
+        numpy.testing.assert_array_almost_equal(vb.attribute('NORMAL')[vb.index], prim.triangleNormals())
+        for i, texcoords in enumerate(prim.triangleTexcoords()):
+            numpy.testing.assert_array_almost_equal(vb.attribute('TEXCOORD', i)[vb.index], texcoords)
+
+    def test_triangleset_vertex_buffer(self):
+        mesh = collada.Collada(os.path.join(self.datadir, "duck_triangles.dae"))
+        triset = mesh.geometries[0].primitives[0]
+        vb = triset.vertexBuffer()
+        self.assertIs(vb, triset.vertexBuffer())
+
+        self.assertEqual(vb.data.dtype, numpy.float32)
+        self.assertEqual(vb.index.dtype, numpy.uint16)
+        self.assertEqual([(s, i, o, c) for s, i, o, c in vb.layout],
+                         [('VERTEX', 0, 0, 3), ('NORMAL', 0, 12, 3), ('TEXCOORD', 0, 24, 2)])
+        self.assertEqual(vb.stride, 32)
+        corners = set(map(tuple, triset.index.reshape(-1, triset.nindices).tolist()))
+        self.assertEqual(len(vb), len(corners))
+        self.assertBufferMatches(triset, vb)
+
+        bound = list(mesh.scene.objects('geometry'))[0]
+        buffers = bound.vertexBuffers()
+        self.assertEqual(len(buffers), 1)
+        boundset, boundvb = buffers[0]
+        numpy.testing.assert_array_equal(boundvb.index, vb.index)
+        self.assertBufferMatches(boundset, boundvb)
+
+        boundset.generateNormals()
+        regenerated = boundset.vertexBuffer()
+        self.assertIsNot(regenerated, boundvb)
+        self.assertBufferMatches(boundset, regenerated)
+
+    def test_vertex_buffer_invalidation(self):
+        mesh = collada.Collada(os.path.join(self.datadir, "duck_triangles.dae"))
+        triset = mesh.geometries[0].primitives[0]
+        vb = triset.vertexBuffer()
+
+        # replacing an array rebuilds the buffer
+        triset._vertex = triset._vertex + 1
+        moved = triset.vertexBuffer()
+        self.assertIsNot(moved, vb)
+        self.assertBufferMatches(triset, moved)
+        self.assertIs(moved, triset.vertexBuffer())
+
+        # so does changing one in place, once it is marked
+        vertex = triset._vertex.copy()
+        triset._vertex = vertex
+        vb = triset.vertexBuffer()
+        vertex[:] *= 2
+        triset.markDirty()
+        self.assertIsNot(triset.vertexBuffer(), vb)
+        self.assertBufferMatches(triset, triset.vertexBuffer())
+
+    def test_polylist_vertex_buffer(self):
+        mesh = collada.Collada(os.path.join(self.datadir, "duck_polylist.dae"))
+        polylist = mesh.geometries[0].primitives[0]
+        vb = polylist.vertexBuffer()
+        self.assertBufferMatches(polylist.triangleset(), vb)
+
+        bound = list(mesh.scene.objects('geometry'))[0]
+        boundpoly, boundvb = bound.vertexBuffers()[0]
+        self.assertBufferMatches(boundpoly.triangleset(), boundvb)
+
+    def test_large_index(self):
+        mesh = collada.Collada()
+        npoints = 70000
+        vert_src = collada.source.FloatSource("verts", numpy.arange(npoints * 3, dtype=numpy.float32), ('X', 'Y', 'Z'))
+        geometry = collada.geometry.Geometry(mesh, "geometry0", "big", [vert_src])
+        input_list = collada.source.InputList()
+        input_list.addInput(0, 'VERTEX', "#verts")
+        indices = numpy.arange(npoints - 1)
+        triset = geometry.createTriangleSet(indices[:len(indices) // 3 * 3], input_list, None)
+        vb = triset.vertexBuffer()
+        self.assertEqual(vb.index.dtype, numpy.uint32)
+        numpy.testing.assert_array_equal(vb.attribute('VERTEX')[vb.index], triset.triangleVertices())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,11 +14,15 @@
 
 import numpy
 
+from collada import common
 from collada import primitive
+from collada.bvh import BVH
 from collada.common import E, tag
 from collada.common import DaeIncompleteError, DaeBrokenRefError, \
         DaeMalformedError, DaeUnsupportedError
-from collada.util import toUnitVec, checkSource, normalize_v3, dot_v3, xrange
+from collada.util import toUnitVec, checkSource, normalize_v3, dot_v3, xrange, \
+    loadArrayData, setArrayText, arrayTextNeeded
+from collada.vertexbuffer import buildVertexBuffer
 from collada.xmlutil import etree as ElementTree
 
 
@@ -66,7 +70,107 @@ class Triangle(object):
         return repr(self)
 
 
-class TriangleSet(primitive.Primitive):
+class _TriangleArrays(object):
+    """Methods returning the data of all the triangles in a set as numpy
+    arrays, shared by :class:`TriangleSet` and :class:`BoundTriangleSet`.
+    These are much faster than iterating over :class:`Triangle` objects."""
+
+    def _emptyArray(self, *shape):
+        dtype = self._vertex.dtype if self._vertex is not None else numpy.float32
+        return numpy.zeros((0,) + shape, dtype=dtype)
+
+    def triangleVertices(self):
+        """Returns the points of all the triangles in the set.
+
+        :rtype: numpy.array of shape (N, 3, 3)
+        """
+        if self._vertex_index is None:
+            return self._emptyArray(3, 3)
+        return self._vertex[self._vertex_index]
+
+    def triangleNormals(self):
+        """Returns the normals of the three points of all the triangles in
+        the set. If the set has no normals, the face normals are used, like
+        for :attr:`Triangle.normals`.
+
+        :rtype: numpy.array of shape (N, 3, 3)
+        """
+        if self._vertex_index is None:
+            return self._emptyArray(3, 3)
+        if self._normal is None:
+            return numpy.repeat(self.faceNormals()[:,numpy.newaxis,:], 3, axis=1)
+        return self._normal[self._normal_index]
+
+    def triangleTexcoords(self):
+        """Returns the texture coordinates of the three points of all the
+        triangles in the set.
+
+        :rtype: tuple with one numpy.array of shape (N, 3, 2) per texture
+          coordinate set
+        """
+        return tuple(texcoords[texcoord_index] for texcoords, texcoord_index
+                     in zip(self._texcoordset, self._texcoord_indexset))
+
+    def _edgeCross(self):
+        tris = self.triangleVertices()
+        return numpy.cross(tris[:,1] - tris[:,0], tris[:,2] - tris[:,0])
+
+    def faceNormals(self):
+        """Returns the unit normal of all the triangles in the set, following
+        the counter-clockwise winding of their points. Degenerate triangles
+        get a zero normal.
+
+        :rtype: numpy.array of shape (N, 3)
+        """
+        n = self._edgeCross()
+        length = numpy.sqrt((n ** 2).sum(axis=1))
+        length[length == 0] = 1
+        return n / length[:,numpy.newaxis]
+
+    def faceAreas(self):
+        """Returns the area of all the triangles in the set.
+
+        :rtype: numpy.array of shape (N,)
+        """
+        n = self._edgeCross()
+        return 0.5 * numpy.sqrt((n ** 2).sum(axis=1))
+
+    def faceCentroids(self):
+        """Returns the centroid of all the triangles in the set.
+
+        :rtype: numpy.array of shape (N, 3)
+        """
+        return self.triangleVertices().mean(axis=1)
+
+    def _vertexBufferAttributes(self):
+        if self._vertex_index is None:
+            return []
+        attributes = [('VERTEX', 0, self._vertex, self._vertex_index)]
+        if self._normal is not None:
+            attributes.append(('NORMAL', 0, self._normal, self._normal_index))
+        for semantic, arrays, indices in (
+                ('TEXCOORD', self._texcoordset, self._texcoord_indexset),
+                ('TEXTANGENT', self._textangentset, self._textangent_indexset),
+                ('TEXBINORMAL', self._texbinormalset, self._texbinormal_indexset)):
+            for i, (array, index) in enumerate(zip(arrays, indices)):
+                attributes.append((semantic, i, array, index))
+        return attributes
+
+    _vertexbuffer = None
+    def _cachedVertexBuffer(self, build):
+        # like the cache of bounds(), the buffer is built again when one of
+        # the arrays it comes from is replaced or modified in place
+        attributes = self._vertexBufferAttributes()
+        cached = self._vertexbuffer
+        if cached is None or cached[0] != common._inPlaceChanges or \
+                len(cached[1]) != len(attributes) or \
+                not all(a[2] is c[2] and a[3] is c[3] for a, c in zip(attributes, cached[1])):
+            cached = (common._inPlaceChanges, attributes, build(attributes))
+            self._vertexbuffer = cached
+        return cached[2]
+
+
+class TriangleSet(primitive.Primitive, _TriangleArrays):
     """Class containing the data COLLADA puts in a <triangles> tag, a collection of
     triangles.
 
@@ -75,6 +179,9 @@ class TriangleSet(primitive.Primitive):
     * If ``T`` is an instance of :class:`collada.triangleset.TriangleSet`, then ``len(T)``
       returns the number of triangles in the set. ``T[i]`` returns the i\ :sup:`th`
       triangle in the set.
+    * The whole set can be read at once as numpy arrays with methods like
+      :meth:`triangleVertices` and :meth:`faceNormals`, which is much faster
+      than creating a :class:`Triangle` for each item.
     """
 
     def __init__(self, sources, material, index, xmlnode=None):
@@ -91,10 +198,9 @@ class TriangleSet(primitive.Primitive):
                           if len(input_type_array) > 0])
 
         self.material = material
-        self.index = index
-        self.indices = self.index
         self.nindices = max_offset + 1
-        self.index.shape = (-1, 3, self.nindices)
+        self.index = index.reshape(-1, 3, self.nindices)
+        self.indices = self.index
         self.ntriangles = len(self.index)
         self.sources = sources
 
@@ -162,11 +268,6 @@ class TriangleSet(primitive.Primitive):
         return len(self.index)
 
     def _recreateXmlNode(self):
-        self.index.shape = (-1)
-        acclen = len(self.index)
-        txtindices = ' '.join(map(str, self.index.tolist()))
-        self.index.shape = (-1, 3, self.nindices)
-
         self.xmlnode = E.triangles(count=str(self.ntriangles))
         if self.material is not None:
             self.xmlnode.set('material', self.material)
@@ -180,7 +281,15 @@ class TriangleSet(primitive.Primitive):
                 inpnode.set('set', str(set))
             self.xmlnode.append(inpnode)
 
-        self.xmlnode.append(E.p(txtindices))
+        pnode = E.p()
+        setArrayText(pnode, self.index)
+        self.xmlnode.append(pnode)
+
+    def _restoreArrayText(self):
+        """Writes the index array back to :attr:`xmlnode` if its text was released."""
+        pnode = self.xmlnode.find(tag('p'))
+        if pnode is not None and arrayTextNeeded(pnode):
+            setArrayText(pnode, self.index)
 
     def __getitem__(self, i):
         v = self._vertex[ self._vertex_index[i] ]
@@ -200,12 +309,7 @@ class TriangleSet(primitive.Primitive):
         source_array = primitive.Primitive._getInputs(collada, localscope, node.findall(tag('input')))
 
         def parse_p(indexnode):
-            if indexnode.text is None or indexnode.text.isspace():
-                index = numpy.array([], dtype=numpy.int32)
-            else:
-                index = numpy.fromstring(indexnode.text, dtype=numpy.int32, sep=' ')
-            index[numpy.isnan(index)] = 0
-            return index
+            return loadArrayData(collada, indexnode, numpy.int32)
 
         indexlist = []
         extendfunc = _indexExtendFunctions[node.tag]
@@ -232,6 +336,36 @@ class TriangleSet(primitive.Primitive):
         """Create a bound triangle set from this triangle set, transform and material mapping"""
         return BoundTriangleSet( self, matrix, materialnodebysymbol)
 
+    _untracked = primitive.Primitive._untracked | frozenset(['_vertexbuffer', '_bvh'])
+
+    def vertexBuffer(self):
+        """Returns the triangles of the set as an interleaved vertex buffer
+        with a single index, as needed by graphics APIs. The buffer is
+        computed on the first call and cached like
+        :meth:`~collada.primitive.Primitive.bounds`.
+
+        :rtype: :class:`collada.vertexbuffer.VertexBuffer`
+        """
+        return self._cachedVertexBuffer(lambda attributes: buildVertexBuffer(attributes, len(self)))
+
+    _bvh = None
+    def bvh(self):
+        """Returns a bounding volume hierarchy over the triangles of the set,
+        in the coordinates of the vertex source. It is built on the first
+        call and cached like :meth:`~collada.primitive.Primitive.bounds`.
+
+        :rtype: :class:`collada.bvh.BVH`, whose items are triangle indices
+        """
+        cached = self._bvh
+        if cached is None or cached[0] is not self._vertex or \
+                cached[1] is not self._vertex_index or \
+                cached[2] != common._inPlaceChanges:
+            triangles = self.triangleVertices()
+            bvh = BVH(numpy.stack((triangles.min(axis=1), triangles.max(axis=1)), axis=1))
+            cached = (self._vertex, self._vertex_index, common._inPlaceChanges, bvh)
+            self._bvh = cached
+        return cached[3]
+
     def generateNormals(self):
         """If :attr:`normals` is `None` or you wish for normals to be
         recomputed, call this method to recompute them."""
@@ -325,20 +459,21 @@ class TriangleSet(primitive.Primitive):
         return str(self)
 
 
-class BoundTriangleSet(primitive.BoundPrimitive):
+class BoundTriangleSet(primitive.BoundPrimitive, _TriangleArrays):
     """A triangle set bound to a transform matrix and materials mapping.
 
     * If ``T`` is an instance of :class:`collada.triangleset.BoundTriangleSet`, then ``len(T)``
       returns the number of triangles in the set. ``T[i]`` returns the i\ :sup:`th`
       triangle in the set.
+    * The whole set can be read at once as numpy arrays with methods like
+      :meth:`triangleVertices` and :meth:`faceNormals`, which is much faster
+      than creating a :class:`Triangle` for each item.
     """
 
     def __init__(self, ts, matrix, materialnodebysymbol):
         """Create a bound triangle set from a triangle set, transform and material mapping.
         This gets created when a triangle set is instantiated in a scene. Do not create this manually."""
-        M = numpy.asmatrix(matrix).transpose()
-        self._vertex = None if ts.vertex is None else numpy.asarray(ts._vertex * M[:3,:3]) + matrix[:3,3]
-        self._normal = None if ts._normal is None else numpy.asarray(ts._normal * M[:3,:3])
+        self._bindData(ts, matrix)
         self._texcoordset = ts._texcoordset
         self._textangentset = ts._textangentset
         self._texbinormalset = ts._texbinormalset
@@ -379,7 +514,8 @@ class BoundTriangleSet(primitive.BoundPrimitive):
         return Triangle(vindex, v, nindex, n, uvindices, uv, self.material)
 
     def triangles(self):
-        """Iterate through all the triangles contained in the set.
+        """Iterate through all the triangles contained in the set. To process
+        many triangles, prefer the array methods like :meth:`triangleVertices`.
 
         :rtype: generator of :class:`collada.triangleset.Triangle`
         """
@@ -392,6 +528,25 @@ class BoundTriangleSet(primitive.BoundPrimitive):
         """
         return self.triangles()
 
+    def vertexBuffer(self):
+        """Returns the triangles of the set as an interleaved vertex buffer
+        with a single index, as needed by graphics APIs. The vertices are
+        transformed by the bound matrix. The buffer is computed on the first
+        call and cached until the arrays it comes from change.
+
+        :rtype: :class:`collada.vertexbuffer.VertexBuffer`
+        """
+        return self._cachedVertexBuffer(self._buildVertexBuffer)
+
+    def _buildVertexBuffer(self, attributes):
+        original = self.original._vertexBufferAttributes()
+        if len(attributes) == len(original) and \
+                all(a[3] is o[3] for a, o in zip(attributes, original)):
+            # same indices as the original set, only the values of
+            # the attributes are transformed
+            return self.original.vertexBuffer().rebind([a[2] for a in attributes])
+        return buildVertexBuffer(attributes, len(self))
+
     def generateNormals(self):
         """If :attr:`normals` is `None` or you wish for normals to be
         recomputed, call this method to recompute them."""
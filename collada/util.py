@@ -14,7 +14,11 @@
 
 import numpy
 import math
+import multiprocessing
+import re
 import sys
+import threading
+from multiprocessing.pool import ThreadPool
 
 if sys.version_info[0] > 2:
     import unittest
@@ -39,6 +43,279 @@ else:
 from collada.common import DaeMalformedError, E, tag
 
 
+class NumericParser(object):
+    """Converts the whitespace separated text of numeric arrays, like
+    ``<float_array>``, ``<p>`` or ``<vcount>``, into numpy arrays.
+
+    This default implementation parses the whole text at once in the
+    calling thread. Subclasses can override :meth:`parse` to provide a
+    different backend and be installed with :func:`setNumericParser`.
+    """
+
+    def parse(self, text, dtype):
+        """Parse `text` into a one dimensional numpy array
+
+        :param str text:
+          The whitespace separated numbers to parse
+        :param dtype:
+          The numpy data type of the resulting array
+
+        :rtype: numpy.array
+
+        :raises collada.common.DaeMalformedError: if the text is not made
+          only of numbers
+
+        """
+        data = numpy.fromstring(text, dtype=dtype, sep=' ')
+        # numpy stops quietly at the first token it can't read, which shows
+        # as fewer values than tokens, except for junk at the end of the
+        # last token, which is checked on its own
+        if len(data) != _countTokens(text):
+            raise DaeMalformedError('Invalid number in numeric array text')
+        if len(data):
+            try:
+                float(text.rsplit(None, 1)[-1])
+            except ValueError:
+                raise DaeMalformedError('Invalid number in numeric array text')
+        return data
+
+
+def _countTokens(text):
+    # the number of whitespace separated tokens, without building the
+    # list of text.split()
+    try:
+        chars = numpy.frombuffer(text, dtype=numpy.uint8)
+    except TypeError:
+        chars = numpy.frombuffer(text.encode('ascii', 'replace'), dtype=numpy.uint8)
+    if len(chars) == 0:
+        return 0
+    space = chars <= 32
+    return int(numpy.count_nonzero(space[:-1] & ~space[1:])) + (0 if space[0] else 1)
+
+
+class ThreadedNumericParser(NumericParser):
+    """A :class:`NumericParser` that splits large texts into chunks at
+    whitespace boundaries and parses the chunks on a pool of threads.
+
+    This is not faster in general. Splitting the text and joining the
+    chunks costs time of its own, so it can only pay off for texts of
+    many megabytes, on a machine with several free cores, with a numpy
+    build whose text conversion runs in parallel. On a single core it is
+    slower than :class:`NumericParser`. Measure with
+    ``examples/benchmark_numeric_parse.py`` before installing it.
+
+    The threads are started on first use and stopped by :meth:`close`,
+    which is also called when the parser is used as a context manager::
+
+        with ThreadedNumericParser() as parser:
+            setNumericParser(parser)
+            ...
+            setNumericParser(None)
+    """
+
+    def __init__(self, workers=None, chunk_size=4*1024*1024):
+        """Create the parser
+
+        :param int workers:
+          Number of threads to use. Defaults to the number of CPUs.
+        :param int chunk_size:
+          Approximate size in characters of each chunk. Texts smaller than
+          this are parsed directly in the calling thread.
+
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self._pool = None
+
+    def _chunks(self, text):
+        start = 0
+        while start < len(text):
+            match = _WHITESPACE.search(text, start + self.chunk_size)
+            end = len(text) if match is None else match.end()
+            yield text[start:end]
+            start = end
+
+    def parse(self, text, dtype):
+        if len(text) <= self.chunk_size or self.workers == 1:
+            return NumericParser.parse(self, text, dtype)
+        if self._pool is None:
+            self._pool = ThreadPool(self.workers)
+        parts = self._pool.map(lambda chunk: NumericParser.parse(self, chunk, dtype),
+                               list(self._chunks(text)))
+        return numpy.concatenate(parts)
+
+    def close(self):
+        """Stop the threads of the parser. It can still be used afterwards,
+        starting new threads if needed."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+_WHITESPACE = re.compile(r'\s')
+_numericParser = NumericParser()
+
+def setNumericParser(parser):
+    """Set the :class:`NumericParser` used to convert the text of all
+    numeric arrays when loading documents.
+
+    :param NumericParser parser:
+      The parser to use, or ``None`` to restore the default one
+
+    """
+    global _numericParser
+    if parser is None:
+        parser = NumericParser()
+    _numericParser = parser
+
+def getNumericParser():
+    """Returns the :class:`NumericParser` currently in use"""
+    return _numericParser
+
+def loadArrayData(collada, node, dtype):
+    """Returns the contents of a numeric array element, like ``<float_array>``
+    or ``<p>``, as a one dimensional numpy array. The array is obtained with
+    :meth:`collada.Collada.getArrayData` when `collada` provides it, so that
+    it can come from a cache, otherwise it is parsed from the text of `node`.
+
+    :param collada.Collada collada:
+      The collada object being loaded
+    :param node:
+      The ElementTree element holding the array
+    :param dtype:
+      The numpy data type of the array
+
+    :rtype: numpy.array
+
+    """
+    getter = getattr(collada, 'getArrayData', None)
+    if getter is None:
+        return parseNumericText(node.text, dtype)
+    return getter(node, dtype)
+
+def parseNumericText(text, dtype):
+    """Parse the text of a numeric array with the current :class:`NumericParser`.
+    Empty text gives an empty array.
+
+    :param str text:
+      The whitespace separated numbers to parse, or None
+    :param dtype:
+      The numpy data type of the resulting array
+
+    :rtype: numpy.array
+
+    """
+    if not text or text.isspace():
+        return numpy.array([], dtype=dtype)
+    return _numericParser.parse(text, dtype)
+
+
+_FORMAT_CHUNK = 1024*1024
+
+def formatNumericArray(data, fmt=None):
+    """Format the values of a numpy array as whitespace separated text, for
+    the text of numeric array elements like ``<float_array>`` or ``<p>``.
+
+    The values are formatted in chunks, with a single C level formatting
+    operation per chunk instead of a Python call per value. Integers
+    formatted with the default format don't go through Python objects at
+    all. The result is the same as ``' '.join(fmt % x for x in data.flat)``.
+
+    :param numpy.array data:
+      The array to format. It is flattened first.
+    :param str fmt:
+      A printf-style format for one value, like ``'%.7g'``. ``None`` gives
+      the same text as ``str()`` of each value.
+
+    :rtype: str
+
+    """
+    return ' '.join(iterFormatNumericArray(data, fmt))
+
+def iterFormatNumericArray(data, fmt=None, chunk_size=_FORMAT_CHUNK):
+    """Like :func:`formatNumericArray`, but returns a generator of the text
+    of consecutive chunks of at most `chunk_size` values. The chunks must be
+    separated by a space when they are joined."""
+    flat = numpy.asarray(data).reshape(-1)
+    integral = flat.dtype.kind == 'i' or \
+            (flat.dtype.kind == 'u' and flat.dtype.itemsize <= 4)
+    for start in xrange(0, len(flat), chunk_size):
+        chunk = flat[start:start+chunk_size]
+        if integral and fmt in (None, '%d'):
+            yield _formatIntegers(chunk)
+        else:
+            yield _formatValues(chunk, fmt or '%s')
+
+def _formatValues(chunk, fmt):
+    values = chunk.tolist()
+    return ' '.join([fmt] * len(values)) % tuple(values)
+
+_POWERS_OF_TEN = 10 ** numpy.arange(1, 10, dtype=numpy.uint32)
+
+def _formatIntegers(chunk):
+    # lay out every value in a row of bytes holding a sign, its digits
+    # right aligned and a separator, then keep only the bytes in use
+    values = chunk.astype(numpy.int64)
+    magnitude = numpy.abs(values)
+    if magnitude.max() > numpy.iinfo(numpy.uint32).max or magnitude.min() < 0:
+        return _formatValues(chunk, '%d')
+    magnitude = magnitude.astype(numpy.uint32)
+    ndigits = numpy.searchsorted(_POWERS_OF_TEN, magnitude, side='right') + 1
+    width = int(ndigits.max())
+    rows = numpy.empty((len(values), width + 2), dtype=numpy.uint8)
+    rows[:, 0] = ord('-')
+    rows[:, -1] = ord(' ')
+    remaining = magnitude
+    for column in xrange(width, 0, -1):
+        quotient = remaining // 10
+        rows[:, column] = ord('0') + (remaining - quotient * 10)
+        remaining = quotient
+    keep = numpy.arange(width + 2) >= (width + 1 - ndigits)[:, numpy.newaxis]
+    keep[:, 0] = values < 0
+    return rows[keep][:-1].tobytes().decode('ascii')
+
+_arrayTextState = threading.local()
+
+def setArrayText(node, data, fmt=None):
+    """Set the text of a numeric array element, like ``<float_array>`` or
+    ``<p>``, to the formatted values of `data` (see
+    :func:`formatNumericArray`).
+
+    While a document is written with ``Collada.write(fp, stream=True)``,
+    the text is not created. The text of `node` is released instead and
+    the array is formatted straight to the output file when it is reached.
+    """
+    deferred = getattr(_arrayTextState, 'deferred', None)
+    if deferred is None:
+        node.text = formatNumericArray(data, fmt)
+    else:
+        node.text = None
+        deferred[node] = (data, fmt)
+
+def arrayTextNeeded(node):
+    """Returns True if saving has to write the text of a numeric array
+    element with :func:`setArrayText` because its text was released."""
+    return node.text is None
+
+def deferArrayText():
+    """Start recording the arrays given to :func:`setArrayText` in the
+    current thread instead of formatting them. Returns the dictionary,
+    mapping elements to ``(data, fmt)`` tuples, they are recorded in."""
+    _arrayTextState.deferred = {}
+    return _arrayTextState.deferred
+
+def stopDeferringArrayText():
+    """Stop recording arrays started with :func:`deferArrayText`."""
+    _arrayTextState.deferred = None
+
 def falmostEqual(a, b, rtol=1.0000000000000001e-05, atol=1e-08):
     """Checks if the given floats are almost equal. Uses the algorithm
     from numpy.allclose.
@@ -124,6 +401,59 @@ def dot_v3(arr1, arr2):
     """
     return arr1[:,0]*arr2[:,0] + arr1[:,1]*arr2[:,1] + arr2[:,2]*arr1[:,2]
 
+def pointBounds(points):
+    """Calculates the axis-aligned bounding box of an array of points
+
+    :param numpy.array points:
+      The points, shape NxC
+
+    :returns: A numpy.array of shape 2xC holding the minimum and the maximum
+      of each component, or None if there are no points
+
+    """
+    if points is None or len(points) == 0:
+        return None
+    return numpy.array([points.min(axis=0), points.max(axis=0)])
+
+def unionBounds(bounds):
+    """Calculates the bounding box containing several bounding boxes
+
+    :param bounds:
+      An iterable of bounding boxes as returned by :func:`pointBounds`.
+      ``None`` values are ignored.
+
+    :returns: A numpy.array of shape 2xC, or None if there are no boxes
+
+    """
+    bounds = [b for b in bounds if b is not None]
+    if len(bounds) == 0:
+        return None
+    bounds = numpy.array(bounds)
+    return numpy.array([bounds[:,0].min(axis=0), bounds[:,1].max(axis=0)])
+
+def transformBounds(bounds, matrix):
+    """Calculates the axis-aligned bounding box of transformed boxes. This
+    is the box around the 8 transformed corners of each box, computed from
+    the center and the half extents of the boxes without building the
+    corners.
+
+    :param numpy.array bounds:
+      A bounding box of shape 2x3, or K bounding boxes of shape Kx2x3
+    :param numpy.array matrix:
+      A 4x4 affine transform matrix, or K matrices of shape Kx4x4
+
+    :returns: A numpy.array with the same shape as `bounds`
+
+    """
+    bounds = numpy.asarray(bounds)
+    matrix = numpy.asarray(matrix)
+    center = (bounds[...,0,:] + bounds[...,1,:]) / 2
+    extent = (bounds[...,1,:] - bounds[...,0,:]) / 2
+    rotation = matrix[...,:3,:3]
+    center = numpy.einsum('...ij,...j->...i', rotation, center) + matrix[...,:3,3]
+    extent = numpy.einsum('...ij,...j->...i', numpy.abs(rotation), extent)
+    return numpy.stack([center - extent, center + extent], axis=-2)
+
 class IndexedList(list):
     """
     Class that combines a list and a dict into a single class
@@ -275,3 +605,94 @@ def _correctValInNode(outernode, tagname, value):
     elif value is not None:
         outernode.append(E(tagname, str(value)))
 
+
+
+class LazyIndexedList(IndexedList):
+    """An :class:`IndexedList` whose items are only created when needed.
+
+    The list is constructed from `pending`, a list of ``(key, data)``
+    tuples in the final order of the list, and a `loader` function that
+    given `data` returns the object to store or ``None`` if it should be
+    skipped. Looking up an object by key (``L['test']``, ``L.get('test')``
+    or ``'test' in L``) only creates that object. Any other operation,
+    like iterating or taking the length, creates all the remaining
+    objects first and from then on the list behaves like a normal
+    :class:`IndexedList`.
+    """
+    def __init__(self, pending, attrs, loader):
+        self._pending = None
+        super(LazyIndexedList, self).__init__([], attrs)
+        self._pending = list(pending)
+        self._pendingkeys = {}
+        for i, (key, data) in enumerate(self._pending):
+            if key is not None:
+                self._pendingkeys.setdefault(key, i)
+        self._loaded = {}
+        self._loader = loader
+
+    def _loadKey(self, key):
+        if self._pending is None:
+            return
+        try:
+            i = self._pendingkeys.pop(key, None)
+        except TypeError: # unhashable, can't be a key
+            return
+        if i is not None:
+            obj = self._loader(self._pending[i][1])
+            self._loaded[i] = obj
+            if obj is not None:
+                self._addindex(obj)
+
+    def _materialize(self):
+        if self._pending is None:
+            return
+        pending, self._pending = self._pending, None
+        loaded, self._loaded = self._loaded, {}
+        self._pendingkeys = {}
+        items = []
+        for i, (key, data) in enumerate(pending):
+            if i in loaded:
+                obj = loaded[i]
+            else:
+                obj = self._loader(data)
+                if obj is not None:
+                    self._addindex(obj)
+            if obj is not None:
+                items.append(obj)
+        list.extend(self, items)
+
+    def __getitem__(self, ind):
+        if isinstance(ind, basestring):
+            self._loadKey(ind)
+        else:
+            self._materialize()
+        return IndexedList.__getitem__(self, ind)
+
+    def get(self, key, default=None):
+        self._loadKey(key)
+        return IndexedList.get(self, key, default)
+
+    def __contains__(self, item):
+        self._loadKey(item)
+        if item in self._index:
+            return True
+        self._materialize()
+        return list.__contains__(self, item)
+
+def _materializing(name):
+    method = getattr(IndexedList, name)
+    def wrapped(self, *args, **kwargs):
+        self._materialize()
+        return method(self, *args, **kwargs)
+    wrapped.__name__ = name
+    return wrapped
+
+for _name in ('__iter__', '__len__', '__reversed__', '__repr__', '__str__',
+              '__eq__', '__ne__', '__lt__', '__le__', '__gt__', '__ge__',
+              '__add__', '__iadd__', '__mul__', '__imul__', '__delitem__',
+              '__setitem__', '__getslice__', '__setslice__', '__delslice__',
+              'append', 'extend', 'insert', 'pop', 'remove', 'index',
+              'count', 'sort', 'reverse', 'copy', 'clear'):
+    if hasattr(IndexedList, _name):
+        setattr(LazyIndexedList, _name, _materializing(_name))
+del _name
@@ -0,0 +1,136 @@
+####################################################################
+#                                                                  #
+# THIS FILE IS PART OF THE pycollada LIBRARY SOURCE CODE.          #
+# USE, DISTRIBUTION AND REPRODUCTION OF THIS LIBRARY SOURCE IS     #
+# GOVERNED BY A BSD-STYLE SOURCE LICENSE INCLUDED WITH THIS SOURCE #
+# IN 'COPYING'. PLEASE READ THESE TERMS BEFORE DISTRIBUTING.       #
+#                                                                  #
+# THE pycollada SOURCE CODE IS (C) COPYRIGHT 2011                  #
+# by Jeff Terrace and contributors                                 #
+#                                                                  #
+####################################################################
+
+"""Module for building interleaved vertex buffers from primitives.
+
+COLLADA primitives use a separate index for each input, so a point of a
+triangle can use position 3, normal 7 and texture coordinate 12. Graphics
+APIs instead expect a single index into an array of vertices holding all
+the attributes. A :class:`VertexBuffer` is built by finding the unique
+combinations of input indices used by the primitive, which become the
+vertices of the buffer.
+
+Vertex buffers are usually obtained with
+:meth:`collada.triangleset.TriangleSet.vertexBuffer` or
+:meth:`collada.polylist.Polylist.vertexBuffer` rather than created directly.
+"""
+
+import numpy
+
+
+class VertexBuffer(object):
+    """An interleaved array of vertices and the triangle indices into it."""
+
+    def __init__(self, data, index, layout, source_index):
+        """Create a vertex buffer. Use :func:`buildVertexBuffer` instead of
+        calling this directly."""
+        self.data = data
+        """A float32 numpy.array of shape (V, stride / 4) with one row of
+        interleaved attributes per unique vertex"""
+        self.index = index
+        """A uint16 or uint32 numpy.array of shape (N, 3) with the index in
+        :attr:`data` of the three vertices of each triangle. uint16 is used
+        when there are at most 65536 vertices."""
+        self.layout = layout
+        """A tuple with one ``(semantic, set, offset, components)`` tuple
+        per attribute, where `offset` is in bytes from the start of a
+        vertex, `semantic` is the input semantic like ``'VERTEX'`` or
+        ``'TEXCOORD'`` and `set` is the position of the input among the
+        inputs with the same semantic"""
+        self.source_index = source_index
+        """An int numpy.array of shape (V, #attributes) with the index in
+        the source arrays of each attribute of each vertex"""
+
+    stride = property(lambda s: s.data.shape[1] * s.data.itemsize, doc=
+    """The size in bytes of one vertex in :attr:`data`""")
+
+    def __len__(self):
+        """Returns the number of vertices in the buffer"""
+        return len(self.data)
+
+    def attribute(self, semantic, set=0):
+        """Returns the view of :attr:`data` holding one attribute of all the
+        vertices, or ``None`` if the buffer does not have it."""
+        for attr_semantic, attr_set, offset, components in self.layout:
+            if attr_semantic == semantic and attr_set == set:
+                start = offset // self.data.itemsize
+                return self.data[:, start:start + components]
+        return None
+
+    def rebind(self, arrays):
+        """Returns a new vertex buffer with the same vertices and indices
+        but attribute values taken from `arrays`, a list with one source
+        array per entry of :attr:`layout`. This is used for bound
+        primitives, whose sources are transformed but index the same."""
+        data = _interleave(arrays, self.source_index)
+        return VertexBuffer(data, self.index, self.layout, self.source_index)
+
+    def __str__(self):
+        return '<VertexBuffer vertices=%d, triangles=%d, stride=%d>' % \
+                (len(self), len(self.index), self.stride)
+
+    def __repr__(self):
+        return str(self)
+
+
+def _interleave(arrays, source_index):
+    ncomponents = [a.shape[1] for a in arrays]
+    data = numpy.empty((len(source_index), sum(ncomponents)), dtype=numpy.float32)
+    column = 0
+    for i, (array, n) in enumerate(zip(arrays, ncomponents)):
+        data[:, column:column + n] = array[source_index[:, i]]
+        column += n
+    return data
+
+def buildVertexBuffer(attributes, ntriangles):
+    """Build a vertex buffer from the inputs of a triangle primitive.
+
+    :param list attributes:
+      A list of ``(semantic, set, array, index)`` tuples, one per input,
+      where `array` is the (M, components) source array of the input and
+      `index` is its (N, 3) index array
+    :param int ntriangles:
+      The number of triangles, N
+
+    :rtype: :class:`collada.vertexbuffer.VertexBuffer`
+    """
+    layout = []
+    offset = 0
+    for semantic, set, array, index in attributes:
+        components = array.shape[1]
+        layout.append((semantic, set, offset, components))
+        offset += components * numpy.dtype(numpy.float32).itemsize
+
+    if ntriangles == 0 or len(attributes) == 0:
+        source_index = numpy.zeros((0, len(attributes)), dtype=numpy.int32)
+        data = numpy.zeros((0, offset // 4), dtype=numpy.float32)
+        return VertexBuffer(data, numpy.zeros((0, 3), dtype=numpy.uint16),
+                            tuple(layout), source_index)
+
+    corners = numpy.column_stack([index.reshape(-1) for s, t, a, index in attributes])
+    corners = numpy.ascontiguousarray(corners, dtype=numpy.int64)
+    # view each row as a single opaque value so that numpy.unique
+    # compares whole rows at once
+    rows = corners.view(numpy.dtype((numpy.void, corners.dtype.itemsize * corners.shape[1])))
+    unused, first, inverse = numpy.unique(rows.ravel(), return_index=True,
+                                          return_inverse=True)
+    # number vertices in order of first use so the buffer keeps the
+    # locality of the original index
+    order = numpy.argsort(first)
+    rank = numpy.empty_like(order)
+    rank[order] = numpy.arange(len(order))
+    source_index = corners[first[order]]
+
+    index_dtype = numpy.uint16 if len(order) <= 65536 else numpy.uint32
+    index = rank[inverse.reshape(-1)].astype(index_dtype).reshape(-1, 3)
+    data = _interleave([a for s, t, a, i in attributes], source_index)
+    return VertexBuffer(data, index, tuple(layout), source_index)
@@ -130,3 +130,12 @@ else:
     def writeXML(xmlnode, fp):
         indent(xmlnode.getroot())
         xmlnode.write(fp)
+
+def removeChildren(parent, keep):
+    """Remove the children of `parent` for which `keep` returns False.
+
+    The children are filtered in a single pass instead of calling remove()
+    on each of them, which has to search the children every time."""
+    kept = [child for child in parent if keep(child)]
+    if len(kept) != len(parent):
+        parent[:] = kept
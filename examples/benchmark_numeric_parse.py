@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""Measures the throughput of the numeric array parsers in MB/s.
+
+Compares the old code paths (numpy.fromstring directly and the list
+comprehension over text.split() that Skin used) with the parsers in
+collada.util. Usage:
+
+    benchmark_numeric_parse.py [size in MB] [threads]
+"""
+
+import sys
+import time
+
+import numpy
+
+from collada import util
+
+
+def makeText(dtype, size):
+    """Create whitespace separated text of about `size` bytes."""
+    if numpy.dtype(dtype).kind == 'f':
+        values = numpy.random.uniform(-1000, 1000, size // 10)
+        text = ' '.join('%.6g' % v for v in values.tolist())
+    else:
+        values = numpy.random.randint(0, 1000000, size // 7)
+        text = ' '.join('%d' % v for v in values.tolist())
+    return text
+
+def timeit(func, text, repeat=3):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        func(text)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def main():
+    size = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 32 * 1024 * 1024
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    threaded = util.ThreadedNumericParser(workers=threads)
+    default = util.NumericParser()
+
+    for dtype in (numpy.float32, numpy.int32):
+        text = makeText(dtype, size)
+        mb = len(text) / (1024.0 * 1024.0)
+        cast = float if numpy.dtype(dtype).kind == 'f' else int
+        candidates = [
+            ('text.split() comprehension', lambda t: numpy.array([cast(v) for v in t.split()], dtype=dtype)),
+            ('numpy.fromstring', lambda t: numpy.fromstring(t, dtype=dtype, sep=' ')),
+            ('NumericParser', lambda t: default.parse(t, dtype)),
+            ('ThreadedNumericParser(%d)' % threaded.workers, lambda t: threaded.parse(t, dtype)),
+        ]
+        expected = default.parse(text, dtype)
+        print('%s, %.1f MB of text' % (numpy.dtype(dtype).name, mb))
+        for name, func in candidates:
+            assert numpy.array_equal(func(text), expected)
+            elapsed = timeit(func, text)
+            print('  %-30s %8.1f MB/s' % (name, mb / elapsed))
+    threaded.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""Measures how the time taken by Collada.save grows with the size of a scene.
+
+Builds documents with a growing number of scene nodes, each instancing one
+of a growing number of small geometries, and times saving them. The time
+per node should stay about the same as the scene gets larger. The documents
+are then loaded back, to time saving them with no change and with a single
+node changed, which should take about the same time whatever their size.
+Usage:
+
+    benchmark_save.py [largest number of nodes]
+"""
+
+import sys
+import time
+from io import BytesIO
+
+import numpy
+
+import collada
+from collada import geometry, scene, source
+
+
+def makeDocument(nnodes):
+    """Create a document with `nnodes` scene nodes and a geometry for every
+    ten of them."""
+    mesh = collada.Collada()
+    vertices = numpy.array([0, 0, 0, 1, 0, 0, 0, 1, 0], dtype=numpy.float32)
+    indices = numpy.array([0, 1, 2])
+    geometries = []
+    for i in range(max(nnodes // 10, 1)):
+        srcid = 'verts%d' % i
+        vert_src = source.FloatSource(srcid, vertices, ('X', 'Y', 'Z'))
+        geom = geometry.Geometry(mesh, 'geometry%d' % i, 'geometry%d' % i, [vert_src])
+        input_list = source.InputList()
+        input_list.addInput(0, 'VERTEX', '#' + srcid)
+        geom.primitives.append(geom.createTriangleSet(indices, input_list, None))
+        mesh.geometries.append(geom)
+        geometries.append(geom)
+
+    nodes = []
+    for i in range(nnodes):
+        geomnode = scene.GeometryNode(geometries[i % len(geometries)], [])
+        transform = scene.TranslateTransform(i, 0, 0)
+        nodes.append(scene.Node('node%d' % i, children=[geomnode], transforms=[transform]))
+    myscene = scene.Scene('scene', nodes)
+    mesh.scenes.append(myscene)
+    mesh.scene = myscene
+    return mesh
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sizes = []
+    nnodes = largest
+    while nnodes >= 1000 and len(sizes) < 4:
+        sizes.insert(0, nnodes)
+        nnodes //= 4
+
+    print('%10s %10s %14s %10s %14s %14s' % ('nodes', 'save (s)', 'us per node',
+                                              'load (s)', 'no-op save (s)', 'one-edit (s)'))
+    for nnodes in sizes:
+        mesh = makeDocument(nnodes)
+        start = time.time()
+        mesh.save()
+        elapsed = time.time() - start
+
+        out = BytesIO()
+        mesh.write(out)
+        start = time.time()
+        loaded = collada.Collada(BytesIO(out.getvalue()))
+        loading = time.time() - start
+        start = time.time()
+        loaded.save()
+        unchanged = time.time() - start
+        loaded.scene.nodes[nnodes // 2].transforms.append(scene.ScaleTransform(2, 2, 2))
+        start = time.time()
+        loaded.save()
+        edited = time.time() - start
+        print('%10d %10.2f %14.1f %10.2f %14.3f %14.3f' % (nnodes, elapsed, elapsed / nnodes * 1e6,
+                                                          loading, unchanged, edited))
+
+if __name__ == '__main__':
+    main()
@@ -149,47 +149,30 @@ class GLSLRenderer:
 
                     if triangles is not None:
                         triangles.generateNormals()
-                        # We will need flat lists for VBO (batch) initialization
-                        vertices = triangles.vertex.flatten().tolist()
-                        batch_len = len(vertices)//3
-                        indices = triangles.vertex_index.flatten().tolist()
-                        normals = triangles.normal.flatten().tolist()
+                        # The vertex buffer has a single index into
+                        # vertices holding all the attributes, which is
+                        # what batch.add_indexed() needs
+                        vb = triangles.vertexBuffer()
+                        positions = vb.attribute('VERTEX')
+                        vertices = positions.ravel().tolist()
+                        batch_len = len(vb)
+                        indices = vb.index.ravel().tolist()
+                        normals = vb.attribute('NORMAL').ravel().tolist()
 
                         batch = pyglet.graphics.Batch()
 
                         # Track maximum and minimum Z coordinates
-                        # (every third element) in the flattened
-                        # vertex list
-                        ma = max(vertices[2::3])
-                        if ma > self.z_max:
-                            self.z_max = ma
-
-                        mi = min(vertices[2::3])
-                        if mi < self.z_min:
-                            self.z_min = mi
-
-                        if tex_id is not None:
-
-                            # This is probably the most inefficient
-                            # way to get correct texture coordinate
-                            # list (uv). I am sure that I just do not
-                            # understand enough how texture
-                            # coordinates and corresponding indexes
-                            # are related to the vertices and vertex
-                            # indices here, but this is what I found
-                            # to work. Feel free to improve the way
-                            # texture coordinates (uv) are collected
-                            # for batch.add_indexed() invocation.
-                            uv = [[0.0,0.0]] * batch_len
-                            for t in triangles:
-                                nidx = 0
-                                texcoords = t.texcoords[0]
-                                for vidx in t.indices:
-                                    uv[vidx] = texcoords[nidx].tolist()
-                                    nidx += 1
-                            # Flatten the uv list
-                            uv = [item for sublist in uv for item in sublist]
+                        if batch_len > 0:
+                            ma = positions[:,2].max()
+                            if ma > self.z_max:
+                                self.z_max = ma
 
+                            mi = positions[:,2].min()
+                            if mi < self.z_min:
+                                self.z_min = mi
+
+                        uv = vb.attribute('TEXCOORD')
+                        if tex_id is not None and uv is not None:
                             # Create textured batch
                             batch.add_indexed(batch_len, 
                                               GL_TRIANGLES,
@@ -197,7 +180,7 @@ class GLSLRenderer:
                                               indices,
                                               ('v3f/static', vertices),
                                               ('n3f/static', normals),
-                                              ('t2f/static', uv))
+                                              ('t2f/static', uv.ravel().tolist()))
                         else:
                             # Create colored batch
                             batch.add_indexed(batch_len, 